@@ -0,0 +1,103 @@
+"""Benchmark: positions normalization (row-wise legacy vs vectorized) on synthetic books.
+
+    python -m app.benchmarks.positions [--rows 50000] [--repeat 3]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from ..minrei_lib.positions import normalize_positions
+
+
+def synthetic_positions(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Raw-query-shaped trader positions; ~half the rows are missing contract_month."""
+    rng = np.random.default_rng(seed)
+    valuation_date = pd.Timestamp('2025-01-15')
+    locations = np.array([f" loc{i:04d} " for i in range(max(rows // 40, 1))])
+    forward_month = rng.integers(1, 37, rows)
+    months = np.datetime64(valuation_date, 'M') + (forward_month - 1).astype('timedelta64[M]')
+    contract_month = pd.DatetimeIndex(months.astype('datetime64[ns]')).strftime('%Y-%m-%d').to_numpy(dtype=object)
+    contract_month[rng.random(rows) < 0.5] = None
+    return pd.DataFrame({
+        'valuation_date': valuation_date.strftime('%Y-%m-%d'),
+        'px_location': rng.choice(locations, rows),
+        'deltaposition': rng.normal(size=rows) * 1e3,
+        'price': rng.random(rows) * 100,
+        'forward_month': forward_month,
+        'contract_month': contract_month,
+        'gammaposition': rng.normal(size=rows),
+        'thetaposition': rng.normal(size=rows),
+        'vegaposition': rng.normal(size=rows),
+        'currency': 'USD',
+        'rate': 1.0,
+        'price_basis': np.nan,
+        'uom': 'BBL',
+        'contract_size': 1000,
+        'exp_code': 'CL',
+        'producttype': 'SWAP',
+        'commoditygroup': 'CRUDE',
+        'supercommodity': 'OIL',
+        'strategynumber': rng.integers(0, 50, rows),
+        'weight': rng.choice([50.0, 100.0], rows),
+    })
+
+
+def legacy_normalize_positions(df: pd.DataFrame) -> pd.DataFrame:
+    """TraderQueries.process_positions_helper before vectorization."""
+    df['valuation_date'] = pd.to_datetime(df['valuation_date'])
+    df['px_location'] = df['px_location'].str.upper()
+    df['px_location'] = df['px_location'].str.strip()
+    df['deltaposition'] *= df['weight'] / 100
+    df['gammaposition'] *= df['weight'] / 100
+    df['thetaposition'] *= df['weight'] / 100
+    df['vegaposition'] *= df['weight'] / 100
+    mask = df['contract_month'].isna()
+    def impute_contract_month(fm, vd):
+        cm = vd + relativedelta(months=fm-1)
+        cm = cm - relativedelta(days=cm.day-1)
+        cm = pd.to_datetime(cm).strftime('%Y-%m-%d')
+        return cm
+    df.loc[mask, 'contract_month'] = df[mask].apply(lambda row : impute_contract_month(row['forward_month'], row['valuation_date']), axis=1)
+    df['contract_month'] = pd.to_datetime(df['contract_month'])
+    cols_to_index = ['valuation_date', 'px_location', 'forward_month']
+    cols_to_sum = ['deltaposition', 'gammaposition', 'thetaposition', 'vegaposition']
+    cols_to_first = list(set(df.columns) - set(cols_to_sum) - set(cols_to_index))
+    df = df.groupby(cols_to_index).agg({
+        **{col: 'sum' for col in cols_to_sum},
+        **{col: 'first' for col in cols_to_first}
+    }).reset_index()
+    return df
+
+
+def best_time(fn, df: pd.DataFrame, repeat: int) -> tuple[float, pd.DataFrame]:
+    best, out = float('inf'), None
+    for _ in range(repeat):
+        data = df.copy()
+        start = time.perf_counter()
+        out = fn(data)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[5_000, 20_000, 50_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'legacy s':>10} {'vectorized s':>13} {'speedup':>8}")
+    for rows in args.rows:
+        df = synthetic_positions(rows)
+        legacy_s, legacy = best_time(legacy_normalize_positions, df, args.repeat)
+        vectorized_s, vectorized = best_time(normalize_positions, df, args.repeat)
+
+        # same result up to column order
+        pd.testing.assert_frame_equal(legacy[vectorized.columns], vectorized, check_dtype=False)
+        print(f"{rows:>8} {legacy_s:>10.3f} {vectorized_s:>13.3f} {legacy_s / vectorized_s:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+from typing import Optional
+import os
+
+from fastapi import Request
+
+from .executors import BoundedExecutor
+from .jobs import JobQueue
+from .minrei_lib import Database, PnlVectorStore, PriceCache, RealizedPnlStore, ReferenceCache, SingleFlight, SnapshotStore
+
+
+def database_settings() -> dict:
+    """Pool and price cache settings for the shared Database, read from the environment.
+    MINREI_PRICE_CACHE_DIR enables the on-disk Parquet tier (requires pyarrow). Reference data is
+    revalidated every MINREI_REFERENCE_TTL seconds (0 disables the cache). MINREI_PNL_STORE_DIR enables the
+    date-partitioned realized pnl store, synced at most every MINREI_PNL_STORE_REFRESH seconds and re-pulling
+    the last MINREI_PNL_STORE_REVISION_DAYS days. Identical concurrent queries and computations are coalesced,
+    and their results reused for MINREI_SINGLE_FLIGHT_TTL seconds (MINREI_SINGLE_FLIGHT=0 disables).
+    """
+    reference_ttl = float(os.getenv('MINREI_REFERENCE_TTL', '300'))
+    pnl_store_dir = os.getenv('MINREI_PNL_STORE_DIR')
+    return {
+        'debug': os.getenv('MINREI_DB_DEBUG', '0') == '1',
+        'pool_size': int(os.getenv('MINREI_DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('MINREI_DB_MAX_OVERFLOW', '10')),
+        'pool_recycle': int(os.getenv('MINREI_DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': os.getenv('MINREI_DB_POOL_PRE_PING', '1') == '1',
+        'pool_timeout': int(os.getenv('MINREI_DB_POOL_TIMEOUT', '30')),
+        'price_cache': PriceCache(
+            max_bytes=int(os.getenv('MINREI_PRICE_CACHE_MB', '512')) * 1024 ** 2,
+            cache_dir=os.getenv('MINREI_PRICE_CACHE_DIR') or None,
+        ),
+        'reference_cache': ReferenceCache(ttl=reference_ttl) if reference_ttl > 0 else None,
+        'pnl_store': RealizedPnlStore(
+            pnl_store_dir,
+            refresh_interval=float(os.getenv('MINREI_PNL_STORE_REFRESH', '300')),
+            revision_days=int(os.getenv('MINREI_PNL_STORE_REVISION_DAYS', '7')),
+        ) if pnl_store_dir else None,
+        'single_flight': SingleFlight(
+            ttl=float(os.getenv('MINREI_SINGLE_FLIGHT_TTL', '10')),
+        ) if os.getenv('MINREI_SINGLE_FLIGHT', '1') == '1' else None,
+    }
+
+
+def executor_settings() -> dict:
+    """Thread pool sizes and per-request timeouts (seconds), read from the environment.
+    Keep io_workers at or below the DB pool size + overflow.
+    """
+    return {
+        'io': {
+            'max_workers': int(os.getenv('MINREI_IO_WORKERS', '8')),
+            'timeout': float(os.getenv('MINREI_IO_TIMEOUT', '30')),
+        },
+        'compute': {
+            'max_workers': int(os.getenv('MINREI_COMPUTE_WORKERS', '4')),
+            'timeout': float(os.getenv('MINREI_COMPUTE_TIMEOUT', '300')),
+        },
+    }
+
+
+def vector_store_settings() -> Optional[PnlVectorStore]:
+    """Per-trader incremental pnl vector store, enabled by MINREI_VECTOR_STORE_DIR."""
+    directory = os.getenv('MINREI_VECTOR_STORE_DIR')
+    return PnlVectorStore(directory) if directory else None
+
+
+def snapshot_store_settings() -> Optional[SnapshotStore]:
+    """Nightly pnl vector snapshots (built by python -m app.snapshot), enabled by MINREI_SNAPSHOT_DIR."""
+    directory = os.getenv('MINREI_SNAPSHOT_DIR')
+    return SnapshotStore(directory) if directory else None
+
+
+def timing_settings() -> dict:
+    """MINREI_SERVER_TIMING=0 drops the Server-Timing header. MINREI_PROFILE_DIR enables cProfile dumps
+    for requests sent with an X-Minrei-Profile: 1 header."""
+    return {
+        'server_timing': os.getenv('MINREI_SERVER_TIMING', '1') == '1',
+        'profile_dir': os.getenv('MINREI_PROFILE_DIR') or None,
+    }
+
+
+def job_settings() -> dict:
+    """Background job pool size, and how long (seconds) and how many finished job results are kept."""
+    return {
+        'max_workers': int(os.getenv('MINREI_JOB_WORKERS', '2')),
+        'result_ttl': float(os.getenv('MINREI_JOB_RESULT_TTL', '3600')),
+        'max_results': int(os.getenv('MINREI_JOB_MAX_RESULTS', '100')),
+    }
+
+
+def get_db(request: Request) -> Database:
+    """Process-wide Database created in the app lifespan."""
+    return request.app.state.db
+
+
+
+def get_io_executor(request: Request) -> BoundedExecutor:
+    """Executor for short queries (trader lists, lookups)."""
+    return request.app.state.io_executor
+
+
+def get_compute_executor(request: Request) -> BoundedExecutor:
+    """Executor for heavy query + NumPy work (pnl vectors, VaR)."""
+    return request.app.state.compute_executor
+
+
+def get_vector_store(request: Request) -> Optional[PnlVectorStore]:
+    """Incremental pnl vector store, None when not configured."""
+    return request.app.state.vector_store
+
+
+def get_snapshot_store(request: Request) -> Optional[SnapshotStore]:
+    """Nightly snapshot store, None when not configured."""
+    return request.app.state.snapshot_store
+
+
+def get_job_queue(request: Request) -> JobQueue:
+    """Background job queue created in the app lifespan."""
+    return request.app.state.jobs
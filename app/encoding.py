@@ -0,0 +1,77 @@
+import json
+import struct
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from .minrei_lib.profiling import span
+
+PNL_VECTORS_MEDIA_TYPE = 'application/x-pnl-vectors'
+VECTOR_DTYPES = {'float64': '<f8', 'float32': '<f4'}
+
+
+def wants_binary(request: Request, format: Optional[str]) -> bool:
+    """Binary layout is chosen with ?format=binary or an Accept header naming PNL_VECTORS_MEDIA_TYPE."""
+    if format is not None:
+        return format == 'binary'
+    return PNL_VECTORS_MEDIA_TYPE in request.headers.get('accept', '')
+
+
+def encode_pnl_vectors(
+        df: pd.DataFrame,
+        dtype: str = 'float64',
+        vector_col: str = 'pnl_vector',
+        vectors: Optional[np.ndarray] = None,
+    ) -> bytes:
+    """Packs pnl vector rows as a columnar metadata block followed by one typed-array matrix.
+    vectors, when given, is the (rows x dates) matrix for df's rows (e.g. a snapshot slice) and df holds
+    no vector column.
+
+    Layout (little-endian):
+        uint32 header length | UTF-8 JSON header | zero padding to an 8-byte boundary | rows x cols matrix
+
+    The header holds {rows, cols, dtype, vector_field, columns: {name: [values per row]}}, so column
+    names appear once instead of once per row. Datetimes are encoded as ISO strings like the JSON route.
+    """
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"dtype must be one of {list(VECTOR_DTYPES)}, got {dtype}")
+
+    if vectors is None:
+        vectors = df[vector_col].tolist()
+        matrix = np.asarray(vectors, dtype=VECTOR_DTYPES[dtype]) if vectors else np.empty((0, 0), dtype=VECTOR_DTYPES[dtype])
+        meta = df.drop(columns=vector_col)
+    else:
+        matrix = np.asarray(vectors, dtype=VECTOR_DTYPES[dtype])
+        meta = df.copy()
+    for col in meta.columns:
+        if pd.api.types.is_datetime64_any_dtype(meta[col]):
+            meta[col] = meta[col].dt.strftime('%Y-%m-%dT%H:%M:%S')
+    meta = meta.astype(object).where(meta.notna(), None)
+
+    header = json.dumps({
+        'rows': matrix.shape[0],
+        'cols': matrix.shape[1],
+        'dtype': dtype,
+        'vector_field': vector_col,
+        'columns': meta.to_dict(orient='list'),
+    }, default=str).encode('utf-8')
+    padding = -(4 + len(header)) % 8
+    return struct.pack('<I', len(header)) + header + b'\0' * padding + matrix.tobytes()
+
+
+def pnl_vectors_response(df: pd.DataFrame, binary: bool, dtype: str = 'float64', vectors: Optional[np.ndarray] = None):
+    """JSON records (default) or the binary layout from encode_pnl_vectors. See encode_pnl_vectors for vectors.
+    Both are encoded here rather than by the route, so the encode.json / encode.binary spans time the whole
+    serialization."""
+    if binary:
+        with span('encode.binary'):
+            return Response(content=encode_pnl_vectors(df, dtype, vectors=vectors), media_type=PNL_VECTORS_MEDIA_TYPE)
+    with span('encode.json'):
+        if vectors is not None:
+            df = df.assign(pnl_vector=np.asarray(vectors, dtype=np.float64).tolist())
+        # what FastAPI does with returned records; JSONResponse renders the body on construction
+        return JSONResponse(jsonable_encoder(df.to_dict(orient='records')))
@@ -0,0 +1,48 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from fastapi import HTTPException
+
+from .minrei_lib.profiling import profiled, record, span
+
+
+class BoundedExecutor:
+    """Runs blocking DB / pandas work on a fixed-size thread pool so it never blocks the event loop.
+
+    Cheap lookups and heavy VaR computations get separate executors, so a burst of
+    heavy requests queues behind its own workers instead of starving the cheap endpoints.
+    """
+
+    def __init__(self, name: str, max_workers: int, timeout: float):
+        self.name = name
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'minrei-{name}')
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Awaits func(*args, **kwargs) on the pool, in a copy of the caller's context so request spans and
+        profiles recorded by the worker land on the request. Time queued for a worker is the queue.<name> span.
+
+        Raises:
+            HTTPException: 504 when the call (including time queued) exceeds the executor timeout.
+                The worker thread finishes in the background; its result is discarded.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(self._pool, context.run, self._call, time.perf_counter(), partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f'{self.name} work timed out after {self.timeout}s')
+
+    def _call(self, submitted: float, func: Callable[[], Any]) -> Any:
+        record(f"queue.{self.name}", time.perf_counter() - submitted)
+        with span(f"run.{self.name}"):
+            return profiled(func)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
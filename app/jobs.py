@@ -0,0 +1,189 @@
+import datetime
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from .minrei_lib.profiling import request_spans, span
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class Job:
+    """One submitted computation. The worker thread writes its fields and pollers read them; revision
+    changes on every update (including each completed span) so event streams only send changes."""
+
+    def __init__(self, kind: str, params: dict, key: str, version: Any = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.version = version
+        self.key = key
+        self.status = QUEUED
+        self.progress: Optional[float] = None
+        self.error: Optional[str] = None
+        self.result: Any = None
+        self.submissions = 1
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.future: Optional[Future] = None
+        self._version = 0
+        self._spans: list[tuple[str, float]] = []
+
+    def update(self, **fields) -> None:
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self._version += 1
+
+    def report(self, fraction: float) -> None:
+        """Progress callback handed to the computation."""
+        self.update(progress=min(max(float(fraction), 0.0), 1.0))
+
+    @property
+    def revision(self) -> tuple[int, int]:
+        return self._version, len(self._spans)
+
+    def state(self) -> dict:
+        """JSON-ready status. stage is the last span the computation completed (e.g. sql.get-prices-range)."""
+        end = self.finished or time.time()
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.params,
+            'data_version': str(self.version) if self.version is not None else None,
+            'status': self.status,
+            'progress': self.progress,
+            'stage': self._spans[-1][0] if self._spans else None,
+            'error': self.error,
+            'submissions': self.submissions,
+            'submitted_at': _isoformat(self.submitted),
+            'started_at': _isoformat(self.started),
+            'finished_at': _isoformat(self.finished),
+            'seconds': end - self.started if self.started is not None else None,
+        }
+
+
+class JobQueue:
+    """Runs long computations (house-wide pnl vectors, backtests, stress runs) on a local thread pool
+    outside the request cycle, keeping finished results in memory for result_ttl seconds.
+
+    Jobs are keyed by kind, normalized parameters and data version (the latest valuation_date): a
+    submission identical to a queued, running or still-stored finished job on the same data returns that
+    job, so concurrent dashboard users share one computation and a nightly load starts a fresh one.
+    Failed and cancelled jobs are not reused. State is per process; run the app with one worker (or
+    sticky routing) for job ids to resolve on every request.
+    """
+
+    def __init__(self, max_workers: int = 2, result_ttl: float = 3600.0, max_results: int = 100):
+        """
+        Args:
+            max_workers (int, optional): Jobs run concurrently. Defaults to 2.
+            result_ttl (float, optional): Seconds a finished job and its result are kept. Defaults to 3600.
+            max_results (int, optional): Finished jobs kept, oldest dropped first. Defaults to 100.
+        """
+        self.max_workers = max_workers
+        self.result_ttl = result_ttl
+        self.max_results = max_results
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='minrei-jobs')
+        self._jobs: dict[str, Job] = {}
+        self._by_key: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kind: str, params: dict, version: Any = None) -> str:
+        return json.dumps([kind, str(version) if version is not None else None, params], sort_keys=True, default=str)
+
+    def submit(self, kind: str, params: dict, func: Callable[[Callable[[float], None]], Any], version: Any = None) -> Job:
+        """Queues func(report) unless an identical job is queued, running or stored.
+
+        Args:
+            kind (str): Job type.
+            params (dict): Normalized parameters, the deduplication key with kind and version.
+            func (Callable[[Callable[[float], None]], Any]): The computation. May call report(fraction).
+            version (Any, optional): Data version, e.g. Database.latest_valuation_date(). Defaults to None.
+
+        Returns:
+            Job: The new job, or the existing identical one.
+        """
+        key = self.key(kind, params, version)
+        with self._lock:
+            self._evict()
+            job = self._by_key.get(key)
+            if job is not None and job.status not in (FAILED, CANCELLED):
+                job.update(submissions=job.submissions + 1)
+                return job
+            job = Job(kind, params, key, version)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            job.future = self._pool.submit(self._run, job, func)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._evict()
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[Job]:
+        with self._lock:
+            self._evict()
+            return sorted(self._jobs.values(), key=lambda job: job.submitted)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancels a queued job, or drops a finished one and its result. Running jobs are left to finish.
+
+        Returns:
+            Optional[Job]: The job, None if unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == QUEUED and job.future.cancel():
+                job.update(status=CANCELLED, finished=time.time())
+            elif job.status in FINISHED:
+                self._drop(job)
+            return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {'max_workers': self.max_workers, 'result_ttl': self.result_ttl, **counts}
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job, func: Callable[[Callable[[float], None]], Any]) -> None:
+        job.update(status=RUNNING, started=time.time())
+        try:
+            with request_spans() as (spans, _):
+                job._spans = spans
+                with span(f"job.{job.kind}"):
+                    result = func(job.report)
+        except Exception as e:
+            job.update(status=FAILED, error=f"{type(e).__name__}: {e}", finished=time.time())
+        else:
+            job.update(status=DONE, result=result, progress=1.0, finished=time.time())
+
+    def _evict(self) -> None:
+        finished = sorted((job for job in self._jobs.values() if job.status in FINISHED), key=lambda job: job.finished)
+        expired = time.time() - self.result_ttl
+        for i, job in enumerate(finished):
+            if job.finished < expired or len(finished) - i > self.max_results:
+                self._drop(job)
+
+    def _drop(self, job: Job) -> None:
+        self._jobs.pop(job.id, None)
+        if self._by_key.get(job.key) is job:
+            del self._by_key[job.key]
+
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc).isoformat()
@@ -1,9 +1,41 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import var, utils
+from .dependencies import database_settings, executor_settings, job_settings, snapshot_store_settings, timing_settings, vector_store_settings
+from .executors import BoundedExecutor
+from .jobs import JobQueue
+from .minrei_lib import Database
+from .routers import jobs, var, utils
+from .timing import timing_middleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one pooled engine per worker process, tests may preset app.state.db
+    if getattr(app.state, 'db', None) is None:
+        app.state.db = Database(**database_settings())
+    app.state.vector_store = vector_store_settings()
+    app.state.snapshot_store = snapshot_store_settings()
+    app.state.timing = timing_settings()
+    settings = executor_settings()
+    app.state.io_executor = BoundedExecutor('io', **settings['io'])
+    app.state.compute_executor = BoundedExecutor('compute', **settings['compute'])
+    app.state.jobs = JobQueue(**job_settings())
+    if app.state.db.reference_cache is not None:
+        app.state.db.reference_cache.start() # warms in the background
+    yield
+    if app.state.db.reference_cache is not None:
+        app.state.db.reference_cache.stop()
+    app.state.io_executor.shutdown()
+    app.state.compute_executor.shutdown()
+    app.state.jobs.shutdown()
+    app.state.db.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+app.middleware('http')(timing_middleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,6 +47,7 @@ app.add_middleware(
 
 app.include_router(var.router)
 app.include_router(utils.router)
+app.include_router(jobs.router)
 
 @app.get("/")
 async def root():
@@ -1,7 +1,14 @@
 from .database import Database
+from .price_cache import PriceCache
+from .reference_cache import ReferenceCache
+from .pnl_store import RealizedPnlStore
+from .single_flight import SingleFlight
 from .facade import HetcoPortDatabase 
 from .portfolio_analysis import PortfolioAnalysis
 from .plot import Plot
 from .core import Core
+from .vector_store import PnlVectorStore
+from .backtest import VarBacktest
+from .snapshot_store import HOUSE_BOOK, SnapshotStore
 
-__all__ = ['Core', 'Database', 'HetcoPortDatabase', 'PortfolioAnalysis', 'Plot']
\ No newline at end of file
+__all__ = ['Core', 'Database', 'HetcoPortDatabase', 'PortfolioAnalysis', 'PnlVectorStore', 'Plot', 'PriceCache', 'RealizedPnlStore', 'ReferenceCache', 'SingleFlight', 'SnapshotStore', 'VarBacktest', 'HOUSE_BOOK']
\ No newline at end of file
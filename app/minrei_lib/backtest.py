@@ -0,0 +1,222 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.special import xlogy
+from scipy.stats import chi2
+
+from .database import Database
+from .instrument_matrix import InstrumentMatrix
+from .portfolio_analysis import PortfolioAnalysis
+
+# per-process state set by the pool initializers (or inline when max_workers=0)
+_worker: dict = {}
+
+
+class VarBacktest:
+    """Rolling historical VaR backtest: for every valuation_date, the book held that day is revalued over
+    the trailing lookback and its VaR compared with the next day's realized pnl.
+
+    Positions are loaded with one query per date covering every trader, in a process pool (one Database per
+    worker). Prices are loaded once for the union of px_locations into a single instrument matrix that every
+    date slides a window over; the matrix is shipped to each worker once, not per date.
+    """
+
+    @staticmethod
+    def run(
+            traders: Optional[list[str]],
+            start_date: str,
+            end_date: str,
+            lookback_days: int = 400,
+            tail: int = 251,
+            confidence_level: float = 0.95,
+            revaluation: str = 'delta',
+            max_workers: Optional[int] = None,
+            db_factory: Callable[[], Database] = Database,
+            progress: Optional[Callable[[float], None]] = None,
+        ) -> pd.DataFrame:
+        """
+        Args:
+            traders (Optional[list[str]]): Traders to backtest. None for every trader.
+            start_date (str): First valuation_date.
+            end_date (str): Last valuation_date.
+            lookback_days (int, optional): Calendar days of returns behind each date. Defaults to 400.
+            tail (int, optional): VaR observations. Defaults to 251.
+            confidence_level (float, optional): Defaults to 0.95.
+            revaluation (str, optional): 'delta' or 'taylor'. Defaults to 'delta'.
+            max_workers (Optional[int], optional): Pool size. 0 runs inline in this process. Defaults to None (CPU count).
+            db_factory (Callable[[], Database], optional): Builds each worker's Database; must be picklable
+                unless max_workers is 0. Defaults to Database.
+            progress (Optional[Callable[[float], None]], optional): Called with the completed fraction as
+                dates finish: positions loads are the first half, VaR the second. Defaults to None.
+
+        Returns:
+            pd.DataFrame: trader, valuation_date, var, pnl_date, realized_pnl and exception
+                (realized_pnl < var), one row per trader and valuation_date with both a VaR and a realized pnl.
+        """
+        db = db_factory()
+        traders = list(traders) if traders is not None else db.traders.list_traders()
+        realized = VarBacktest.realized_pnl(db, traders, start_date)
+        in_range = realized['valuation_date'].between(pd.Timestamp(start_date), pd.Timestamp(end_date))
+        dates = sorted(realized.loc[in_range & realized['realized_pnl'].notna(), 'valuation_date'].unique())
+        if not dates:
+            return pd.DataFrame(columns=['trader', 'valuation_date', 'var', 'pnl_date', 'realized_pnl', 'exception'])
+
+        positions = VarBacktest._map(
+            VarBacktest._load_positions, [(traders, date) for date in dates],
+            max_workers, VarBacktest._init_db_worker, (db_factory,),
+            VarBacktest._scaled(progress, 0.0, 0.5),
+        )
+        positions = [(date, df) for date, df in zip(dates, positions) if len(df)]
+
+        # one price load and one matrix for every date
+        px_locations = sorted(set().union(*(df['px_location'].unique() for _, df in positions)))
+        prices = db.prices.get_range(px_locations, pd.Timestamp(dates[0]) - pd.Timedelta(days=lookback_days), pd.Timestamp(dates[-1]))
+        matrix = InstrumentMatrix.from_prices(PortfolioAnalysis.calculate_returns(prices))
+        seasonal_indices = db.commodities.get_seasonal_index()
+
+        var = VarBacktest._map(
+            VarBacktest._date_var, positions,
+            max_workers, VarBacktest._init_compute_worker,
+            (matrix, seasonal_indices, lookback_days, tail, confidence_level, revaluation),
+            VarBacktest._scaled(progress, 0.5, 1.0),
+        )
+        results = pd.concat(var, ignore_index=True).merge(realized, on=['trader', 'valuation_date'], how='inner')
+        # a trader's last pnl date has no next day, and a date without price moves in its window has no VaR
+        results = results.dropna(subset=['var', 'realized_pnl'])
+        results['exception'] = results['realized_pnl'] < results['var']
+        return results.sort_values(['trader', 'valuation_date'], kind='stable').reset_index(drop=True)
+
+    @staticmethod
+    def realized_pnl(db: Database, traders: list[str], start_date: str = '-1') -> pd.DataFrame:
+        """Realized pnl the VaR of each valuation_date is tested against: dtd_pl of the trader's next pnl date.
+
+        Args:
+            db (Database).
+            traders (list[str]): Traders.
+            start_date (str, optional): First valuation_date. Defaults to '-1' (full history).
+
+        Returns:
+            pd.DataFrame: trader, valuation_date, pnl_date, realized_pnl.
+        """
+        pnl = db.traders.get_pnl(traders, start_date=start_date).rename(columns={'tradername': 'trader'})
+        pnl = pnl.sort_values(['trader', 'valuation_date'], kind='stable')
+        following = pnl.groupby('trader')
+        return pd.DataFrame({
+            'trader': pnl['trader'],
+            'valuation_date': pnl['valuation_date'],
+            'pnl_date': following['valuation_date'].shift(-1),
+            'realized_pnl': following['dtd_pl'].shift(-1),
+        }).reset_index(drop=True)
+
+    @staticmethod
+    def statistics(results: pd.DataFrame, confidence_level: float = 0.95) -> pd.DataFrame:
+        """Kupiec proportion-of-failures and Christoffersen independence / conditional coverage tests per trader.
+
+        Args:
+            results (pd.DataFrame): run output.
+            confidence_level (float, optional): Confidence level the VaR was computed at. Defaults to 0.95.
+
+        Returns:
+            pd.DataFrame: trader, observations, exceptions, expected, exception_rate, and lr / p-value of the
+                kupiec (pof), christoffersen (ind) and conditional coverage (cc) tests.
+        """
+        p = 1 - confidence_level
+        rows = []
+        for trader, df in results.sort_values('valuation_date', kind='stable').groupby('trader', sort=True):
+            hits = df['exception'].to_numpy(dtype=bool)
+            n, x = len(hits), int(hits.sum())
+            lr_pof = -2 * (xlogy(n - x, 1 - p) + xlogy(x, p) - xlogy(n - x, 1 - x / n) - xlogy(x, x / n))
+
+            # transitions between consecutive observations
+            prev, curr = hits[:-1], hits[1:]
+            n00, n01 = np.sum(~prev & ~curr), np.sum(~prev & curr)
+            n10, n11 = np.sum(prev & ~curr), np.sum(prev & curr)
+            pi0 = n01 / max(n00 + n01, 1)
+            pi1 = n11 / max(n10 + n11, 1)
+            pi = (n01 + n11) / max(n00 + n01 + n10 + n11, 1)
+            lr_ind = -2 * (
+                xlogy(n00 + n10, 1 - pi) + xlogy(n01 + n11, pi)
+                - xlogy(n00, 1 - pi0) - xlogy(n01, pi0) - xlogy(n10, 1 - pi1) - xlogy(n11, pi1)
+            )
+            rows.append({
+                'trader': trader,
+                'observations': n,
+                'exceptions': x,
+                'expected': n * p,
+                'exception_rate': x / n,
+                'pof_lr': lr_pof,
+                'pof_pvalue': chi2.sf(lr_pof, 1),
+                'ind_lr': lr_ind,
+                'ind_pvalue': chi2.sf(lr_ind, 1),
+                'cc_lr': lr_pof + lr_ind,
+                'cc_pvalue': chi2.sf(lr_pof + lr_ind, 2),
+            })
+        return pd.DataFrame(rows)
+
+    @staticmethod
+    def _map(
+            fn: Callable,
+            args: list[tuple],
+            max_workers: Optional[int],
+            initializer: Callable,
+            initargs: tuple,
+            progress: Optional[Callable[[float], None]] = None,
+        ) -> list:
+        if max_workers == 0:
+            initializer(*initargs)
+            results = (fn(*a) for a in args)
+            return VarBacktest._report(results, len(args), progress)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=initializer, initargs=initargs) as pool:
+            return VarBacktest._report(pool.map(fn, *zip(*args)), len(args), progress)
+
+    @staticmethod
+    def _report(results, n: int, progress: Optional[Callable[[float], None]]) -> list:
+        out = []
+        for result in results:
+            out.append(result)
+            if progress is not None:
+                progress(len(out) / n)
+        return out
+
+    @staticmethod
+    def _scaled(progress: Optional[Callable[[float], None]], start: float, stop: float) -> Optional[Callable[[float], None]]:
+        if progress is None:
+            return None
+        return lambda fraction: progress(start + (stop - start) * fraction)
+
+    @staticmethod
+    def _init_db_worker(db_factory: Callable[[], Database]) -> None:
+        _worker['db'] = db_factory()
+
+    @staticmethod
+    def _init_compute_worker(matrix, seasonal_indices, lookback_days, tail, confidence_level, revaluation) -> None:
+        _worker.update(
+            matrix=matrix,
+            seasonal_indices=seasonal_indices,
+            lookback_days=lookback_days,
+            tail=tail,
+            confidence_level=confidence_level,
+            revaluation=revaluation,
+        )
+
+    @staticmethod
+    def _load_positions(traders: list[str], date: pd.Timestamp) -> pd.DataFrame:
+        return _worker['db'].traders.get_positions_batch(traders, pd.Timestamp(date).strftime('%Y-%m-%d'))
+
+    @staticmethod
+    def _date_var(date: pd.Timestamp, positions: pd.DataFrame) -> pd.DataFrame:
+        """VaR per trader of one date's books over the matrix dates in (date - lookback_days, date]."""
+        matrix = _worker['matrix']
+        date = pd.Timestamp(date)
+        window = matrix.dates[(matrix.dates > date - pd.Timedelta(days=_worker['lookback_days'])) & (matrix.dates <= date)]
+
+        instruments = InstrumentMatrix.instrument_keys(positions, _worker['seasonal_indices'])
+        price_deltas = matrix.rows(matrix.lookup(instruments), window)
+        pnl = PortfolioAnalysis.revalue(price_deltas, positions, _worker['revaluation'])
+        keys, trader_pnl = PortfolioAnalysis.group_pnl(pnl, positions[['trader']])
+        var, _ = PortfolioAnalysis.risk_ladder(trader_pnl, (_worker['tail'],), (_worker['confidence_level'],))
+        keys['valuation_date'] = date
+        keys['var'] = var[:, 0, 0]
+        return keys
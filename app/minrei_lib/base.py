@@ -2,20 +2,62 @@ from typing import Optional, Dict, Any
 import pandas as pd
 from functools import wraps
 
-def query(sql_file: str):
-    """Decorator to mark methods as queries"""
+from .profiling import span
+from .single_flight import coalesce_key
+
+def query(sql_file: str, coalesce: bool = True):
+    """Decorator to mark methods as queries. Execution and post-processing are timed as the spans
+    sql.<file name> and process.<method name>.
+
+    With a SingleFlight on the Database, identical calls (same method, parameters and latest valuation_date)
+    share one execution and processed result. List parameters are sets to the templates (openjson), so
+    their order is ignored. The query behind the latest valuation_date passes coalesce=False.
+    """
+    sql_name = sql_file.removesuffix('.sql')
     def decorator(func):
-        @wraps(func)
-        def wrapper(self, *args, **kwargs):
-            # Get the params from the function
-            params = func(self, *args, **kwargs)
+        def execute(self, params):
             # Execute the query
-            raw_results = self._db._inject_and_execute_sql(sql_file, params)
+            with span(f"sql.{sql_name}"):
+                raw_results = self._db._inject_and_execute_sql(sql_file, params)
             # Process the results if a process_results method exists
             process_method = f"_process_{func.__name__}"
             if hasattr(self, process_method):
-                return getattr(self, process_method)(raw_results)
+                with span(f"process.{func.__name__}"):
+                    return getattr(self, process_method)(raw_results)
             return raw_results
+
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            # Get the params from the function
+            params = func(self, *args, **kwargs)
+            flight = getattr(self._db, 'single_flight', None) if coalesce else None
+            if flight is None:
+                return execute(self, params)
+            try:
+                key = coalesce_key(f"{sql_name}.{func.__qualname__}", self._db.latest_valuation_date(), params, unordered=params)
+            except TypeError:
+                return execute(self, params)
+            return flight.do(key, lambda: execute(self, params))
         return wrapper
     return decorator
 
+
+def query_chunks(sql_file: str, chunksize: int = 100_000):
+    """Decorator to mark methods as streaming queries. The decorated method yields result chunks of at
+    most `chunksize` rows (overridable per call with a chunksize keyword), each passed through
+    _process_<name> if it exists."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, chunksize: int = chunksize, **kwargs):
+            params = func(self, *args, **kwargs)
+            chunks = self._db._inject_and_execute_sql(sql_file, params, chunksize=chunksize)
+            process_method = getattr(self, f"_process_{func.__name__}", None)
+            for chunk in chunks:
+                if process_method is None:
+                    yield chunk
+                    continue
+                with span(f"process.{func.__name__}"):
+                    chunk = process_method(chunk)
+                yield chunk
+        return wrapper
+    return decorator
@@ -1,22 +1,53 @@
+from typing import Optional
+
 import pandas as pd
 
 from .base import query
+from .reference_cache import ReferenceCache
 
 
 class CommodityQueries:
-    def __init__(self, db):
+    def __init__(self, db, cache: Optional[ReferenceCache] = None):
         self._db = db
-    
+        self._cache = cache
+        if cache is not None:
+            cache.register('commodity_index', self.load_commodity_index, self.probe_commodity_index)
+            cache.register('seasonal_index', self.load_seasonal_index, self.probe_seasonal_index)
+
+    def get_commodity_index(self) -> pd.DataFrame:
+        """Get commodity index data (px_location, commoditygroup, supercommodity, sensitivitybucket).
+        Served from the reference cache when configured; treat the frame as read-only."""
+        if self._cache is not None:
+            return self._cache.get('commodity_index')
+        return self.load_commodity_index()
+
+    def get_seasonal_index(self) -> frozenset[str]:
+        """Get seasonal commodities (upper-case px_locations), from the reference cache when configured."""
+        if self._cache is not None:
+            return self._cache.get('seasonal_index')
+        return self.load_seasonal_index()
+
     @query("get-commodity-index.sql")
-    def get_commodity_index(self):
-        """Get commodity index data"""
+    def load_commodity_index(self):
         return {}  # No parameters needed for this query
 
+    @query("probe-commodity-index.sql", coalesce=False)
+    def probe_commodity_index(self):
+        return {}
+
+    def _process_probe_commodity_index(self, df: pd.DataFrame) -> tuple:
+        return tuple(df.iloc[0])
+
     @query("get-seasonal-index.sql")
-    def get_seasonal_index(self):
-        """Get seasonal commodities"""
+    def load_seasonal_index(self):
         return {}  # No parameters needed for this query
-    
-    def _process_get_seasonal_index(self, df: pd.DataFrame) -> list[str]:
-        df['px_location'] = df['px_location'].str.upper()
-        return df['px_location'].tolist()
\ No newline at end of file
+
+    def _process_load_seasonal_index(self, df: pd.DataFrame) -> frozenset[str]:
+        return frozenset(df['px_location'].str.upper())
+
+    @query("probe-seasonal-index.sql", coalesce=False)
+    def probe_seasonal_index(self):
+        return {}
+
+    def _process_probe_seasonal_index(self, df: pd.DataFrame) -> tuple:
+        return tuple(df.iloc[0])
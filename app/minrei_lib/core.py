@@ -1,39 +1,453 @@
-from typing import Union
+from typing import Collection, Optional, Union
 import numpy as np
 import pandas as pd
 
 from .portfolio_analysis import CUSTOM_SEPARATOR, PortfolioAnalysis
 from .database import Database
+from .instrument_matrix import InstrumentMatrix
 from .plot import Plot
+from .profiling import span
+from .single_flight import coalesced
+from .snapshot_store import HOUSE_BOOK, SnapshotStore
+from .vector_store import PnlVectorStore
+
+# seconds a pnl_vector_matrix is reused on the same latest valuation_date, so regrouping a book does not recompute it
+MATRIX_TTL = 300.0
 
 
 class Core:
 
     @staticmethod
-    def generate_pnl_vectors(trader: str, lookback_days: int = 400):
-        db = Database()
+    @coalesced('core.generate_pnl_vectors')
+    def generate_pnl_vectors(
+            trader: str,
+            lookback_days: int = 400,
+            db: Optional[Database] = None,
+            revaluation: str = 'delta',
+            vols: Optional[pd.DataFrame] = None,
+        ):
+        """PnL vectors of a trader's latest positions over lookback_days of price moves.
+
+        Args:
+            revaluation (str, optional): 'delta' (deltaposition only) or 'taylor' (delta-gamma-theta, plus
+                vega when vols is given). See PortfolioAnalysis.revalue. Defaults to 'delta'.
+            vols (Optional[pd.DataFrame], optional): Implied vol history for the vega term, see
+                PortfolioAnalysis.vol_changes. Defaults to None.
+        """
+        db = db or Database()
         positions = db.traders.get_positions_latest(trader)
         prices = db.prices.get_historical(positions['px_location'].unique(), lookback_days)
         prices = PortfolioAnalysis.calculate_returns(prices)
-        pnl_vectors = PortfolioAnalysis.ex_ante_portfolio_positions(positions, prices, db.commodities.get_seasonal_index(), use_prices=False)
-
-        # unparse
-        pnl_vectors.index = pnl_vectors.index.str.rsplit(CUSTOM_SEPARATOR, n=1, expand=True)
-        pnl_vectors.index.names = ['px_location', 'contract_month']
-        pnl_vectors.index = pnl_vectors.index.set_levels([
-            pnl_vectors.index.levels[0],
-            pd.to_datetime(pnl_vectors.index.levels[1])
-        ])
-        pnl_vectors = pnl_vectors.apply(list, axis=1).rename('pnl_vector')
-
-        df = pd.merge(positions.set_index(['px_location', 'contract_month']), pnl_vectors, left_index=True, right_index=True)
-        df = df.reset_index()
+        return Core._attach_pnl_vectors(positions, prices, db.commodities.get_seasonal_index(), revaluation, vols)
+
+    @staticmethod
+    @coalesced('core.generate_pnl_vectors_batch', unordered=('traders',))
+    def generate_pnl_vectors_batch(
+            traders: Optional[list[str]] = None,
+            lookback_days: int = 400,
+            db: Optional[Database] = None,
+            revaluation: str = 'delta',
+            vols: Optional[pd.DataFrame] = None,
+        ):
+        """PnL vectors for many traders in one pass: one positions query, one price query over the
+        union of px_locations, one returns matrix.
+
+        Args:
+            traders (Optional[list[str]], optional): Defaults to None (every trader in the tradermap).
+            revaluation (str, optional): See generate_pnl_vectors. Defaults to 'delta'.
+            vols (Optional[pd.DataFrame], optional): See generate_pnl_vectors. Defaults to None.
+
+        Returns:
+            pd.DataFrame: generate_pnl_vectors rows for all traders, with a trader column.
+        """
+        db = db or Database()
+        positions = db.traders.get_positions_latest_batch(traders)
+        prices = db.prices.get_historical(positions['px_location'].unique(), lookback_days)
+        prices = PortfolioAnalysis.calculate_returns(prices)
+        return Core._attach_pnl_vectors(positions, prices, db.commodities.get_seasonal_index(), revaluation, vols)
+
+    @staticmethod
+    @coalesced('core.pnl_vector_matrix', unordered=('traders',), ttl=MATRIX_TTL)
+    def pnl_vector_matrix(
+            traders: Optional[list[str]] = None,
+            lookback_days: int = 400,
+            db: Optional[Database] = None,
+            revaluation: str = 'delta',
+        ) -> tuple[pd.DataFrame, np.ndarray]:
+        """generate_pnl_vectors_batch as position rows and a read-only (rows x dates) matrix, the form
+        aggregate_pnl_vectors sums. With single flight on, reused for MATRIX_TTL seconds on the same latest
+        valuation_date.
+
+        Returns:
+            tuple[pd.DataFrame, np.ndarray]: Rows (with idx, without pnl_vector) and their pnl vectors.
+        """
+        db = db or Database()
+        positions = db.traders.get_positions_latest_batch(traders)
+        prices = db.prices.get_historical(positions['px_location'].unique(), lookback_days)
+        prices = PortfolioAnalysis.calculate_returns(prices)
+        matrix = InstrumentMatrix.from_prices(prices)
+        vectors = PortfolioAnalysis.position_pnl(positions, matrix, db.commodities.get_seasonal_index(), revaluation)
+        vectors.flags.writeable = False # shared by every caller while cached
+        df = positions.reset_index(drop=True)
+        df['idx'] = df['px_location'] + CUSTOM_SEPARATOR + df['contract_month'].astype(str)
+        return df, vectors
+
+    @staticmethod
+    @coalesced('core.generate_house_pnl_vectors')
+    def generate_house_pnl_vectors(
+            lookback_days: int = 400,
+            db: Optional[Database] = None,
+            revaluation: str = 'delta',
+        ):
+        """generate_pnl_vectors for the house book (HouseQueries.get_positions_latest, no tradermap weights)."""
+        db = db or Database()
+        positions = db.house.get_positions_latest()
+        prices = db.prices.get_historical(positions['px_location'].unique(), lookback_days)
+        prices = PortfolioAnalysis.calculate_returns(prices)
+        return Core._attach_pnl_vectors(positions, prices, db.commodities.get_seasonal_index(), revaluation)
+
+    @staticmethod
+    def build_snapshot(
+            store: SnapshotStore,
+            lookback_days: int = 400,
+            db: Optional[Database] = None,
+            traders: Optional[list[str]] = None,
+            dtype: str = 'float32',
+        ) -> pd.Timestamp:
+        """Computes pnl vectors for every trader (TraderQueries.list_traders) and the house book, and writes
+        them to the snapshot store. Same pipeline as generate_pnl_vectors_batch, with the house positions
+        revalued on the same price load so every book shares one date axis.
+
+        Args:
+            store (SnapshotStore): Destination.
+            traders (Optional[list[str]], optional): Defaults to None (list_traders).
+            dtype (str, optional): Stored float type. Defaults to 'float32'.
+
+        Returns:
+            pd.Timestamp: valuation_date of the snapshot.
+        """
+        db = db or Database()
+        traders = traders if traders is not None else db.traders.list_traders()
+        positions = pd.concat([
+            db.traders.get_positions_latest_batch(traders),
+            db.house.get_positions_latest().assign(trader=HOUSE_BOOK),
+        ], ignore_index=True)
+
+        prices = db.prices.get_historical(positions['px_location'].unique(), lookback_days)
+        matrix = InstrumentMatrix.from_prices(PortfolioAnalysis.calculate_returns(prices))
+        pnl = PortfolioAnalysis.position_pnl(positions, matrix, db.commodities.get_seasonal_index())
+
+        positions['idx'] = positions['px_location'] + CUSTOM_SEPARATOR + positions['contract_month'].astype(str)
+        valuation_date = positions['valuation_date'].max()
+        store.write(valuation_date, positions, pnl, matrix.dates, dtype=dtype)
+        return valuation_date
+
+    @staticmethod
+    def _attach_pnl_vectors(
+            positions: pd.DataFrame,
+            prices: pd.DataFrame,
+            seasonal_indices: Collection[str],
+            revaluation: str = 'delta',
+            vols: Optional[pd.DataFrame] = None,
+        ) -> pd.DataFrame:
+        """Adds a pnl_vector column to positions: one instrument matrix per price load, then a gather +
+        revaluation by the greeks, so instruments shared across traders cost nothing extra.
+        """
+        matrix = InstrumentMatrix.from_prices(prices)
+        vol_matrix = PortfolioAnalysis.vol_changes(vols) if vols is not None else None
+        pnl_vectors = PortfolioAnalysis.position_pnl(positions, matrix, seasonal_indices, revaluation, vol_matrix) # n x t-1
+
+        df = positions.reset_index(drop=True)
+        with span('analytics.pnl_vector_lists'):
+            df['pnl_vector'] = pnl_vectors.tolist()
+        df['idx'] = df['px_location'] + CUSTOM_SEPARATOR + df['contract_month'].astype(str)
+        return df
+
+    @staticmethod
+    @coalesced('core.mc_var')
+    def mc_var(
+            trader: str,
+            lookback_days: int = 400,
+            db: Optional[Database] = None,
+            revaluation: str = 'delta',
+            n_scenarios: int = 10_000,
+            confidence_levels: tuple[float, ...] = (0.95,),
+            ewma_lambda: Optional[float] = None,
+            shrinkage: Optional[float] = None,
+            n_factors: Optional[int] = None,
+            seed: Optional[int] = None,
+        ) -> pd.DataFrame:
+        """Monte Carlo VaR / ES of a trader's latest positions, see PortfolioAnalysis.mc_var."""
+        db = db or Database()
+        positions = db.traders.get_positions_latest(trader)
+        prices = db.prices.get_historical(positions['px_location'].unique(), lookback_days)
+        matrix = InstrumentMatrix.from_prices(PortfolioAnalysis.calculate_returns(prices))
+        return PortfolioAnalysis.mc_var(
+            positions, matrix, db.commodities.get_seasonal_index(),
+            revaluation=revaluation,
+            n_scenarios=n_scenarios,
+            confidence_levels=confidence_levels,
+            ewma_lambda=ewma_lambda,
+            shrinkage=shrinkage,
+            n_factors=n_factors,
+            seed=seed,
+        )
+
+    @staticmethod
+    @coalesced('core.var_attribution')
+    def var_attribution(
+            trader: Optional[str] = None,
+            top: Optional[int] = None,
+            lookback_days: int = 400,
+            db: Optional[Database] = None,
+            tail: int = 251,
+            confidence_level: float = 0.95,
+            bandwidth: Optional[float] = None,
+            revaluation: str = 'delta',
+        ) -> pd.DataFrame:
+        """Per-position VaR attribution of a trader's or the house book, largest contributors first.
+        See PortfolioAnalysis.var_attribution; marginal_var is component_var per unit of deltaposition.
+
+        Args:
+            trader (Optional[str], optional): Defaults to None (house book).
+            top (Optional[int], optional): Keep only the top contributors. Defaults to None (all).
+
+        Returns:
+            pd.DataFrame: positions (without pnl vectors) with idx, component_var, component_pct,
+                marginal_var and incremental_var, sorted by component_var (most negative first).
+        """
+        db = db or Database()
+        positions = db.traders.get_positions_latest(trader) if trader is not None else db.house.get_positions_latest()
+        prices = db.prices.get_historical(positions['px_location'].unique(), lookback_days)
+        matrix = InstrumentMatrix.from_prices(PortfolioAnalysis.calculate_returns(prices))
+        pnl = PortfolioAnalysis.position_pnl(positions, matrix, db.commodities.get_seasonal_index(), revaluation)
+
+        attribution = PortfolioAnalysis.var_attribution(pnl, tail, confidence_level, bandwidth)
+        df = positions.reset_index(drop=True)
+        df['idx'] = df['px_location'] + CUSTOM_SEPARATOR + df['contract_month'].astype(str)
+        df = pd.concat([df, attribution], axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df['marginal_var'] = df['component_var'] / df['deltaposition'].where(df['deltaposition'] != 0)
+        df = df.sort_values('component_var', kind='stable')
+        return df.head(top) if top is not None else df
+
+    @staticmethod
+    @coalesced('core.stress_pnl', unordered=('traders',))
+    def stress_pnl(
+            traders: Optional[list[str]] = None,
+            dates: Optional[list[str]] = None,
+            worst: int = 10,
+            lookback_days: int = 400,
+            db: Optional[Database] = None,
+            revaluation: str = 'delta',
+        ) -> pd.DataFrame:
+        """Latest books replayed over historical stress days: per trader, the pnl of each given date and of
+        the worst days in the lookback. Prices are loaded back to the earliest given date, but worst days
+        are ranked within lookback_days only.
+
+        Args:
+            traders (Optional[list[str]], optional): Defaults to None (every trader in the tradermap).
+            dates (Optional[list[str]], optional): Stress dates. Defaults to None (worst days only).
+            worst (int, optional): Worst days per trader. Defaults to 10.
+
+        Returns:
+            pd.DataFrame: trader, scenario ('date' or 'worst'), rank (worst days, 1 = worst), scenario_date
+                and pnl. pnl is NaN for given dates without price moves.
+        """
+        db = db or Database()
+        positions = db.traders.get_positions_latest_batch(traders)
+        stress_dates = pd.DatetimeIndex(pd.to_datetime(dates or []))
+        load_days = lookback_days
+        if len(stress_dates) and len(positions):
+            load_days = max(lookback_days, (positions['valuation_date'].max() - stress_dates.min()).days + 7)
+        prices = db.prices.get_historical(positions['px_location'].unique(), load_days)
+        matrix = InstrumentMatrix.from_prices(PortfolioAnalysis.calculate_returns(prices))
+        pnl = PortfolioAnalysis.position_pnl(positions, matrix, db.commodities.get_seasonal_index(), revaluation)
+        keys, trader_pnl = PortfolioAnalysis.group_pnl(pnl, positions[['trader']])
+        # the dates a lookback_days load has returns for: after its first price date
+        px_dates = prices['px_date']
+        window_start = px_dates[px_dates >= px_dates.max() - pd.Timedelta(days=lookback_days)].min()
+        in_window = np.asarray(matrix.dates > window_start)
+
+        frames = []
+        date_ids = matrix.dates.get_indexer(stress_dates)
+        if len(stress_dates):
+            values = np.full((len(keys), len(stress_dates)), np.nan)
+            found = date_ids >= 0
+            values[:, found] = trader_pnl[:, date_ids[found]]
+            frames.append(pd.DataFrame({
+                'trader': np.repeat(keys['trader'].to_numpy(), len(stress_dates)),
+                'scenario': 'date',
+                'rank': pd.NA,
+                'scenario_date': np.tile(stress_dates.to_numpy(), len(keys)),
+                'pnl': values.ravel(),
+            }))
+        window_pnl = trader_pnl[:, in_window]
+        n_worst = min(worst, window_pnl.shape[1])
+        if n_worst > 0:
+            worst_ids = np.argsort(window_pnl, axis=1, kind='stable')[:, :n_worst]
+            frames.append(pd.DataFrame({
+                'trader': np.repeat(keys['trader'].to_numpy(), n_worst),
+                'scenario': 'worst',
+                'rank': np.tile(np.arange(1, n_worst + 1), len(keys)),
+                'scenario_date': matrix.dates.to_numpy()[in_window][worst_ids].ravel(),
+                'pnl': np.take_along_axis(window_pnl, worst_ids, axis=1).ravel(),
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['trader', 'scenario', 'rank', 'scenario_date', 'pnl'])
+        return pd.concat(frames, ignore_index=True).sort_values(['trader', 'scenario'], kind='stable').reset_index(drop=True)
+
+    @staticmethod
+    def aggregate_pnl_vectors(
+            pnl_vectors: pd.DataFrame,
+            group_by: list[str],
+            custom_groups: Optional[dict[str, str]] = None,
+            tail: int = 251,
+            confidence_level: float = 0.95,
+            ladder_windows: tuple[int, ...] = (),
+            ladder_confidence_levels: tuple[float, ...] = (),
+            vectors: Optional[np.ndarray] = None,
+        ) -> pd.DataFrame:
+        """Sums generate_pnl_vectors rows per group and computes each group's VaR.
+
+        Args:
+            pnl_vectors (pd.DataFrame): generate_pnl_vectors / generate_pnl_vectors_batch output.
+            group_by (list[str]): Columns to group on. 'custom_group' reads custom_groups.
+            custom_groups (Optional[dict[str, str]], optional): idx -> group name. Rows not mapped fall back
+                to their px_location, like the grid's custom grouping.
+            ladder_windows (tuple[int, ...], optional): Extra VaR / ES windows, see PortfolioAnalysis.risk_ladder.
+            ladder_confidence_levels (tuple[float, ...], optional): Confidence levels for ladder_windows.
+            vectors (Optional[np.ndarray], optional): (rows x dates) pnl of pnl_vectors' rows when they carry no
+                pnl_vector column, e.g. a SnapshotStore selection. Defaults to None.
+
+        Returns:
+            pd.DataFrame: group keys, var, ladder columns (e.g. var_60d_99, es_251d_97_5) and the summed
+                pnl_vector per group.
+        """
+        groups = pnl_vectors.reindex(columns=[col for col in group_by if col != 'custom_group'])
+        if 'custom_group' in group_by:
+            groups['custom_group'] = pnl_vectors['idx'].map(custom_groups or {}).fillna(pnl_vectors['px_location'])
+        groups = groups[group_by]
+
+        if vectors is not None:
+            pnl = vectors
+        else:
+            pnl = np.array(pnl_vectors['pnl_vector'].tolist(), dtype=np.float64) if len(pnl_vectors) else np.empty((0, 0))
+        keys, group_pnl = PortfolioAnalysis.group_pnl(pnl, groups)
+        # var and the whole ladder from one partition per window
+        windows = tuple(dict.fromkeys((tail, *ladder_windows)))
+        levels = tuple(dict.fromkeys((confidence_level, *ladder_confidence_levels)))
+        var, es = PortfolioAnalysis.risk_ladder(group_pnl, windows, levels)
+        keys['var'] = var[:, 0, 0]
+        for metric, values in (('var', var), ('es', es)):
+            for window in ladder_windows:
+                for c in ladder_confidence_levels:
+                    keys[PortfolioAnalysis.ladder_column(metric, window, c)] = values[:, windows.index(window), levels.index(c)]
+        keys['pnl_vector'] = group_pnl.tolist()
+        return keys
+
+    @staticmethod
+    def refresh_pnl_vectors(
+            trader: str,
+            store: PnlVectorStore,
+            lookback_days: int = 400,
+            db: Optional[Database] = None,
+            revaluation: str = 'delta',
+        ):
+        """Same output as generate_pnl_vectors, maintained incrementally from the trader's stored state.
+
+        New price dates are appended and the oldest dropped using only the tail of each instrument's prices.
+        Instruments not in the previous state pull their own full history; changed greeks are just a
+        revaluation of the stored price moves. Falls back to a full build when there is no state or the
+        lookback changed. Taylor revaluation here has no vega term (no vol state is kept).
+        NOTE: contracts with gaps at the start of the window can differ slightly from a full recompute.
+        """
+        db = db or Database()
+        positions = db.traders.get_positions_latest(trader)
+        seasonal_indices = db.commodities.get_seasonal_index()
+        keys = InstrumentMatrix.instrument_keys(positions, seasonal_indices)
+        instruments = keys.drop_duplicates().reset_index(drop=True)
+        state = store.load(trader)
+
+        if state is None or int(state['lookback_days']) != lookback_days:
+            state = Core._build_unit_pnl_state(instruments, lookback_days, db)
+        else:
+            state = Core._update_unit_pnl_state(state, instruments, lookback_days, db)
+        state['valuation_date'] = np.datetime64(positions['valuation_date'].max(), 'ns')
+        store.save(trader, state)
+
+        state_keys = pd.MultiIndex.from_arrays([state['px_location'], state['month_key'], state['is_seasonal']])
+        rows = state_keys.get_indexer(pd.MultiIndex.from_frame(keys))
+        pnl_vectors = PortfolioAnalysis.revalue(state['unit_pnl'][rows], positions, revaluation)
+
+        df = positions.reset_index(drop=True)
+        with span('analytics.pnl_vector_lists'):
+            df['pnl_vector'] = pnl_vectors.tolist()
         df['idx'] = df['px_location'] + CUSTOM_SEPARATOR + df['contract_month'].astype(str)
         return df
 
     @staticmethod
-    def backtest_portfolio_gmv(trader: Union[str, pd.DataFrame], index: str = 'SPY500-N', lookback_days: int = 400):
-        db = Database()
+    def _unit_pnl(returns: pd.DataFrame, instruments: pd.DataFrame, dates) -> np.ndarray:
+        """(instruments x dates) price deltas. Missing prices on a date count as 0, unknown instruments as NaN."""
+        matrix = InstrumentMatrix.from_prices(returns)
+        return matrix.rows(matrix.lookup(instruments), pd.DatetimeIndex(dates))
+
+    @staticmethod
+    def _build_unit_pnl_state(instruments: pd.DataFrame, lookback_days: int, db: Database) -> dict:
+        prices = db.prices.get_historical(instruments['px_location'].unique(), lookback_days)
+        window_start = prices['px_date'].min()
+        returns = PortfolioAnalysis.calculate_returns(prices)
+        dates = np.sort(returns['px_date'].unique())
+        return {
+            'lookback_days': np.int64(lookback_days),
+            'window_dates': np.concatenate([[np.datetime64(window_start, 'ns')], dates.astype('datetime64[ns]')]),
+            'px_location': instruments['px_location'].to_numpy().astype(str),
+            'is_seasonal': instruments['is_seasonal'].to_numpy(),
+            'month_key': instruments['month_key'].to_numpy(),
+            'unit_pnl': Core._unit_pnl(returns, instruments, dates),
+        }
+
+    @staticmethod
+    def _update_unit_pnl_state(state: dict, instruments: pd.DataFrame, lookback_days: int, db: Database) -> dict:
+        window_dates = pd.DatetimeIndex(state['window_dates'])
+        last_date = window_dates[-1]
+
+        # tail: only dates after the stored window, for every current instrument
+        tail = db.prices.get_range(list(instruments['px_location'].unique()), last_date - pd.Timedelta(days=7), pd.Timestamp('9999-12-31'))
+        tail = PortfolioAnalysis.calculate_returns(tail)
+        new_dates = pd.DatetimeIndex(np.sort(tail['px_date'].unique()))
+        new_dates = new_dates[new_dates > last_date]
+        window_dates = window_dates.append(new_dates)
+
+        old_keys = pd.MultiIndex.from_arrays([state['px_location'], state['month_key'], state['is_seasonal']])
+        rows = old_keys.get_indexer(pd.MultiIndex.from_frame(instruments))
+        kept = rows >= 0
+
+        unit_pnl = np.full((len(instruments), len(window_dates) - 1), np.nan)
+        unit_pnl[kept, :len(window_dates) - 1 - len(new_dates)] = state['unit_pnl'][rows[kept]]
+        if len(new_dates):
+            unit_pnl[kept, -len(new_dates):] = Core._unit_pnl(tail, instruments[kept], new_dates)
+
+        if (~kept).any(): # new instruments need their full window
+            added = instruments[~kept]
+            prices = db.prices.get_historical(added['px_location'].unique(), lookback_days, start_date=window_dates[-1].strftime('%Y-%m-%d'))
+            unit_pnl[~kept] = Core._unit_pnl(PortfolioAnalysis.calculate_returns(prices), added, window_dates[1:])
+
+        # slide: drop dates before the lookback cutoff; the first date left only anchors returns
+        keep = window_dates >= window_dates[-1] - pd.Timedelta(days=lookback_days)
+        start = np.argmax(keep)
+        return {
+            'lookback_days': np.int64(lookback_days),
+            'window_dates': window_dates[start:].to_numpy().astype('datetime64[ns]'),
+            'px_location': instruments['px_location'].to_numpy().astype(str),
+            'is_seasonal': instruments['is_seasonal'].to_numpy(),
+            'month_key': instruments['month_key'].to_numpy(),
+            'unit_pnl': unit_pnl[:, start:],
+        }
+
+    @staticmethod
+    def backtest_portfolio_gmv(trader: Union[str, pd.DataFrame], index: str = 'SPY500-N', lookback_days: int = 400, db: Optional[Database] = None):
+        db = db or Database()
         index_log_returns = PortfolioAnalysis.calculate_returns(db.prices.get_historical(index, lookback_days))
         index_log_returns = index_log_returns.set_index('px_date')['log_return']
 
@@ -42,8 +456,8 @@ class Core:
         exante_portfolio = PortfolioAnalysis.ex_ante_portfolio_positions(trader_positions, trader_prices, db.commodities.get_seasonal_index(), use_prices=True)
 
 
-        var_1y = PortfolioAnalysis.var(exante_portfolio.sum(axis=0).diff().dropna())
-        var_3m = PortfolioAnalysis.var(exante_portfolio.sum(axis=0).diff().dropna(), 60)
+        var, _ = PortfolioAnalysis.risk_ladder(exante_portfolio.sum(axis=0).diff().dropna().to_numpy().reshape(1, -1), (251, 60))
+        var_1y, var_3m = var[0, :, 0]
         starting_gmv = exante_portfolio.iloc[:, 0].abs().sum()
         ending_gmv = exante_portfolio.iloc[:, -1].abs().sum()
         ending_nmv = exante_portfolio.iloc[:, -1].sum()
@@ -1,31 +1,101 @@
 from collections.abc import Sequence
-from typing import Dict, Optional
+from typing import Any, Dict, Iterator, Optional, Union
+import datetime
+import json
 import urllib
 import os
 
+import numpy as np
 import pandas as pd
 import sqlalchemy as sa
 
 from .commodities import CommodityQueries
+from .price_cache import PriceCache
 from .prices import PriceQueries
 from .traders import TraderQueries
 from .house import HouseQueries
+from .pnl_store import RealizedPnlStore
+from .reference_cache import ReferenceCache
+from .single_flight import SingleFlight
 
 MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
 SQL_DIRECTORY = os.path.join(MODULE_DIR, "sql")
 
+
+def _load_sql_templates(directory: str) -> Dict[str, tuple[sa.TextClause, tuple[str, ...]]]:
+    """Reads and compiles every .sql file once. Templates take values as :name bind parameters, so the
+    statement text never changes between calls and SQL Server reuses its cached plan.
+
+    Returns:
+        Dict[str, tuple[sa.TextClause, tuple[str, ...]]]: File name -> (statement, bind parameter names).
+    """
+    templates = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.sql'):
+            with open(os.path.join(directory, name), 'r') as f:
+                statement = sa.text(f.read())
+            templates[name] = (statement, tuple(statement.compile().params))
+    return templates
+
+
+SQL_TEMPLATES = _load_sql_templates(SQL_DIRECTORY)
+
+
 class Database:
-    def __init__(self, debug: bool = False):
+    def __init__(
+            self,
+            debug: bool = False,
+            engine: Optional[sa.Engine] = None,
+            pool_size: int = 5,
+            max_overflow: int = 10,
+            pool_recycle: int = 1800,
+            pool_pre_ping: bool = True,
+            pool_timeout: int = 30,
+            price_cache: Optional[PriceCache] = None,
+            reference_cache: Optional[ReferenceCache] = None,
+            pnl_store: Optional[RealizedPnlStore] = None,
+            single_flight: Optional[SingleFlight] = None,
+        ):
+        """Database handle. Holds a single pooled engine, so create one per process and share it.
+
+        Args:
+            debug (bool, optional): Prints executed SQL. Defaults to False.
+            engine (Optional[sa.Engine], optional): Pre-built engine (e.g. a SQLite stand-in for testing).
+                Pool settings are ignored when given. Defaults to None (connect to the risk server).
+            pool_size (int, optional): Connections kept open in the pool. Defaults to 5.
+            max_overflow (int, optional): Connections allowed above pool_size under load. Defaults to 10.
+            pool_recycle (int, optional): Seconds before a connection is recycled. Defaults to 1800.
+            pool_pre_ping (bool, optional): Tests connections on checkout. Defaults to True.
+            pool_timeout (int, optional): Seconds to wait for a free connection. Defaults to 30.
+            price_cache (Optional[PriceCache], optional): Cache for PriceQueries.get_historical. Defaults to None (no caching).
+            reference_cache (Optional[ReferenceCache], optional): Cache for the seasonal index, commodity index
+                and trader list. Defaults to None (query on every call).
+            pnl_store (Optional[RealizedPnlStore], optional): Date-partitioned local copy of historical_pl and
+                trader pnl for get_pnl / get_historical_pl. Defaults to None (query on every call).
+            single_flight (Optional[SingleFlight], optional): Coalesces identical concurrent queries and Core
+                computations, keyed by the latest valuation_date from reference_cache. Defaults to None.
+        """
         self.debug = debug
-        self.engine = self._init_risk_engine()
+        if engine is None:
+            engine = self._init_risk_engine(
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_recycle=pool_recycle,
+                pool_pre_ping=pool_pre_ping,
+                pool_timeout=pool_timeout,
+            )
+        self.engine = engine
+        self.reference_cache = reference_cache
+        self.pnl_store = pnl_store
+        self.single_flight = single_flight
 
         # Initialize query interfaces
-        self.traders = TraderQueries(self)
-        self.house = HouseQueries(self)
-        self.prices = PriceQueries(self)
-        self.commodities = CommodityQueries(self)
+        self.traders = TraderQueries(self, cache=reference_cache, pnl_store=pnl_store)
+        self.house = HouseQueries(self, pnl_store=pnl_store)
+        self.prices = PriceQueries(self, cache=price_cache)
+        self.commodities = CommodityQueries(self, cache=reference_cache)
     
-    def _init_risk_engine(self, server='nysqlrisk01', db='dbrisk', driver='{ODBC Driver 17 for SQL Server}'):
+    def _init_risk_engine(self, server='nysqlrisk01', db='dbrisk', driver='{ODBC Driver 17 for SQL Server}', **pool_kwargs):
         # Trusted connection to instance
         params = urllib.parse.quote_plus(f"DRIVER={driver};"
                                         f"SERVER={server};"
@@ -33,7 +103,7 @@ class Database:
                                         "Trusted_Connection=Yes")
 
         # Connect using the specified parameters
-        engine = sa.create_engine("mssql+pyodbc:///?odbc_connect={}".format(params))
+        engine = sa.create_engine("mssql+pyodbc:///?odbc_connect={}".format(params), **pool_kwargs)
         self.log(f'Successfully connected to db server: {server}')
         return engine
     
@@ -41,37 +111,70 @@ class Database:
             self,
             query_file: str,
             params: Optional[Dict[str, any]] = None,
-        ) -> pd.DataFrame:
-        """Injects parameters into a SQL query file and executes it.
+            chunksize: Optional[int] = None,
+        ) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+        """Binds parameters to a precompiled SQL template and executes it.
 
         Args:
             query_file (str): Name of SQL file to execute.
-            params (Optional[Dict[str, any]], optional): Dictionary of parameters to inject into query.
+            params (Optional[Dict[str, any]], optional): Values for the template's :name parameters.
+                Lists are bound as a single JSON array.
+            chunksize (Optional[int], optional): Stream results as DataFrames of at most this many rows.
+                The connection is held until the iterator is exhausted or closed. Defaults to None.
 
         Returns:
-            pd.DataFrame: Contains query results.
+            Union[pd.DataFrame, Iterator[pd.DataFrame]]: Contains query results.
         """
-        query_path = os.path.join(SQL_DIRECTORY, query_file)
-        if not query_path:
+        if query_file not in SQL_TEMPLATES:
             raise FileNotFoundError(f"SQL file not found: {query_file}")
-        
+        statement, names = SQL_TEMPLATES[query_file]
+
+        params = params or {}
+        missing = [name for name in names if name not in params]
+        if missing:
+            raise ValueError(f"Missing required parameter: {missing[0]}")
+        bound = {name: self._bind_value(params[name]) for name in names}
+
         try:
-            with open(query_path, 'r') as f:
-                sql_template = f.read()
-                params = params or {}
-                sql_query = sql_template.format(**{
-                    k: v
-                    for k, v in params.items()
-                })
-                self.log(sql_query)
-                return pd.read_sql_query(sql_query, self.engine)
-
-        except KeyError as e:
-            raise ValueError(f"Missing required parameter: {str(e)}")
-        except ValueError as e:
-            raise ValueError(f"Parameter validation failed: {str(e)}")
+            self.log(f"{query_file} {bound}")
+            return pd.read_sql_query(statement, self.engine, params=bound, chunksize=chunksize)
         except Exception as e:
             raise type(e)(f"Query execution failed: {str(e)}")
+
+    @staticmethod
+    def _bind_value(value: Any) -> Any:
+        """Converts a parameter to a DBAPI value. Lists are sent as one JSON array string that templates
+        unpack with openjson into a table variable, so a ticker list of any size is a single parameter."""
+        if isinstance(value, (list, tuple, set, np.ndarray, pd.Index, pd.Series)):
+            return json.dumps([str(v) for v in value])
+        if isinstance(value, (pd.Timestamp, datetime.date)):
+            return str(value)
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+    
+    def pool_status(self) -> Dict[str, Any]:
+        """Connection pool metrics. Counters not supported by the pool class (e.g. SQLite's) are None."""
+        pool = self.engine.pool
+        def _metric(name):
+            fn = getattr(pool, name, None)
+            return fn() if callable(fn) else None
+        return {
+            'pool_class': type(pool).__name__,
+            'size': _metric('size'),
+            'checked_in': _metric('checkedin'),
+            'checked_out': _metric('checkedout'),
+            'overflow': _metric('overflow'),
+            'status': pool.status(),
+        }
+
+    def latest_valuation_date(self) -> Optional[pd.Timestamp]:
+        """Data version for single-flight keys, see TraderQueries.latest_valuation_date."""
+        return self.traders.latest_valuation_date()
+
+    def dispose(self) -> None:
+        """Closes all pooled connections."""
+        self.engine.dispose()
     
     def log(self, message: str) -> None:
         if self.debug:
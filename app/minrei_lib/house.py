@@ -1,38 +1,68 @@
+from typing import Iterator, Optional
+
 import pandas as pd
 
-from .base import query
+from .base import query, query_chunks
+from .pnl_store import RealizedPnlStore
+from .positions import normalize_positions
 
 
 class HouseQueries:
-    def __init__(self, db):
+    def __init__(self, db, pnl_store: Optional[RealizedPnlStore] = None):
         self._db = db
-    
+        self._pnl_store = pnl_store
+        if pnl_store is not None:
+            # also serves TraderQueries.get_historical_pl
+            pnl_store.register('historical_pl', self.load_historical_pl, schema={
+                'valuation_date': 'datetime64[ns]', 'var_level': 'object', 'level_name': 'object',
+                'price_date': 'datetime64[ns]', 'pl': 'float64', 'supercommodity': 'object',
+            })
+
     @query("get-house-positions-latest.sql")
     def get_positions_latest(self) -> pd.DataFrame:
         return {}
 
     def _process_get_positions_latest(self, df: pd.DataFrame) -> pd.DataFrame:
-        df['valuation_date'] = pd.to_datetime(df['valuation_date'])
-        df['px_location'] = df['px_location'].str.upper()
-        df['px_location'] = df['px_location'].str.strip()
-        # group positions
-        cols_to_index = ['valuation_date', 'px_location', 'forward_month']
-        cols_to_sum = ['deltaposition', 'gammaposition', 'thetaposition', 'vegaposition']
-        cols_to_first = list(set(df.columns) - set(cols_to_sum) - set(cols_to_index))
-        df = df.groupby(cols_to_index).agg({
-            **{col: 'sum' for col in cols_to_sum},
-            **{col: 'first' for col in cols_to_first}
-        }).reset_index()
-        return df
-    
-    @query("get-house-historical-pl.sql")
-    def get_historical_pl(self, var_levels: list[str], start_valuation_date: str = '-1'):
+        # house positions carry no tradermap weight
+        return normalize_positions(df, apply_weight=False)
+
+    def get_historical_pl(self, var_levels: list[str], start_valuation_date: str = '-1', end_valuation_date: str = '-1') -> pd.DataFrame:
+        """Historical pl vectors of var levels, through the realized pnl store when configured.
+
+        Args:
+            var_levels (list[str]): Var levels.
+            start_valuation_date (str, optional): First valuation_date. Defaults to '-1' (only the latest
+                valuation_date with pl for these levels).
+            end_valuation_date (str, optional): Last valuation_date. Defaults to '-1' (latest).
+        """
         if isinstance(var_levels, str):
             var_levels = [var_levels]
 
-        var_levels = ", ".join(f"'{name}'" for name in var_levels)
-        var_levels = f"({var_levels})"
+        if self._pnl_store is None:
+            return self.query_historical_pl(var_levels, start_valuation_date, end_valuation_date)
+        return self._pnl_store.read(
+            'historical_pl',
+            start_date=None if start_valuation_date == '-1' else start_valuation_date,
+            end_date=None if end_valuation_date == '-1' else end_valuation_date,
+            filters={'var_level': list(var_levels)},
+            latest=start_valuation_date == '-1',
+        )
+
+    @query("get-house-historical-pl.sql")
+    def query_historical_pl(self, var_levels: list[str], start_valuation_date: str = '-1', end_valuation_date: str = '-1'):
+        return {
+            'var_levels': list(var_levels),
+            'start_valuation_date': start_valuation_date,
+            'end_valuation_date': end_valuation_date,
+        }
+
+    @query_chunks("get-historical-pl-since.sql")
+    def load_historical_pl(self, start_valuation_date: str = '-1') -> Iterator[pd.DataFrame]:
+        """historical_pl of every level from start_valuation_date on, streamed into the realized pnl store."""
         return {
-            'var_levels': var_levels,
-            'start_valuation_date': start_valuation_date
-        }
\ No newline at end of file
+            'start_valuation_date': start_valuation_date,
+        }
+
+    def _process_load_historical_pl(self, df: pd.DataFrame) -> pd.DataFrame:
+        df['valuation_date'] = pd.to_datetime(df['valuation_date'])
+        return df
@@ -0,0 +1,163 @@
+from typing import Collection, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .profiling import timed
+
+
+class InstrumentMatrix:
+    """Dense (instruments x dates) float64 matrix built once per price load.
+
+    Each price row is scattered twice: into its contract series (px_location, contract_month), used by
+    seasonal positions, and into its rolling forward-month series (px_location, forward_month), used by
+    everything else. Instruments are addressed by integer row ids, so scaling by positions is a NumPy
+    gather + multiply with no string keys.
+    """
+
+    def __init__(self, dates: np.ndarray, keys: pd.MultiIndex, values: np.ndarray):
+        self.dates = pd.DatetimeIndex(dates)
+        self.keys = keys # (px_location, month_key, is_seasonal)
+        self.values = values
+
+    @classmethod
+    @timed('analytics.from_prices')
+    def from_prices(cls, prices: pd.DataFrame, value: str = 'price_delta') -> 'InstrumentMatrix':
+        """
+        Args:
+            prices (pd.DataFrame): Long price table (calculate_returns output for price_delta).
+            value (str, optional): 'price_delta' (missing dates are 0, i.e. price did not move) or
+                'price' (missing dates are forward then back filled). Defaults to 'price_delta'.
+        """
+        date_ids, dates, contract_ids, series_ids, keys = InstrumentMatrix._factorize(prices)
+        values = np.full((len(keys), len(dates)), np.nan)
+        data = prices[value].to_numpy(dtype=np.float64)
+        values[contract_ids, date_ids] = data
+        values[series_ids, date_ids] = data
+        if value == 'price':
+            values = pd.DataFrame(values.T).ffill().bfill().to_numpy().T.copy()
+        else:
+            values = np.nan_to_num(values, nan=0.0)
+        return cls(dates, keys, values)
+
+    @classmethod
+    @timed('analytics.from_levels')
+    def from_levels(cls, levels: pd.DataFrame, value: str = 'price') -> 'InstrumentMatrix':
+        """Matrix of day-over-day changes straight from a level history (e.g. implied vols), without a
+        calculate_returns pass: the same moves as from_prices over _calculate_price_delta output with NaN
+        moves dropped, at the cost of a single key factorization.
+
+        Each contract's change is its level less its previous observed level, taken along the dense
+        contract rows. Forward-month series read the change of the contract they held on that date.
+        Dates with no change at all (e.g. the first) are dropped.
+
+        Args:
+            levels (pd.DataFrame): Level history in the price table layout.
+            value (str, optional): Level column. Defaults to 'price'.
+        """
+        date_ids, dates, contract_ids, series_ids, keys = InstrumentMatrix._factorize(levels)
+        n_contracts = int(keys.get_level_values(2).to_numpy().sum())
+
+        cells = contract_ids * len(dates) + date_ids # flat (contract, date) cells
+        contract_levels = np.full((n_contracts, len(dates)), np.nan)
+        observed = np.zeros((n_contracts, len(dates)), dtype=bool)
+        contract_levels.ravel()[cells] = levels[value].to_numpy(dtype=np.float64)
+        observed.ravel()[cells] = True
+        # column of each contract's previous observation, -1 before its first
+        last_seen = np.where(observed, np.arange(len(dates)), -1)
+        np.maximum.accumulate(last_seen, axis=1, out=last_seen)
+        previous = np.full_like(last_seen, -1)
+        previous[:, 1:] = last_seen[:, :-1]
+        changes = contract_levels - np.take_along_axis(contract_levels, np.maximum(previous, 0), axis=1)
+        changes[previous < 0] = np.nan
+        keep = ~np.isnan(changes).all(axis=0)
+
+        values = np.zeros((len(keys), len(dates)))
+        values[:n_contracts] = changes
+        values.ravel()[series_ids * len(dates) + date_ids] = changes.ravel()[cells]
+        values = np.nan_to_num(values.compress(keep, axis=1), nan=0.0, copy=False) # stays C-ordered for row gathers
+        return cls(dates[keep], keys, values)
+
+    @staticmethod
+    def _factorize(prices: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, pd.MultiIndex]:
+        """Date ids, sorted dates, contract row ids, forward-month series ids (offset by the contract
+        rows) and the row keys of a long price table."""
+        date_ids, dates = pd.factorize(prices['px_date'].to_numpy(), sort=True)
+        location_ids, locations = pd.factorize(prices['px_location']) # no object copy of string columns
+        contract_ids, contracts = InstrumentMatrix._factorize_pairs(location_ids, InstrumentMatrix.month_ns(prices['contract_month']))
+        series_ids, series = InstrumentMatrix._factorize_pairs(location_ids, prices['forward_month'].to_numpy(dtype=np.int64))
+        n_contracts = len(contracts[0])
+
+        keys = pd.MultiIndex.from_arrays([
+            np.asarray(locations, dtype=object)[np.concatenate([contracts[0], series[0]])],
+            np.concatenate([contracts[1], series[1]]),
+            np.concatenate([np.ones(n_contracts, dtype=bool), np.zeros(len(series[0]), dtype=bool)]),
+        ])
+        return date_ids, dates, contract_ids, n_contracts + series_ids, keys
+
+    @staticmethod
+    def _factorize_pairs(location_ids: np.ndarray, months: np.ndarray) -> tuple[np.ndarray, tuple[np.ndarray, np.ndarray]]:
+        """Factorizes (location id, month) pairs through one int64 key instead of a tuple MultiIndex.
+
+        Returns:
+            ids per row, and (location id, month) per unique pair.
+        """
+        month_ids, month_values = pd.factorize(months)
+        pair_ids, pairs = pd.factorize(location_ids.astype(np.int64) * len(month_values) + month_ids)
+        return pair_ids, (pairs // len(month_values), np.asarray(month_values, dtype=np.int64)[pairs % len(month_values)])
+
+    @staticmethod
+    def month_ns(months: pd.Series) -> np.ndarray:
+        return months.to_numpy().astype('datetime64[ns]').astype(np.int64)
+
+    @staticmethod
+    def instrument_keys(positions: pd.DataFrame, seasonal_indices: Collection[str]) -> pd.DataFrame:
+        """Series each position draws returns from: contract_month (in ns) for seasonal px_locations,
+        else forward_month."""
+        is_seasonal = positions['px_location'].isin(seasonal_indices).to_numpy()
+        month_key = np.where(
+            is_seasonal,
+            InstrumentMatrix.month_ns(positions['contract_month']),
+            positions['forward_month'].to_numpy(dtype=np.int64),
+        )
+        return pd.DataFrame({
+            'px_location': positions['px_location'].to_numpy().astype(str),
+            'month_key': month_key,
+            'is_seasonal': is_seasonal,
+        })
+
+    @staticmethod
+    def key_index(instruments: pd.DataFrame) -> pd.MultiIndex:
+        """instrument_keys rows as a MultiIndex, to look up in several matrices."""
+        return pd.MultiIndex.from_arrays([
+            instruments['px_location'].to_numpy(),
+            instruments['month_key'].to_numpy(dtype=np.int64),
+            instruments['is_seasonal'].to_numpy(dtype=bool),
+        ])
+
+    def lookup(self, instruments: Union[pd.DataFrame, pd.MultiIndex]) -> np.ndarray:
+        """Row ids for instrument_keys rows (or their key_index), -1 where the instrument has no prices."""
+        if not isinstance(instruments, pd.MultiIndex):
+            instruments = InstrumentMatrix.key_index(instruments)
+        return self.keys.get_indexer(instruments)
+
+    def rows(self, ids: np.ndarray, dates: Optional[pd.DatetimeIndex] = None, missing: float = np.nan) -> np.ndarray:
+        """Gathers (len(ids) x dates) rows. Unknown instruments are missing (NaN), dates outside the matrix are 0."""
+        if dates is None:
+            date_ids = np.arange(len(self.dates))
+        else:
+            date_ids = self.dates.get_indexer(dates)
+        if not len(self.values):
+            return np.full((len(ids), len(date_ids)), missing)
+        # one gather of the requested rows x dates, no full-matrix reindex
+        if dates is None or np.array_equal(date_ids, np.arange(len(self.dates))):
+            out = self.values[np.maximum(ids, 0)]
+        else:
+            out = self.values[np.ix_(np.maximum(ids, 0), np.maximum(date_ids, 0))]
+            out[:, date_ids < 0] = 0.0
+        out[ids < 0] = missing
+        return out
+
+    def scale(self, instruments: pd.DataFrame, weights: np.ndarray, dates: Optional[pd.DatetimeIndex] = None) -> np.ndarray:
+        """(n x dates) rows scaled by weights, e.g. deltaposition."""
+        return np.asarray(weights, dtype=np.float64).reshape(-1, 1) * self.rows(self.lookup(instruments), dates)
@@ -0,0 +1,311 @@
+from contextlib import contextmanager, suppress
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Union
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+
+class PnlSource(NamedTuple):
+    load: Callable[[str], Iterable[pd.DataFrame]] # start valuation_date ('-1' for all) -> chunks in valuation_date order
+    schema: dict[str, str] # column -> dtype, for reads of an empty store
+
+
+class PnlPartition(NamedTuple):
+    start: pd.Timestamp # first valuation_date in the file
+    end: pd.Timestamp # last valuation_date in the file
+    path: str
+
+
+class RealizedPnlStore:
+    """Realized pnl tables (historical_pl, Trader_PL_SystemGenerate) kept on local disk as Parquet files
+    partitioned by valuation_date (requires pyarrow).
+
+    A sync only queries dates from revision_days before the newest stored valuation_date on: those dates are
+    re-pulled and replaced, so late 'actual' rows and other revisions are picked up, older ones are treated as
+    immutable. Dates are written one file per valuation_date; once a month is entirely outside the revision
+    window its days are compacted into one file named by its first and last date, so a multi-year read opens
+    a few dozen files. Reads sync at most every refresh_interval seconds, then open
+    only the files overlapping the requested date window, filtering levels and dates inside the Parquet scan.
+
+    The directory may be shared by several worker processes: syncs take a lock file per source, and files
+    are written under unique temporary names then renamed into place. A failed sync is kept in stats() and
+    reads serve the partitions already on disk.
+    """
+
+    def __init__(self, directory: str, refresh_interval: float = 300.0, revision_days: int = 7):
+        """
+        Args:
+            directory (str): Root directory, one subdirectory per source.
+            refresh_interval (float, optional): Seconds between syncs triggered by reads. 0 syncs on every
+                read. Defaults to 300.
+            revision_days (int, optional): Calendar days before the newest stored valuation_date re-pulled by
+                every sync. 0 only re-pulls the newest date. Defaults to 7.
+        """
+        self.directory = directory
+        self.refresh_interval = refresh_interval
+        self.revision_days = revision_days
+        self._sources: dict[str, PnlSource] = {}
+        self._partitions: dict[str, list[PnlPartition]] = {}
+        self._synced: dict[str, float] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._errors: dict[str, str] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def register(self, name: str, load: Callable[[str], Iterable[pd.DataFrame]], schema: Optional[dict[str, str]] = None) -> None:
+        """Declares a source.
+
+        Args:
+            name (str): Source name, also its subdirectory.
+            load (Callable[[str], Iterable[pd.DataFrame]]): Rows with valuation_date on or after a
+                '%Y-%m-%d' date ('-1' for the full history), as frames ordered by valuation_date.
+            schema (Optional[dict[str, str]], optional): Column -> dtype of the loaded frames, the columns of
+                reads while nothing is stored (first run, empty table). Defaults to None (valuation_date only).
+        """
+        self._sources[name] = PnlSource(load, schema or {'valuation_date': 'datetime64[ns]'})
+        self._locks.setdefault(name, threading.Lock())
+        os.makedirs(os.path.join(self.directory, name), exist_ok=True)
+
+    def sync(self, name: str) -> int:
+        """Pulls dates from the revision window on, then compacts months before it.
+
+        Returns:
+            int: Rows written.
+        """
+        with self._locks[name], _file_lock(os.path.join(self.directory, name, '.lock')):
+            return self._sync(name)
+
+    def read(
+            self,
+            name: str,
+            start_date: Optional[Union[str, pd.Timestamp]] = None,
+            end_date: Optional[Union[str, pd.Timestamp]] = None,
+            filters: Optional[dict[str, Iterable[Any]]] = None,
+            columns: Optional[list[str]] = None,
+            latest: bool = False,
+        ) -> pd.DataFrame:
+        """Rows with valuation_date in [start_date, end_date] matching every filter, in valuation_date order.
+
+        Args:
+            name (str): Source.
+            start_date (Optional[Union[str, pd.Timestamp]], optional): First valuation_date. Defaults to None (unbounded).
+            end_date (Optional[Union[str, pd.Timestamp]], optional): Last valuation_date. Defaults to None (unbounded).
+            filters (Optional[dict[str, Iterable[Any]]], optional): Column -> accepted values.
+            columns (Optional[list[str]], optional): Columns to load. Defaults to None (all).
+            latest (bool, optional): Only the newest valuation_date in the window with matching rows. Defaults to False.
+
+        Returns:
+            pd.DataFrame
+        """
+        with self._locks[name]:
+            if time.monotonic() - self._synced.get(name, -float('inf')) >= self.refresh_interval:
+                self._sync_quietly(name)
+        try:
+            return self._read(name, start_date, end_date, filters, columns, latest)
+        except FileNotFoundError: # compacted by another process since this one last listed the directory
+            with self._locks[name]:
+                self._partitions[name] = self._scan_partitions(name)
+            return self._read(name, start_date, end_date, filters, columns, latest)
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                'files': len(self._partitions.get(name, [])),
+                'first': self._partitions[name][0].start.isoformat() if self._partitions.get(name) else None,
+                'last': self._partitions[name][-1].end.isoformat() if self._partitions.get(name) else None,
+                'synced_seconds_ago': time.monotonic() - self._synced[name] if name in self._synced else None,
+                'error': self._errors.get(name),
+            }
+            for name in self._sources
+        }
+
+    def _read(self, name, start_date, end_date, filters, columns, latest) -> pd.DataFrame:
+        partitions = self._partitions_of(name)
+        if not partitions:
+            schema = self._sources[name].schema
+            return pd.DataFrame({c: pd.Series(dtype=schema.get(c, object)) for c in columns or schema})
+
+        start = pd.Timestamp(start_date) if start_date is not None else partitions[0].start
+        end = pd.Timestamp(end_date) if end_date is not None else partitions[-1].end
+        selected = [p for p in partitions if p.start <= end and p.end >= start]
+        expression = self._expression(filters, start, end)
+        if latest:
+            for partition in reversed(selected):
+                df = self._scan([partition.path], columns, expression)
+                if len(df):
+                    newest = df['valuation_date'].max()
+                    return df[df['valuation_date'] == newest].reset_index(drop=True)
+            selected = []
+        if not selected:
+            return self._empty(partitions[-1].path, columns)
+        df = self._scan([p.path for p in selected], columns, expression)
+        if 'valuation_date' in df.columns and not df['valuation_date'].is_monotonic_increasing:
+            df = df.sort_values('valuation_date', kind='stable').reset_index(drop=True)
+        return df
+
+    def _sync_quietly(self, name: str) -> None:
+        try:
+            with _file_lock(os.path.join(self.directory, name, '.lock')):
+                self._sync(name)
+        except Exception as e: # serve what is on disk, retry on the next read
+            self._partitions[name] = self._scan_partitions(name)
+            if not self._partitions[name]:
+                raise
+            self._errors[name] = f"{type(e).__name__}: {e}"
+
+    def _sync(self, name: str) -> int:
+        partitions = self._scan_partitions(name) # other processes may have synced since the last listing
+        since = self._revision_start(partitions)
+        rows, pending, written = 0, [], set()
+        for chunk in self._sources[name].load(since.strftime('%Y-%m-%d') if since is not None else '-1'):
+            if not len(chunk):
+                continue
+            chunk = chunk.assign(valuation_date=pd.to_datetime(chunk['valuation_date']))
+            pending.append(chunk)
+            # every date before the chunk's last is complete, rows arrive in valuation_date order
+            last = chunk['valuation_date'].iloc[-1]
+            done = pd.concat(pending, ignore_index=True)
+            rows += self._write(name, done[done['valuation_date'] < last], written)
+            pending = [done[done['valuation_date'] >= last]]
+        if pending:
+            rows += self._write(name, pd.concat(pending, ignore_index=True), written)
+        if since is not None:
+            # dates in the window the source no longer has
+            for partition in partitions:
+                if partition.start == partition.end and partition.start >= since and partition.start not in written:
+                    with suppress(FileNotFoundError):
+                        os.remove(partition.path)
+        self._compact(name, self._scan_partitions(name))
+        self._partitions[name] = self._scan_partitions(name)
+        self._synced[name] = time.monotonic()
+        self._errors.pop(name, None)
+        return rows
+
+    def _write(self, name: str, df: pd.DataFrame, written: set) -> int:
+        for date, partition in df.groupby('valuation_date', sort=True):
+            self._write_file(self._path(name, date, date), partition)
+            written.add(date)
+        return len(df)
+
+    def _revision_start(self, partitions: list[PnlPartition]) -> Optional[pd.Timestamp]:
+        """First valuation_date a sync re-pulls, None for the full history."""
+        if not partitions:
+            return None
+        return partitions[-1].end - pd.Timedelta(days=self.revision_days)
+
+    def _compact(self, name: str, partitions: list[PnlPartition]) -> None:
+        """Merges the daily files of every month before the revision window's into one file, so re-pulled
+        dates are always daily files."""
+        if not partitions:
+            return
+        current = self._revision_start(partitions).to_period('M')
+        months: dict[pd.Period, list[PnlPartition]] = {}
+        for partition in partitions:
+            if partition.start == partition.end and partition.start.to_period('M') < current:
+                months.setdefault(partition.start.to_period('M'), []).append(partition)
+        for days in months.values():
+            if len(days) < 2:
+                continue
+            df = self._scan([p.path for p in days], None, None)
+            # the merged file is in place before its days go, and a scan ignores days a merged file covers
+            self._write_file(self._path(name, days[0].start, days[-1].end), df)
+            for partition in days:
+                with suppress(FileNotFoundError):
+                    os.remove(partition.path)
+
+    @staticmethod
+    def _write_file(path: str, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # all-null object columns on one date would otherwise be typed null and clash with other partitions
+        table = table.cast(pa.schema([
+            field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in table.schema
+        ]))
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.remove(tmp)
+            raise
+
+    def _partitions_of(self, name: str) -> list[PnlPartition]:
+        if name not in self._partitions:
+            self._partitions[name] = self._scan_partitions(name)
+        return self._partitions[name]
+
+    def _scan_partitions(self, name: str) -> list[PnlPartition]:
+        directory = os.path.join(self.directory, name)
+        partitions = []
+        for f in os.listdir(directory):
+            if f.endswith('.parquet'):
+                start, _, end = f.removesuffix('.parquet').partition('_')
+                partitions.append(PnlPartition(pd.Timestamp(start), pd.Timestamp(end or start), os.path.join(directory, f)))
+        merged = [p for p in partitions if p.start != p.end]
+        partitions = [
+            p for p in partitions
+            if p.start != p.end or not any(m.start <= p.start <= m.end for m in merged)
+        ]
+        return sorted(partitions)
+
+    def _path(self, name: str, start: pd.Timestamp, end: pd.Timestamp) -> str:
+        stem = start.strftime('%Y-%m-%d') if start == end else f"{start.strftime('%Y-%m-%d')}_{end.strftime('%Y-%m-%d')}"
+        return os.path.join(self.directory, name, f"{stem}.parquet")
+
+    @staticmethod
+    def _expression(filters: Optional[dict[str, Iterable[Any]]], start: pd.Timestamp, end: pd.Timestamp):
+        import pyarrow.dataset as ds
+
+        expression = (ds.field('valuation_date') >= start) & (ds.field('valuation_date') <= end)
+        for column, values in (filters or {}).items():
+            expression = expression & ds.field(column).isin(list(values))
+        return expression
+
+    @staticmethod
+    def _scan(paths: list[str], columns: Optional[list[str]], expression) -> pd.DataFrame:
+        import pyarrow.dataset as ds
+
+        return ds.dataset(paths, format='parquet').to_table(columns=columns, filter=expression).to_pandas()
+
+    @staticmethod
+    def _empty(path: str, columns: Optional[list[str]]) -> pd.DataFrame:
+        import pyarrow.parquet as pq
+
+        schema = pq.read_schema(path)
+        return schema.empty_table().select(columns or schema.names).to_pandas()
+
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock across processes on a lock file (flock, msvcrt.locking on Windows). Blocks until held."""
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError: # LK_LOCK gives up after 10 seconds
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
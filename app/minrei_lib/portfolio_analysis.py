@@ -1,17 +1,22 @@
 import os
 import sys
+from typing import Collection, Optional
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+from scipy.sparse import csr_matrix
 from scipy.stats import linregress
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
 from .database import Database
+from .instrument_matrix import InstrumentMatrix
 from .plot import Plot
+from .profiling import timed
 
 CUSTOM_SEPARATOR = '._.'
+REVALUATION_MODES = ('delta', 'taylor')
 
 class PortfolioAnalysis:
     def __init__(self):
@@ -51,18 +56,19 @@ class PortfolioAnalysis:
         return beta, r_squared, p_value
 
     @staticmethod
-    def simulate_ex_ante_portfolio_notionals(trader_name: str, valuation_date: str = "-1", lookback_days: int = 400) -> pd.Series:
+    def simulate_ex_ante_portfolio_notionals(trader_name: str, valuation_date: str = "-1", lookback_days: int = 400, db: Database = None) -> pd.Series:
         """Simulates an ex-ante portfolio's notionals based on historical data (default lookback of a year).
         NOTE: Does not take contract rolls into account. Use `ex_ante_returns` instead.
 
         Args:
             positions (pd.Series): deltaposition indexed by date
             valuation_date (str): start date to look back from. defaults to latest (-1).
+            db (Database, optional): shared database handle. defaults to a new connection.
 
         Returns:
             pd.Series: (t, ) of simulated historical portfolio notionals
         """
-        db = Database()
+        db = db or Database()
         seasonal_indices = db.commodities.get_seasonal_index()
         if valuation_date != '-1':
             positions = db.traders.get_positions(trader_name, valuation_date)
@@ -74,7 +80,7 @@ class PortfolioAnalysis:
         return PortfolioAnalysis.ex_ante_portfolio_notional(positions, prices, seasonal_indices)
     
     @staticmethod
-    def ex_ante_portfolio_notional(positions: pd.DataFrame, prices: pd.DataFrame, seasonal_indices: list[str]) -> pd.Series:
+    def ex_ante_portfolio_notional(positions: pd.DataFrame, prices: pd.DataFrame, seasonal_indices: Collection[str]) -> pd.Series:
         """Calculates the ex-ante historical notionals given *static positions*, and their historical prices.
         Seasonality is taken into account (seasonal contracts use contract_month, else forward_month).
         NOTE: Does not take contract rolls into account. Use `_ex_ante_pnl` instead.
@@ -82,7 +88,7 @@ class PortfolioAnalysis:
         Args:
             positions (pd.DataFrame): _description_
             prices (pd.DataFrame): _description_
-            seasonal_indices (list[str]): _description_
+            seasonal_indices (Collection[str]): _description_
 
         Returns:
             pd.Series: (t, ) of simulated historical portfolio notionals
@@ -90,168 +96,484 @@ class PortfolioAnalysis:
         if (len(positions['valuation_date'].unique()) > 1):
             return ValueError('position df should only have a single valuation_date')
 
-        seasonal_mask = positions['px_location'].isin(seasonal_indices)
-        seasonal_portfolio_returns, prices_idx = PortfolioAnalysis._ex_ante_subnotionals(positions, prices, seasonal_mask, True)
-        non_seasonal_portfolio_returns, _ = PortfolioAnalysis._ex_ante_subnotionals(positions, prices, ~seasonal_mask, False)
-        portfolio_returns = seasonal_portfolio_returns + non_seasonal_portfolio_returns
-        return pd.Series(portfolio_returns, index=prices_idx)
+        matrix = InstrumentMatrix.from_prices(prices, value='price')
+        portfolio_v = PortfolioAnalysis.position_pnl(positions, matrix, seasonal_indices).sum(axis=0)
+        return pd.Series(portfolio_v, index=matrix.dates)
 
     @staticmethod
-    def _ex_ante_subnotionals(positions: pd.DataFrame, prices: pd.DataFrame, mask, is_season: bool):
-        returns_by = f"{'contract' if is_season else 'forward'}_month"
-        sub_positions = positions.loc[mask, :].copy()
-        sub_positions['idx'] = sub_positions['px_location'] + CUSTOM_SEPARATOR + sub_positions[returns_by].astype(str)
-        sub_positions = sub_positions.set_index('idx')
-
-        prices['idx'] = prices['px_location'] + CUSTOM_SEPARATOR + prices[returns_by].astype(str)
-        prices_matrix = prices.pivot(index='px_date', columns='idx', values='price') # t x n
-        prices_matrix = prices_matrix.ffill().bfill()
-
-        prices_matrix_np = prices_matrix[sub_positions.index].to_numpy() # t x n
-        sub_positions_v_np = sub_positions['deltaposition'].to_numpy() # n x 1
-        portfolio_v = prices_matrix_np @ sub_positions_v_np # t x 1
-        return portfolio_v, prices_matrix.index
-    
-    @staticmethod
-    def ex_ante_portfolio_positions(positions: pd.DataFrame, prices: pd.DataFrame, seasonal_indices: list[str], use_prices: bool=False) -> pd.Series:
+    def ex_ante_portfolio_positions(positions: pd.DataFrame, prices: pd.DataFrame, seasonal_indices: Collection[str], use_prices: bool=False) -> pd.DataFrame:
         """Simualtes ex-ante historical pnl by position. Uses either prices or simple returns which takes futures rolls into account.
         NOTE: Assumes weight has already been applied onto positions.
 
         Returns:
-            pd.Series: (n x t-1) pnl returns.
+            pd.DataFrame: (n x t-1) pnl returns, indexed by px_location + CUSTOM_SEPARATOR + contract_month.
         """
-        mask = positions['px_location'].isin(seasonal_indices)
+        matrix = InstrumentMatrix.from_prices(prices, value='price' if use_prices else 'price_delta')
+        # seasonal rows first, as before
+        order = np.argsort(~positions['px_location'].isin(seasonal_indices).to_numpy(), kind='stable')
+        positions = positions.iloc[order]
+        index = positions['px_location'] + CUSTOM_SEPARATOR + positions['contract_month'].astype(str)
+        pnl = PortfolioAnalysis.position_pnl(positions, matrix, seasonal_indices)
+        return pd.DataFrame(pnl, index=index.to_numpy(), columns=matrix.dates)
 
-        seasonal_pnl = PortfolioAnalysis._ex_ante_subpnl(positions, prices, mask, True, use_prices)
-        nonseasonal_pnl = PortfolioAnalysis._ex_ante_subpnl(positions, prices, ~mask, False, use_prices)
-        total_pnl = pd.concat([seasonal_pnl, nonseasonal_pnl], axis=0)
-        return total_pnl
-    
     @staticmethod
-    def _ex_ante_subpnl(positions: pd.DataFrame, prices: pd.DataFrame, mask, is_seasonal: bool, use_prices: bool=False):
-        """Simualtes ex-ante historical pnl. Uses either prices or simple returns which takes futures rolls into account.
+    @timed('analytics.position_pnl')
+    def position_pnl(
+            positions: pd.DataFrame,
+            matrix: InstrumentMatrix,
+            seasonal_indices: Collection[str],
+            revaluation: str = 'delta',
+            vol_matrix: Optional[InstrumentMatrix] = None,
+        ) -> np.ndarray:
+        """(n x t) pnl of positions' rows under the instrument matrix's moves, see revalue.
+        Seasonal px_locations read their contract_month series, others their forward_month series.
         NOTE: Assumes weight has already been applied onto positions.
 
+        Args:
+            revaluation (str, optional): 'delta' or 'taylor'. Defaults to 'delta'.
+            vol_matrix (Optional[InstrumentMatrix], optional): vol_changes output. Adds the vega term in
+                taylor mode. Defaults to None.
+        """
+        instruments = InstrumentMatrix.key_index(InstrumentMatrix.instrument_keys(positions, seasonal_indices))
+        price_deltas = matrix.rows(matrix.lookup(instruments))
+        vol_deltas = None
+        if vol_matrix is not None:
+            # no vol history, no vega pnl
+            vol_deltas = vol_matrix.rows(vol_matrix.lookup(instruments), matrix.dates, missing=0.0)
+        return PortfolioAnalysis.revalue(price_deltas, positions, revaluation, vol_deltas)
+
+    @staticmethod
+    def revalue(
+            price_deltas: np.ndarray,
+            positions: pd.DataFrame,
+            revaluation: str = 'delta',
+            vol_deltas: Optional[np.ndarray] = None,
+            horizon_days: float = 1.0,
+        ) -> np.ndarray:
+        """Scenario pnl per position from (n x t) price moves aligned with positions' rows. Works in place
+        on price_deltas, so the whole book is a handful of passes over one matrix.
+
+            delta:  deltaposition * dS
+            taylor: deltaposition * dS + 1/2 gammaposition * dS^2 + thetaposition * horizon_days
+                    (+ vegaposition * dvol when vol_deltas is given)
+
+        Greeks are read in price units: gammaposition is the change in deltaposition per unit price move,
+        thetaposition pnl per day, vegaposition pnl per vol point. Missing gamma/theta/vega count as 0.
+
+        Args:
+            price_deltas (np.ndarray): (n x t) price moves, overwritten.
+            positions (pd.DataFrame): n positions.
+            revaluation (str, optional): 'delta' or 'taylor'. Defaults to 'delta'.
+            vol_deltas (Optional[np.ndarray], optional): (n x t) implied vol moves, 0 where unknown. Defaults to None.
+            horizon_days (float, optional): Days of theta per scenario. Defaults to 1.0.
+
         Returns:
-            pd.Series: (n x t-1) pnl returns.
+            np.ndarray: (n x t) pnl (the price_deltas buffer).
         """
-        val = 'price' if use_prices else 'price_delta'
-        subpositions = positions.loc[mask, :].copy()
-        return_by = 'contract_month' if is_seasonal else 'forward_month'
-        dates = prices['px_date'].unique()
+        if revaluation not in REVALUATION_MODES:
+            raise ValueError(f"revaluation must be one of {REVALUATION_MODES}, got {revaluation}")
+
+        delta = positions['deltaposition'].to_numpy(dtype=np.float64).reshape(-1, 1)
+        if revaluation == 'delta':
+            price_deltas *= delta
+            return price_deltas
+
+        # dS * (delta + 1/2 gamma dS) with a single temporary
+        factor = price_deltas * (0.5 * PortfolioAnalysis._greek(positions, 'gammaposition'))
+        factor += delta
+        price_deltas *= factor
+        price_deltas += PortfolioAnalysis._greek(positions, 'thetaposition') * horizon_days
+        if vol_deltas is not None:
+            np.multiply(vol_deltas, PortfolioAnalysis._greek(positions, 'vegaposition'), out=factor)
+            price_deltas += factor
+        return price_deltas
 
-        subpositions_index = subpositions['px_location'] + CUSTOM_SEPARATOR + subpositions['contract_month'].astype(str)
+    @staticmethod
+    def _greek(positions: pd.DataFrame, col: str) -> np.ndarray:
+        """(n x 1) float greek column, 0 where missing."""
+        if col not in positions.columns:
+            return np.zeros((len(positions), 1))
+        return np.nan_to_num(positions[col].to_numpy(dtype=np.float64), nan=0.0).reshape(-1, 1)
 
-        subpositions['idx'] = subpositions['px_location'] + CUSTOM_SEPARATOR + subpositions[return_by].astype(str)
-        subpositions = subpositions.set_index('idx')
+    @staticmethod
+    def vol_changes(vols: pd.DataFrame, vol_col: str = 'vol') -> InstrumentMatrix:
+        """Instrument matrix of day-over-day implied vol moves, for the vega term of taylor revaluation.
 
-        prices['idx'] = prices['px_location'] + CUSTOM_SEPARATOR + prices[return_by].astype(str)
-        returns_matrix = prices.pivot(index='px_date', columns='idx', values=val) # t-1 x n
-        if use_prices:
-            returns_matrix = returns_matrix.ffill().bfill().reindex(subpositions.index, axis=1).to_numpy() # t1 x n
-        else: # assume don't move
-            returns_matrix = returns_matrix.fillna(0).reindex(subpositions.index, axis=1).to_numpy() # t-1 x n
+        Args:
+            vols (pd.DataFrame): Vol history in the price table layout (px_date, px_location,
+                forward_month, contract_month) with a vol column, sorted by px_date.
+            vol_col (str, optional): Defaults to 'vol'.
+        """
+        return InstrumentMatrix.from_levels(vols, vol_col)
+
+    @staticmethod
+    @timed('analytics.group_pnl')
+    def group_pnl(pnl: np.ndarray, groups: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray]:
+        """Sums pnl rows per group with one sparse (groups x n) @ (n x t) multiply. NaN rows count as 0.
 
-        scaling = subpositions['deltaposition'].to_numpy().reshape(1, -1) # 1 x t-1
-        historical_pnl = pd.DataFrame((scaling * returns_matrix).T, index=subpositions_index, columns=dates) # n x t-1
-        return historical_pnl
+        Args:
+            pnl (np.ndarray): (n x t) pnl vectors.
+            groups (pd.DataFrame): (n x k) group keys per row.
 
+        Returns:
+            tuple[pd.DataFrame, np.ndarray]: (g x k) sorted group keys, (g x t) summed pnl.
+        """
+        grouper = groups.groupby(list(groups.columns), sort=True, dropna=False)
+        codes = grouper.ngroup().to_numpy()
+        keys = grouper.size().index.to_frame(index=False)
+        membership = csr_matrix((np.ones(len(codes)), (codes, np.arange(len(codes)))), shape=(len(keys), len(codes)))
+        return keys, membership @ np.nan_to_num(pnl, nan=0.0)
 
     @staticmethod
     def var(return_history: pd.Series, tail: int = 251, confidence_level: float = 0.95) -> float:
         """Calculates VaR off simple returns, not relative. Return history assumed sorted by date.
         """
-        return_history = return_history[-tail:]
-        return_history = return_history.sort_values()
-        return_history = np.array(return_history)
-        
-        if confidence_level == 0.95 and tail == 251:
-            return 0.9 * return_history[12] + 0.1 * return_history[13]
+        return_history = np.asarray(return_history, dtype=np.float64)[-tail:]
+        var, _ = PortfolioAnalysis.risk_ladder(return_history.reshape(1, -1), (tail,), (confidence_level,))
+        return var[0, 0, 0]
+
+    @staticmethod
+    @timed('analytics.risk_ladder')
+    def risk_ladder(
+            pnl: np.ndarray,
+            windows: tuple[int, ...] = (251,),
+            confidence_levels: tuple[float, ...] = (0.95,),
+        ) -> tuple[np.ndarray, np.ndarray]:
+        """Historical VaR and ES of every row for several windows and confidence levels, with one
+        np.partition per window across all rows instead of a sort per (row, window, level).
+
+        VaR interpolates between order statistics like var (percentile, and the 0.9 / 0.1 blend of the
+        13th / 14th worst days for 251 days at 95%). ES is the mean of the days at or below the VaR's
+        lower order statistic.
+
+        Args:
+            pnl (np.ndarray): (g x t) pnl, oldest date first, e.g. group_pnl output.
+            windows (tuple[int, ...], optional): Trailing days per window. Defaults to (251,).
+            confidence_levels (tuple[float, ...], optional): Defaults to (0.95,).
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: var and es, each (g x windows x confidence_levels).
+        """
+        pnl = np.asarray(pnl, dtype=np.float64)
+        var = np.full((pnl.shape[0], len(windows), len(confidence_levels)), np.nan)
+        es = np.full_like(var, np.nan)
+        for i, window in enumerate(windows):
+            data = pnl[:, -window:]
+            n = data.shape[1]
+            if n == 0:
+                continue
+            ranks = [PortfolioAnalysis._var_rank(window, c, n) for c in confidence_levels]
+            lower = [int(np.floor(rank)) for rank in ranks]
+            upper = [min(lo + 1, n - 1) for lo in lower]
+            part = np.partition(data, sorted(set(lower + upper)), axis=1)
+            for j, (rank, lo, hi) in enumerate(zip(ranks, lower, upper)):
+                var[:, i, j] = part[:, lo] + (rank - lo) * (part[:, hi] - part[:, lo])
+                es[:, i, j] = part[:, :lo + 1].mean(axis=1)
+        return var, es
+
+    @staticmethod
+    @timed('analytics.var_attribution')
+    def var_attribution(
+            pnl: np.ndarray,
+            tail: int = 251,
+            confidence_level: float = 0.95,
+            bandwidth: Optional[float] = None,
+            block_rows: int = 4096,
+        ) -> pd.DataFrame:
+        """Component and incremental historical VaR of every row of a book's pnl matrix in one pass.
+
+        component_var is each row's pnl in the VaR scenario: the dates holding the VaR's order statistics,
+        blended like var, or with bandwidth a Gaussian kernel over the sorted portfolio scenarios centred
+        on the VaR rank (smoother, less sensitive to a single date). Components sum to the (smoothed) VaR.
+        incremental_var is VaR(book) - VaR(book without the row), from one partition of
+        (portfolio - rows) per block of rows rather than a leave-one-out recompute per row.
+
+        Args:
+            pnl (np.ndarray): (n x t) position pnl vectors, oldest date first. NaN counts as 0.
+            tail (int, optional): Defaults to 251.
+            confidence_level (float, optional): Defaults to 0.95.
+            bandwidth (Optional[float], optional): Kernel width in scenarios (e.g. 2.5). Defaults to None.
+            block_rows (int, optional): Rows per incremental block, bounds memory. Defaults to 4096.
+
+        Returns:
+            pd.DataFrame: component_var, component_pct and incremental_var per row, in pnl's order.
+        """
+        pnl = np.nan_to_num(np.asarray(pnl, dtype=np.float64)[:, -tail:], nan=0.0)
+        n, t = pnl.shape
+        if t == 0:
+            return pd.DataFrame({'component_var': np.full(n, np.nan), 'component_pct': np.nan, 'incremental_var': np.nan})
+        portfolio = pnl.sum(axis=0)
+
+        # scenario weights over dates
+        order = np.argsort(portfolio, kind='stable')
+        rank = PortfolioAnalysis._var_rank(tail, confidence_level, t)
+        weights = np.zeros(t)
+        if bandwidth is None:
+            lo = int(np.floor(rank))
+            weights[order[lo]] += 1 - (rank - lo)
+            weights[order[min(lo + 1, t - 1)]] += rank - lo
         else:
-            return np.percentile(return_history, (1-confidence_level) * 100)
+            kernel = np.exp(-0.5 * ((np.arange(t) - rank) / bandwidth) ** 2)
+            weights[order] = kernel / kernel.sum()
+        component = pnl @ weights
+        total = component.sum()
+
+        var, _ = PortfolioAnalysis.risk_ladder(portfolio.reshape(1, -1), (tail,), (confidence_level,))
+        incremental = np.empty(n)
+        for start in range(0, n, block_rows):
+            without, _ = PortfolioAnalysis.risk_ladder(portfolio - pnl[start:start + block_rows], (tail,), (confidence_level,))
+            incremental[start:start + block_rows] = var[0, 0, 0] - without[:, 0, 0]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            component_pct = component / total
+        return pd.DataFrame({
+            'component_var': component,
+            'component_pct': component_pct,
+            'incremental_var': incremental,
+        })
+
+    @staticmethod
+    def ladder_column(metric: str, window: int, confidence_level: float) -> str:
+        return f"{metric}_{window}d_{confidence_level * 100:g}".replace('.', '_')
+
+    @staticmethod
+    def _var_rank(tail: int, confidence_level: float, n: int) -> float:
+        """Fractional order statistic of the VaR in n sorted observations."""
+        if confidence_level == 0.95 and tail == 251:
+            return min(12.1, n - 1)
+        return (1 - confidence_level) * (n - 1)
         
-    
     @staticmethod
-    def calculate_returns(
-        df: pd.DataFrame,
-        price_col: str = 'price',
-    ) -> pd.DataFrame:
-        """Calculates absolute, percentage, and log returns over time. Drops NA.
-        NOTE: casts all price to non-negative. For electricity / basis prices, model them differently.
+    @timed('analytics.mc_var')
+    def mc_var(
+            positions: pd.DataFrame,
+            matrix: InstrumentMatrix,
+            seasonal_indices: Collection[str],
+            revaluation: str = 'delta',
+            n_scenarios: int = 10_000,
+            confidence_levels: tuple[float, ...] = (0.95,),
+            tail: int = 251,
+            ewma_lambda: Optional[float] = None,
+            shrinkage: Optional[float] = None,
+            n_factors: Optional[int] = None,
+            seed: Optional[int] = None,
+            block_bytes: int = 64 * 1024 ** 2,
+        ) -> pd.DataFrame:
+        """Monte Carlo VaR / ES of the book's 1-day pnl. Instrument price moves are drawn from a factor model
+        of their covariance (see covariance_factors) and revalued like the historical pnl vectors.
+
+        Scenarios are simulated in blocks of at most block_bytes, so memory does not grow with n_scenarios.
+        A delta book is linear in the moves, so its pnl is drawn directly in factor space and no
+        scenarios x instruments block is ever built; taylor revalues each block (without vega, vols are
+        not simulated).
+        NOTE: Assumes weight has already been applied onto positions.
 
         Args:
-            df (pd.DataFrame).
-            price_col (str, optional) Defaults to 'price'.
+            positions (pd.DataFrame): Positions, as for position_pnl.
+            matrix (InstrumentMatrix): price_delta matrix the covariance is estimated from.
+            seasonal_indices (Collection[str]): Seasonal px_locations.
+            revaluation (str, optional): 'delta' or 'taylor'. Defaults to 'delta'.
+            n_scenarios (int, optional): Defaults to 10_000.
+            confidence_levels (tuple[float, ...], optional): Defaults to (0.95,).
+            tail (int, optional): Most recent dates used for the covariance. Defaults to 251.
+            ewma_lambda (Optional[float], optional): EWMA decay, e.g. 0.94. Defaults to None (equal weights).
+            shrinkage (Optional[float], optional): Weight on the diagonal target. Defaults to None (Ledoit-Wolf).
+            n_factors (Optional[int], optional): Principal components kept. Defaults to None (all).
+            seed (Optional[int], optional): Generator seed. Defaults to None.
+            block_bytes (int, optional): Memory per simulated block. Defaults to 64MB.
 
         Returns:
-            pd.DataFrame: New price_delta column.
+            pd.DataFrame: confidence_level, var and es (pnl quantile and mean beyond it; losses are negative).
         """
-        df = PortfolioAnalysis._calculate_price_delta(df, price_col)
-        df = PortfolioAnalysis._calculate_log_returns(df, price_col)
-        df = df.dropna(subset=['simple_return', 'log_return'])
-        return df
+        if revaluation not in REVALUATION_MODES:
+            raise ValueError(f"revaluation must be one of {REVALUATION_MODES}, got {revaluation}")
+
+        ids = matrix.lookup(InstrumentMatrix.instrument_keys(positions, seasonal_indices))
+        known = ids >= 0
+        rows, inverse = np.unique(ids[known], return_inverse=True)
+        def exposure(col):
+            return np.bincount(inverse, weights=PortfolioAnalysis._greek(positions[known], col).ravel(), minlength=len(rows))
+
+        delta = exposure('deltaposition')
+        loadings, specific_var, _ = PortfolioAnalysis.covariance_factors(matrix.values[rows, -tail:], ewma_lambda, shrinkage, n_factors)
+        rng = np.random.default_rng(seed)
+        pnl = np.empty(n_scenarios)
+
+        if revaluation == 'delta':
+            # pnl = (L'a)'z + (a * sqrt(d))'e: the specific part collapses to one normal per scenario
+            factor_exposure = loadings.T @ delta
+            specific_sd = np.sqrt(np.sum(delta ** 2 * specific_var))
+            block = max(1, block_bytes // (8 * (len(factor_exposure) + 1)))
+            for start in range(0, n_scenarios, block):
+                size = min(block, n_scenarios - start)
+                pnl[start:start + size] = rng.standard_normal((size, len(factor_exposure))) @ factor_exposure
+                pnl[start:start + size] += specific_sd * rng.standard_normal(size)
+        else:
+            half_gamma = 0.5 * exposure('gammaposition')
+            theta = PortfolioAnalysis._greek(positions, 'thetaposition').sum()
+            specific_sd = np.sqrt(specific_var)
+            block = max(1, block_bytes // (8 * 2 * max(len(rows), 1)))
+            for start in range(0, n_scenarios, block):
+                size = min(block, n_scenarios - start)
+                moves = rng.standard_normal((size, loadings.shape[1])) @ loadings.T
+                moves += rng.standard_normal((size, len(rows))) * specific_sd
+                pnl[start:start + size] = moves @ delta
+                moves *= moves
+                pnl[start:start + size] += moves @ half_gamma + theta
+
+        vars_ = np.quantile(pnl, 1 - np.asarray(confidence_levels, dtype=np.float64))
+        return pd.DataFrame({
+            'confidence_level': list(confidence_levels),
+            'var': vars_,
+            'es': [pnl[pnl <= v].mean() for v in vars_],
+        })
 
     @staticmethod
-    def _calculate_price_delta(
-        df: pd.DataFrame,
-        price_col: str = 'price',
-    ) -> pd.DataFrame:
-        """Calculates absolute price differences over time. Does not drop NA.
+    @timed('analytics.covariance_factors')
+    def covariance_factors(
+            returns: np.ndarray,
+            ewma_lambda: Optional[float] = None,
+            shrinkage: Optional[float] = None,
+            n_factors: Optional[int] = None,
+        ) -> tuple[np.ndarray, np.ndarray, float]:
+        """Factorizes the shrunk covariance of (k instruments x t dates) returns as L L' + diag(d) without
+        forming the k x k matrix: every step goes through the t x t Gram matrix or a thin SVD.
+
+        The covariance S is the equal-weight (demeaned) or EWMA (zero-mean, RiskMetrics) estimate, shrunk
+        towards its diagonal D: (1 - s) S + s D. Principal components of S give the loadings, and the variance
+        left out by truncation or shrinkage is kept as specific variance so every instrument keeps its own
+        variance.
 
         Args:
-            df (pd.DataFrame).
-            price_col (str, optional) Defaults to 'price'.
+            returns (np.ndarray): (k x t) returns, oldest date first.
+            ewma_lambda (Optional[float], optional): EWMA decay. Defaults to None (equal weights).
+            shrinkage (Optional[float], optional): s in [0, 1]. Defaults to None (Ledoit-Wolf estimate).
+            n_factors (Optional[int], optional): Components kept. Defaults to None (all, rank <= t).
 
         Returns:
-            pd.DataFrame: New price_delta column.
+            tuple[np.ndarray, np.ndarray, float]: (k x f) loadings, (k,) specific variance, shrinkage used.
         """
-        df['price_delta'] = df.groupby(['px_location', 'contract_month'])[price_col].diff()
-        return df
+        k, t = returns.shape
+        if k == 0 or t < 2:
+            return np.zeros((k, 0)), np.zeros(k), 0.0
+
+        if ewma_lambda is None:
+            x = returns - returns.mean(axis=1, keepdims=True)
+            weights = np.full(t, 1 / t)
+        else:
+            x = returns
+            weights = (1 - ewma_lambda) * ewma_lambda ** np.arange(t - 1, -1, -1, dtype=np.float64)
+            weights /= weights.sum()
+        y = x * np.sqrt(weights) # S = y y'
+        variance = np.einsum('ij,ij->i', y, y) # diag(S)
+
+        if shrinkage is None:
+            # Ledoit-Wolf intensity for a diagonal target; Frobenius norms of S come from the Gram matrix
+            gram = y.T @ y
+            s_norm = np.sum(gram ** 2) # ||S||^2
+            obs_norm = np.sum(x ** 2, axis=0) ** 2 # ||x_t x_t'||^2
+            pi_all = weights @ obs_norm - s_norm
+            pi_diag = weights @ np.sum(x ** 4, axis=0) - np.sum(variance ** 2)
+            gamma = s_norm - np.sum(variance ** 2) # ||S - D||^2
+            effective_t = 1 / np.sum(weights ** 2)
+            shrinkage = float(np.clip((pi_all - pi_diag) / (effective_t * gamma), 0, 1)) if gamma > 0 else 1.0
+
+        u, singular, _ = np.linalg.svd(y, full_matrices=False)
+        f = len(singular) if n_factors is None else min(n_factors, len(singular))
+        loadings = u[:, :f] * (singular[:f] * np.sqrt(1 - shrinkage))
+        specific_var = np.maximum(variance - np.einsum('ij,ij->i', loadings, loadings), 0.0)
+        return loadings, specific_var, shrinkage
 
     @staticmethod
-    def _calculate_simple_return(
+    @timed('analytics.calculate_returns')
+    def calculate_returns(
         df: pd.DataFrame,
         price_col: str = 'price',
     ) -> pd.DataFrame:
-        """Calculates simple returns (percentage) over time. Does not drop NA.
+        """Calculates absolute, percentage, and log returns over time. Drops NA.
+        NOTE: casts all price to non-negative. For electricity / basis prices, model them differently.
+
+        One pass over the rows sorted by (px_location, contract_month, px_date): each return is the
+        shifted price array against itself, masked where a new contract series starts.
 
         Args:
             df (pd.DataFrame).
             price_col (str, optional) Defaults to 'price'.
 
         Returns:
-            pd.DataFrame: New simple_return column.
+            pd.DataFrame: New price_delta, simple_return and log_return columns.
         """
-        df['tmp'] = df[price_col].abs()
-        prices = df.groupby(['px_location', 'contract_month'])['tmp']
-        # df['simple_return'] = prices.diff() / prices.shift().abs()
-        df['simple_return'] = prices.pct_change()
-        df = df.drop(columns='tmp')
-        return df
+        order, first = PortfolioAnalysis._series_order(df)
+        price = df[price_col].to_numpy(dtype=np.float64)[order]
+        delta = PortfolioAnalysis._shifted(np.subtract, price, first)
+        magnitude = np.abs(price)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            simple_return = PortfolioAnalysis._shifted(np.divide, magnitude, first) - 1
+        valid = simple_return > -1 # False where NaN
+        log_return = np.full(len(price), np.nan)
+        log_return[valid] = np.log1p(1e-9 + simple_return[valid])
+
+        df['price_delta'] = PortfolioAnalysis._unsort(delta, order)
+        df['simple_return'] = PortfolioAnalysis._unsort(simple_return, order)
+        df['log_return'] = PortfolioAnalysis._unsort(log_return, order)
+        return df[PortfolioAnalysis._unsort(valid, order)]
 
     @staticmethod
-    def _calculate_log_returns(
+    def _calculate_price_delta(
         df: pd.DataFrame,
         price_col: str = 'price',
     ) -> pd.DataFrame:
-        """Calculates log returns over time. Does not drop NA.
+        """Calculates absolute price differences over time. Does not drop NA.
 
         Args:
             df (pd.DataFrame).
             price_col (str, optional) Defaults to 'price'.
 
         Returns:
-            pd.DataFrame: New simple_return column.
+            pd.DataFrame: New price_delta column.
         """
-        df = PortfolioAnalysis._calculate_simple_return(df, price_col)
-        df['log_return'] = np.where(
-            (df['simple_return'] <= -1) | (df['simple_return'].isna()),
-            np.nan,
-            np.log1p(1e-9 + df['simple_return'])
-        )
-
+        order, first = PortfolioAnalysis._series_order(df)
+        price = df[price_col].to_numpy(dtype=np.float64)[order]
+        df['price_delta'] = PortfolioAnalysis._unsort(PortfolioAnalysis._shifted(np.subtract, price, first), order)
         return df
 
+    @staticmethod
+    def _series_order(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+        """Row order grouping each (px_location, contract_month) series by px_date, and the mask (in that
+        order) of rows with no previous price: series starts, and rows missing either key.
+
+        Rows of one px_date keep their table order, as groupby does. Prices come back from get_historical
+        sorted by px_date, in which case a stable sort on the series key alone is enough.
+        """
+        location_ids, _ = pd.factorize(df['px_location'])
+        month_ids, months = pd.factorize(df['contract_month'])
+        key = location_ids.astype(np.int64) * len(months) + month_ids
+        key[(location_ids < 0) | (month_ids < 0)] = -1
+        if 'px_date' not in df.columns or df['px_date'].is_monotonic_increasing:
+            order = np.argsort(key, kind='stable')
+        else:
+            order = np.lexsort((df['px_date'].to_numpy(), key))
+        key = key[order]
+        first = np.ones(len(key), dtype=bool)
+        np.not_equal(key[1:], key[:-1], out=first[1:])
+        first |= key < 0
+        return order, first
+
+    @staticmethod
+    def _shifted(ufunc: np.ufunc, values: np.ndarray, first: np.ndarray) -> np.ndarray:
+        """ufunc(values[i], values[i - 1]) in series order, NaN where first."""
+        out = np.full(len(values), np.nan)
+        ufunc(values[1:], values[:-1], out=out[1:])
+        out[first] = np.nan
+        return out
+
+    @staticmethod
+    def _unsort(values: np.ndarray, order: np.ndarray) -> np.ndarray:
+        """Scatters values in sorted order back to table order."""
+        out = np.empty_like(values)
+        out[order] = values
+        return out
+
     @staticmethod
     def clean_prices(
         df: pd.DataFrame,
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+GREEK_COLUMNS = ['deltaposition', 'gammaposition', 'thetaposition', 'vegaposition']
+POSITION_KEYS = ['valuation_date', 'px_location', 'forward_month']
+
+
+def normalize_positions(df: pd.DataFrame, apply_weight: bool = True) -> pd.DataFrame:
+    """Cleans raw report_table positions and nets them per (trader), valuation_date, px_location, forward_month.
+    Fully vectorized: tickers are cleaned once per unique value, missing contract months are imputed with
+    monthly datetime64 arithmetic, and greeks / descriptive columns are aggregated in one groupby.
+
+    Args:
+        df (pd.DataFrame): Raw positions query result.
+        apply_weight (bool, optional): Scale greeks by tradermap weight (percent). Defaults to True.
+
+    Returns:
+        pd.DataFrame: One row per key, greeks summed, other columns take the first non-null value.
+    """
+    df['valuation_date'] = pd.to_datetime(df['valuation_date'])
+    df['px_location'] = _clean_px_locations(df['px_location'])
+
+    if apply_weight:
+        scale = df['weight'].to_numpy(dtype=np.float64) / 100
+        df[GREEK_COLUMNS] = df[GREEK_COLUMNS].to_numpy(dtype=np.float64) * scale.reshape(-1, 1)
+
+    # guess contract month if only forward month present: first of (valuation month + forward_month - 1)
+    contract_month = pd.to_datetime(df['contract_month'])
+    mask = contract_month.isna().to_numpy()
+    if mask.any():
+        valuation_month = df.loc[mask, 'valuation_date'].to_numpy().astype('datetime64[M]')
+        offset = (df.loc[mask, 'forward_month'].to_numpy(dtype=np.int64) - 1).astype('timedelta64[M]')
+        imputed = contract_month.to_numpy().copy()
+        imputed[mask] = (valuation_month + offset).astype('datetime64[ns]')
+        contract_month = pd.Series(imputed, index=df.index)
+    df['contract_month'] = contract_month
+
+    # group positions (per trader when several are loaded together)
+    cols_to_index = (['trader'] if 'trader' in df.columns else []) + POSITION_KEYS
+    cols_to_sum = [col for col in GREEK_COLUMNS if col in df.columns]
+    cols_to_first = [col for col in df.columns if col not in cols_to_index and col not in cols_to_sum]
+    grouped = df.groupby(cols_to_index, sort=True, observed=True)
+    df = pd.concat([grouped[cols_to_sum].sum(), grouped[cols_to_first].first()], axis=1).reset_index()
+    df['px_location'] = df['px_location'].astype(object)
+    return df
+
+
+def _clean_px_locations(px_location: pd.Series) -> pd.Categorical:
+    """Upper-cases and strips tickers once per unique value. Categories are sorted so grouping order
+    matches grouping on the plain strings."""
+    codes, uniques = pd.factorize(px_location)
+    cleaned = pd.Index(uniques).str.upper().str.strip()
+    categories = cleaned.unique().sort_values()
+    cleaned_codes = categories.get_indexer(cleaned)
+    codes = np.where(codes >= 0, cleaned_codes[codes], -1)
+    return pd.Categorical.from_codes(codes, categories=categories)
@@ -0,0 +1,149 @@
+from collections import OrderedDict
+from contextlib import suppress
+from typing import NamedTuple, Optional
+from urllib.parse import quote
+import json
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+PRICE_KEY = ['px_location', 'px_date', 'contract_month']
+COVERAGE_KEY = b'minrei.coverage' # Parquet metadata key of the [start, end] coverage
+
+
+class CachedPrices(NamedTuple):
+    """Processed price history of one px_location, complete for every px_date in [start, end]."""
+    prices: pd.DataFrame
+    start: pd.Timestamp
+    end: pd.Timestamp
+
+
+class PriceCache:
+    """Two-tier cache of processed price history keyed by px_location.
+
+    Memory tier is an LRU bounded by the frames' byte size. The optional disk tier keeps one
+    Parquet file per px_location (requires pyarrow) so history survives restarts and evictions.
+    Coverage [start, end] is tracked apart from the rows so tickers without prices on some dates
+    are not re-queried forever; on disk it is kept in the Parquet metadata, so data and coverage
+    are replaced together. Files are written under a unique temporary name then renamed, so io
+    threads and worker processes sharing cache_dir never see or clobber a partial file.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 ** 2, cache_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries: OrderedDict[str, CachedPrices] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, px_location: str) -> Optional[CachedPrices]:
+        with self._lock:
+            entry = self._entries.get(px_location)
+            if entry is not None:
+                self._entries.move_to_end(px_location)
+                return entry
+        entry = self._read_disk(px_location)
+        if entry is not None:
+            self._put_memory(px_location, entry)
+        return entry
+
+    def update(self, px_location: str, prices: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp) -> CachedPrices:
+        """Merges freshly queried rows covering [start, end] into the cached history. Fresh rows win.
+        Re-pulled rows identical to the cached ones inside the cached coverage leave the entry (and its
+        file) untouched.
+
+        Args:
+            px_location (str): Ticker.
+            prices (pd.DataFrame): Processed rows for this ticker only.
+            start (pd.Timestamp): First px_date the query covered.
+            end (pd.Timestamp): Last px_date the query covered.
+
+        Returns:
+            CachedPrices: The merged entry.
+        """
+        old = self.get(px_location)
+        if old is not None:
+            prices = pd.concat([old.prices, prices], ignore_index=True)
+            if start >= old.start and end <= old.end and prices.duplicated(keep='first').iloc[len(old.prices):].all():
+                return old # e.g. latest mode re-pulling an unchanged tail
+            prices = prices.drop_duplicates(subset=PRICE_KEY, keep='last')
+            start, end = min(start, old.start), max(end, old.end)
+        prices = prices.sort_values(['px_date', 'forward_month'], kind='stable').reset_index(drop=True)
+        entry = CachedPrices(prices, start, end)
+        self._put_memory(px_location, entry)
+        self._write_disk(px_location, entry)
+        return entry
+
+    def clear(self) -> None:
+        """Drops the memory tier. Disk files are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'cache_dir': self.cache_dir,
+            }
+
+    def _put_memory(self, px_location: str, entry: CachedPrices) -> None:
+        nbytes = int(entry.prices.memory_usage(deep=True).sum())
+        with self._lock:
+            if px_location in self._entries:
+                self._bytes -= self._sizes.pop(px_location)
+                del self._entries[px_location]
+            if nbytes > self.max_bytes: # too big for memory, disk tier only
+                return
+            self._entries[px_location] = entry
+            self._sizes[px_location] = nbytes
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(evicted)
+
+    def _path(self, px_location: str) -> str:
+        return os.path.join(self.cache_dir, f"{quote(px_location, safe='')}.parquet")
+
+    def _read_disk(self, px_location: str) -> Optional[CachedPrices]:
+        if not self.cache_dir:
+            return None
+        import pyarrow.parquet as pq
+
+        path = self._path(px_location)
+        if not os.path.exists(path):
+            return None
+        table = pq.read_table(path)
+        coverage = (table.schema.metadata or {}).get(COVERAGE_KEY)
+        if coverage is None: # no coverage recorded, refetched like a miss
+            return None
+        coverage = json.loads(coverage)
+        return CachedPrices(table.to_pandas(), pd.Timestamp(coverage['start']), pd.Timestamp(coverage['end']))
+
+    def _write_disk(self, px_location: str, entry: CachedPrices) -> None:
+        if not self.cache_dir:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(entry.prices, preserve_index=False)
+        coverage = json.dumps({'start': entry.start.isoformat(), 'end': entry.end.isoformat()})
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), COVERAGE_KEY: coverage.encode()})
+        # write then rename so readers in other workers never see a partial file
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp)
+            os.replace(tmp, self._path(px_location))
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.remove(tmp)
+            raise
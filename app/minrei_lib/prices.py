@@ -1,19 +1,31 @@
+from typing import Iterator, Optional
+import os
+
+import numpy as np
 import pandas as pd
 
-from .base import query
+from .base import query, query_chunks
+from .price_cache import PRICE_KEY, PriceCache
+
+MAX_PX_DATE = pd.Timestamp('9999-12-31')
+# select list of the get-prices-*.sql templates
+PRICE_COLUMNS = ['px_date', 'px_location', 'price', 'forward_month', 'contract_month', 'price_basis', 'currency', 'rate', 'commoditygroup']
 
 
 class PriceQueries:
-    def __init__(self, db):
+    def __init__(self, db, cache: Optional[PriceCache] = None):
         self._db = db
+        self._cache = cache
     
-    def get_historical(self, px_locations: list[str], lookback_days: int = -1, start_date: str = '-1') -> pd.DataFrame:
+    def get_historical(self, px_locations: list[str], lookback_days: int = -1, start_date: str = '-1', chunksize: Optional[int] = None) -> pd.DataFrame:
         """Get historical prices in USD.
         NOTE: APPLIED: FX, PRICE BASIS
 
         Args:
             px_locations (list[str]): Tickers.
             lookback_days (int, optional): Defaults to -1 (full price history).
+            chunksize (Optional[int], optional): Full history only. Streams the query in chunks of this many
+                rows into a columnar buffer instead of loading and normalizing it in one frame. Defaults to None.
 
         Returns:
             _type_: Price histories of ticker(s).
@@ -21,8 +33,13 @@ class PriceQueries:
         if isinstance(px_locations, str):
             px_locations = [px_locations]
 
-        px_locations = ", ".join(f"'{loc}'" for loc in px_locations)
-        px_locations = f"({px_locations})"
+        if self._cache is not None and lookback_days != -1:
+            return self._get_historical_cached(px_locations, lookback_days, start_date)
+
+        if lookback_days == -1 and chunksize:
+            return self._concat_columns(self.iter_full(px_locations, chunksize=chunksize), self._empty_prices())
+
+        px_locations = list(px_locations)
 
         # full
         if lookback_days == -1:
@@ -35,6 +52,86 @@ class PriceQueries:
         # start - lookback
         return self.get_start_lookback(px_locations, lookback_days, start_date)
     
+    def _get_historical_cached(self, px_locations: list[str], lookback_days: int, start_date: str) -> pd.DataFrame:
+        """Serves get_historical from the price cache, only querying dates the cache does not cover.
+        Latest mode always re-pulls from each ticker's last cached date so same-day revisions are picked up.
+        """
+        px_locations = list(dict.fromkeys(loc.upper().strip() for loc in px_locations))
+        lookback = pd.Timedelta(days=lookback_days)
+
+        entries = {loc: self._cache.get(loc) for loc in px_locations}
+        if start_date == '-1':
+            cached = [loc for loc, entry in entries.items() if entry is not None]
+            uncached = [loc for loc, entry in entries.items() if entry is None]
+            fresh = []
+            if cached:
+                since = min(entries[loc].end for loc in cached)
+                fresh.append(self.get_range(cached, since, MAX_PX_DATE))
+            if uncached:
+                fresh.append(self.get_latest(uncached, lookback_days, start_date))
+            fresh = pd.concat(fresh, ignore_index=True)
+
+            ends = [entries[loc].prices['px_date'].max() for loc in cached] + [fresh['px_date'].max()]
+            end = max((d for d in ends if pd.notna(d)), default=None)
+            if end is None: # nothing priced for any ticker
+                return fresh
+            start = end - lookback
+            fetched = {loc: (since, end) for loc in cached}
+            fetched.update({loc: (start, end) for loc in uncached})
+            entries.update(self._store(fresh, fetched))
+        else:
+            end = pd.Timestamp(start_date)
+            start = end - lookback
+
+        entries.update(self._fill_gaps(entries, start, end))
+        prices = pd.concat([entry.prices for entry in entries.values()], ignore_index=True)
+        prices = prices[(prices['px_date'] >= start) & (prices['px_date'] <= end)]
+        return prices.sort_values(['px_date', 'forward_month'], kind='stable').reset_index(drop=True)
+
+    def _fill_gaps(self, entries: dict, start: pd.Timestamp, end: pd.Timestamp) -> dict:
+        """Queries the date ranges in [start, end] missing from cached coverage, one query per distinct range.
+
+        Returns:
+            dict: px_location -> updated CachedPrices, for tickers that were queried.
+        """
+        gaps = {}
+        for loc, entry in entries.items():
+            if entry is None:
+                ranges = [(start, end)]
+            else: # extend coverage contiguously
+                ranges = []
+                if start < entry.start:
+                    ranges.append((start, entry.start))
+                if end > entry.end:
+                    ranges.append((entry.end, end))
+            for r in ranges:
+                gaps.setdefault(r, []).append(loc)
+
+        updated = {}
+        for (gap_start, gap_end), locs in gaps.items():
+            fresh = self.get_range(locs, gap_start, gap_end)
+            updated.update(self._store(fresh, {loc: (gap_start, gap_end) for loc in locs}))
+        return updated
+
+    def _store(self, fresh: pd.DataFrame, fetched: dict) -> dict:
+        by_location = dict(tuple(fresh.groupby('px_location', sort=False)))
+        return {
+            loc: self._cache.update(loc, by_location.get(loc, fresh.iloc[:0]), start, end)
+            for loc, (start, end) in fetched.items()
+        }
+
+    @query("get-prices-range.sql")
+    def get_range(self, px_locations: list[str], start_date: pd.Timestamp, end_date: pd.Timestamp) -> pd.DataFrame:
+        """Get prices in USD for px_date in [start_date, end_date]."""
+        return {
+            'px_locations': list(px_locations),
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d'),
+        }
+
+    def _process_get_range(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self._process_prices_helper(df)
+
     @query("get-prices-full.sql")
     def get_full(self, px_locations: list[str], lookback_days: int = -1, start_date: str = '-1') -> pd.DataFrame:
         return {
@@ -46,6 +143,106 @@ class PriceQueries:
     def _process_get_full(self, df: pd.DataFrame) -> pd.DataFrame:
         return self._process_prices_helper(df)
 
+    @query_chunks("get-prices-full.sql")
+    def get_full_chunks(self, px_locations: list[str], lookback_days: int = -1, start_date: str = '-1') -> Iterator[pd.DataFrame]:
+        """Streaming get_full. Rows repeated across a chunk boundary are not dropped, use iter_full."""
+        return {
+            'px_locations': px_locations,
+            'lookback_days': lookback_days,
+            'start_date': start_date,
+        }
+
+    def _process_get_full_chunks(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self._process_prices_helper(df)
+
+    def iter_full(self, px_locations: list[str], chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+        """Full price history in USD as normalized chunks of at most chunksize rows, in px_date order.
+        Peak memory is one chunk regardless of history length.
+
+        Args:
+            px_locations (list[str]): Tickers.
+            chunksize (int, optional): Rows per query chunk. Defaults to 100_000.
+
+        Yields:
+            pd.DataFrame: Processed chunk, same columns as get_full.
+        """
+        if isinstance(px_locations, str):
+            px_locations = [px_locations]
+        chunks = self.get_full_chunks(list(px_locations), chunksize=chunksize)
+        return self._drop_boundary_duplicates(chunks)
+
+    def write_full(self, px_locations: list[str], path: str, chunksize: int = 100_000) -> int:
+        """Streams full price history in USD into one Parquet file (requires pyarrow), one row group per chunk.
+
+        Args:
+            px_locations (list[str]): Tickers.
+            path (str): Output file. Written to path.tmp then renamed.
+            chunksize (int, optional): Rows per query chunk. Defaults to 100_000.
+
+        Returns:
+            int: Rows written.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer, rows = None, 0
+        try:
+            for chunk in self.iter_full(px_locations, chunksize=chunksize):
+                if writer is None:
+                    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                    # all-null object columns in the first chunk would otherwise pin the column to null
+                    schema = pa.schema([
+                        field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema
+                    ])
+                    writer = pq.ParquetWriter(f"{path}.tmp", schema)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None: # no prices
+            return 0
+        os.replace(f"{path}.tmp", path)
+        return rows
+
+    @staticmethod
+    def _drop_boundary_duplicates(chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """Each chunk is deduplicated by _process_prices_helper, and the query is ordered by px_date, so a
+        repeated PRICE_KEY can only straddle chunks on the px_date they share. Keys of the last px_date seen
+        are carried forward and dropped from the next chunk, matching drop_duplicates(keep='first')."""
+        carried, carried_date = None, None
+        for chunk in chunks:
+            if carried is not None:
+                same_date = (chunk['px_date'] == carried_date).to_numpy()
+                if same_date.any():
+                    keys = pd.MultiIndex.from_frame(chunk.loc[same_date, PRICE_KEY])
+                    repeated = np.zeros(len(chunk), dtype=bool)
+                    repeated[same_date] = keys.isin(carried)
+                    chunk = chunk[~repeated]
+            if chunk.empty:
+                continue
+            last_date = chunk['px_date'].iloc[-1]
+            last_keys = pd.MultiIndex.from_frame(chunk.loc[chunk['px_date'] == last_date, PRICE_KEY])
+            carried = carried.append(last_keys) if last_date == carried_date else last_keys
+            carried_date = last_date
+            yield chunk
+
+    @staticmethod
+    def _concat_columns(chunks: Iterator[pd.DataFrame], empty: pd.DataFrame) -> pd.DataFrame:
+        """Concatenates chunks column by column, releasing each column's chunks once it is joined, so peak
+        memory stays near the result size rather than a multiple of it. Returns empty when no chunk comes back."""
+        columns, dtypes = {}, {}
+        for chunk in chunks:
+            for col in chunk.columns:
+                columns.setdefault(col, []).append(chunk[col].to_numpy())
+                dtypes.setdefault(col, chunk[col].dtype)
+        if not dtypes:
+            return empty
+        return pd.DataFrame({
+            col: pd.Series(np.concatenate(columns.pop(col)), dtype=dtype)
+            for col, dtype in list(dtypes.items())
+        })
+
     @query("get-prices-latest-lookback.sql")
     def get_latest(self, px_locations: list[str], lookback_days: int = -1, start_date: str = '-1') -> pd.DataFrame:
         return {
@@ -68,17 +265,28 @@ class PriceQueries:
     def _process_get_start_lookback(self, df: pd.DataFrame) -> pd.DataFrame:
         return self._process_prices_helper(df)
 
+    def _empty_prices(self) -> pd.DataFrame:
+        """Processed result of a price query that returned no rows."""
+        return self._process_prices_helper(pd.DataFrame(columns=PRICE_COLUMNS))
     
     def _process_prices_helper(self, df: pd.DataFrame) -> pd.DataFrame:
         df['px_date'] = pd.to_datetime(df['px_date'])
         df['contract_month'] = pd.to_datetime(df['contract_month'])
 
-        df['px_location'] = df['px_location'].str.upper()
-        df['px_location'] = df['px_location'].str.strip()
-        df['price'] = df['price'] / df['price_basis'].fillna(1)
-        df['price'] = df['price'] / df['rate']
+        # clean tickers once per unique value
+        codes, uniques = pd.factorize(df['px_location'])
+        cleaned = np.append(pd.Index(uniques).str.upper().str.strip().to_numpy(dtype=object), None)
+        df['px_location'] = cleaned[codes]
+
+        # price / price_basis / rate in one buffer. Numeric so every chunk of a stream has the same schema
+        df['price_basis'] = pd.to_numeric(df['price_basis']).astype(np.float64)
+        df['rate'] = pd.to_numeric(df['rate']).astype(np.float64)
+        price = df['price'].to_numpy(dtype=np.float64, copy=True)
+        np.divide(price, np.nan_to_num(df['price_basis'].to_numpy(), nan=1.0), out=price)
+        np.divide(price, df['rate'].to_numpy(), out=price)
+        df['price'] = price
 
         # clean extra prices for same contract_month
-        df = df.drop_duplicates(subset=['px_location', 'px_date', 'contract_month'], keep='first')
+        df = df.drop_duplicates(subset=PRICE_KEY, keep='first')
 
         return df
\ No newline at end of file
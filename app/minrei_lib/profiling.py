@@ -0,0 +1,130 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Iterator, Optional
+import bisect
+import cProfile
+import math
+import threading
+import time
+
+# seconds; the last bucket catches everything
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+# spans and profiles of the request being served; set by the app's timing middleware, copied into
+# executor threads with the rest of the context
+_request_spans: ContextVar[Optional[list[tuple[str, float]]]] = ContextVar('minrei_request_spans', default=None)
+_request_profiles: ContextVar[Optional[list[cProfile.Profile]]] = ContextVar('minrei_request_profiles', default=None)
+
+
+class Metrics:
+    """Process-wide duration histograms per span name, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms: dict[str, list] = {} # name -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float) -> None:
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = [[0] * len(self.buckets), 0.0, 0]
+            histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """{span: {count, sum, buckets: {le: cumulative count}}}"""
+        with self._lock:
+            histograms = {name: (list(counts), total, count) for name, (counts, total, count) in self._histograms.items()}
+        out = {}
+        for name, (counts, total, count) in sorted(histograms.items()):
+            cumulative, running = {}, 0
+            for le, n in zip(self.buckets, counts):
+                running += n
+                cumulative['+Inf' if math.isinf(le) else repr(le)] = running
+            out[name] = {'count': count, 'sum': total, 'buckets': cumulative}
+        return out
+
+    def render(self, metric: str = 'minrei_span_seconds') -> str:
+        lines = [f"# HELP {metric} Duration of instrumented spans.", f"# TYPE {metric} histogram"]
+        for name, histogram in self.snapshot().items():
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            for le, n in histogram['buckets'].items():
+                lines.append(f'{metric}_bucket{{span="{label}",le="{le}"}} {n}')
+            lines.append(f'{metric}_sum{{span="{label}"}} {histogram["sum"]}')
+            lines.append(f'{metric}_count{{span="{label}"}} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+METRICS = Metrics()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times the block into METRICS and, inside a request, into that request's span list."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def record(name: str, seconds: float) -> None:
+    """Records a span measured elsewhere (e.g. time spent queued)."""
+    METRICS.observe(name, seconds)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+def timed(name: str) -> Callable:
+    """Decorator form of span."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def request_spans(profile: bool = False) -> Iterator[tuple[list[tuple[str, float]], Optional[list[cProfile.Profile]]]]:
+    """Collects the spans (and, with profile, the cProfile runs of profiled calls) made in this context.
+
+    Yields:
+        (spans, profiles): [(name, seconds)] in completion order, and the profiles (None unless profile).
+    """
+    spans, profiles = [], [] if profile else None
+    spans_token = _request_spans.set(spans)
+    profiles_token = _request_profiles.set(profiles)
+    try:
+        yield spans, profiles
+    finally:
+        _request_spans.reset(spans_token)
+        _request_profiles.reset(profiles_token)
+
+
+def profiled(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Calls func under cProfile when the current request asked for a profile, otherwise just calls it.
+    cProfile only sees the calling thread, so this wraps work where it runs (e.g. in executor threads)."""
+    profiles = _request_profiles.get()
+    if profiles is None:
+        return func(*args, **kwargs)
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError: # another profiler owns this interpreter (sys.monitoring, 3.12+)
+        return func(*args, **kwargs)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profile.disable()
+        profiles.append(profile)
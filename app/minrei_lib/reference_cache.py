@@ -0,0 +1,127 @@
+from typing import Any, Callable, NamedTuple, Optional
+import threading
+import time
+
+
+class ReferenceEntry(NamedTuple):
+    """Cached value of one reference lookup and the probe result it was loaded under."""
+    value: Any
+    fingerprint: Any
+    checked: float # time.monotonic() of the last load or probe
+
+
+class ReferenceSource(NamedTuple):
+    load: Callable[[], Any]
+    probe: Optional[Callable[[], Any]]
+    ttl: float
+
+
+class ReferenceCache:
+    """In-process cache of slowly changing reference data (seasonal index, commodity index, trader list).
+
+    Each lookup registers a loader and an optional probe: a cheap query (row count, checksum, max date)
+    whose result changes whenever the data does. Once an entry is older than its ttl the probe is run,
+    and the loader only when the probe result differs. With the background refresher started, get never
+    touches the database after warm-up: stale entries are served until the refresher has revalidated them.
+    """
+
+    def __init__(self, ttl: float = 300.0, refresh_interval: Optional[float] = None):
+        """
+        Args:
+            ttl (float, optional): Seconds before an entry is revalidated. Defaults to 300.
+            refresh_interval (Optional[float], optional): Seconds between background refresher passes.
+                Defaults to None (ttl / 2).
+        """
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval if refresh_interval is not None else ttl / 2
+        self._sources: dict[str, ReferenceSource] = {}
+        self._entries: dict[str, ReferenceEntry] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._errors: dict[str, str] = {}
+
+    def register(self, name: str, load: Callable[[], Any], probe: Optional[Callable[[], Any]] = None, ttl: Optional[float] = None) -> None:
+        """Adds (or replaces) a lookup. Without a probe the loader reruns every ttl."""
+        with self._lock:
+            self._sources[name] = ReferenceSource(load, probe, ttl if ttl is not None else self.ttl)
+            self._locks.setdefault(name, threading.Lock())
+            self._entries.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        entry = self._entries.get(name)
+        if entry is not None and (self._thread is not None or not self._expired(name, entry)):
+            return entry.value
+        return self.refresh(name).value
+
+    def refresh(self, name: str, force: bool = False) -> ReferenceEntry:
+        """Revalidates one entry: probe, then load if the probe changed (or always when force)."""
+        source = self._sources[name]
+        with self._locks[name]:
+            entry = self._entries.get(name)
+            if entry is not None and not force and not self._expired(name, entry):
+                return entry # refreshed by another thread while we waited
+            fingerprint = source.probe() if source.probe is not None else None
+            if entry is not None and not force and source.probe is not None and fingerprint == entry.fingerprint:
+                entry = entry._replace(checked=time.monotonic())
+            else:
+                entry = ReferenceEntry(source.load(), fingerprint, time.monotonic())
+            self._entries[name] = entry
+            self._errors.pop(name, None)
+            return entry
+
+    def warm(self) -> None:
+        """Loads every registered lookup. Failures are kept in stats() and retried on the next get."""
+        for name in list(self._sources):
+            self._refresh_quietly(name)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Drops one entry (all if None) so the next get reloads it."""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def start(self) -> None:
+        """Warms the cache and revalidates expired entries every refresh_interval on a daemon thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='reference-cache', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            'running': self._thread is not None,
+            'entries': {name: round(now - entry.checked, 1) for name, entry in self._entries.items()}, # seconds since checked
+            'errors': dict(self._errors),
+        }
+
+    def _expired(self, name: str, entry: ReferenceEntry) -> bool:
+        return time.monotonic() - entry.checked >= self._sources[name].ttl
+
+    def _refresh_quietly(self, name: str) -> None:
+        try:
+            self.refresh(name)
+        except Exception as e: # keep serving the previous value
+            self._errors[name] = f"{type(e).__name__}: {e}"
+
+    def _run(self) -> None:
+        self.warm()
+        while not self._stop.wait(self.refresh_interval):
+            for name, entry in list(self._entries.items()):
+                if self._expired(name, entry):
+                    self._refresh_quietly(name)
+            for name in list(self._sources): # failed warm-up
+                if name not in self._entries:
+                    self._refresh_quietly(name)
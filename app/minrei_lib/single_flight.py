@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Collection, Hashable, Optional
+import datetime
+import inspect
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error', 'finished', 'ttl')
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.finished: Optional[float] = None
+
+
+class SingleFlight:
+    """In-process request coalescing. Concurrent calls with the same key share one execution: the first
+    caller runs it, the others wait for its result (or its exception). Successful results are then served
+    for ttl seconds, so a burst of identical requests costs one computation and one set of queries.
+
+    Every caller gets its own copy of pandas / NumPy results, since callers add columns in place.
+    Read-only arrays are shared as they are.
+    """
+
+    def __init__(self, ttl: float = 10.0, max_entries: int = 128):
+        """
+        Args:
+            ttl (float, optional): Seconds a finished result is reused. 0 only coalesces in-flight calls.
+                Defaults to 10.
+            max_entries (int, optional): Finished results kept, oldest dropped first. Defaults to 128.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._flights: OrderedDict[Hashable, _Flight] = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {'executed': 0, 'coalesced': 0, 'cached': 0}
+
+    def do(self, key: Hashable, func: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """func(), or the result of the identical call in flight or finished less than ttl ago.
+
+        Args:
+            key (Hashable): Identity of the call.
+            func (Callable[[], Any]): The call.
+            ttl (Optional[float], optional): Seconds this result is reused. Defaults to None (self.ttl).
+        """
+        with self._lock:
+            self._evict()
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(ttl)
+                self._counts['executed'] += 1
+            else:
+                self._counts['cached' if flight.done.is_set() else 'coalesced'] += 1
+        if leader:
+            try:
+                flight.result = func()
+            except BaseException as e:
+                flight.error = e
+                with self._lock: # failures are not reused
+                    if self._flights.get(key) is flight:
+                        del self._flights[key]
+                raise
+            finally:
+                flight.finished = time.monotonic()
+                flight.done.set()
+        else:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+        return _own_copy(flight.result)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._flights = OrderedDict((key, flight) for key, flight in self._flights.items() if not flight.done.is_set())
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = sum(not flight.done.is_set() for flight in self._flights.values())
+            return {
+                'ttl': self.ttl,
+                'in_flight': in_flight,
+                'results': len(self._flights) - in_flight,
+                **self._counts,
+            }
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        finished = [key for key, flight in self._flights.items() if flight.done.is_set()]
+        for i, key in enumerate(finished):
+            flight = self._flights[key]
+            ttl = flight.ttl if flight.ttl is not None else self.ttl
+            if flight.finished <= now - ttl or len(finished) - i > self.max_entries:
+                del self._flights[key]
+
+
+def coalesce_key(name: str, version: Any, arguments: dict[str, Any], unordered: Collection[str] = ()) -> tuple:
+    """Hashable key of a call: name, data version (latest valuation_date) and normalized arguments.
+    Arguments named in unordered are treated as sets (trader, ticker and level lists), other sequences
+    keep their order.
+
+    Raises:
+        TypeError: An argument has no stable key (e.g. a DataFrame); run the call without coalescing.
+    """
+    return name, version, tuple(sorted((k, _normalize(v, k in unordered)) for k, v in arguments.items()))
+
+
+def coalesced(name: str, unordered: Collection[str] = (), ttl: Optional[float] = None) -> Callable:
+    """Decorator for Core functions taking a db argument: runs them through db.single_flight keyed by
+    coalesce_key, reusing results for ttl seconds (the SingleFlight's ttl if None). Calls without a
+    Database, when single flight is off, or with arguments that have no stable key (e.g. a vols frame)
+    run directly."""
+    def decorator(func):
+        signature = inspect.signature(func)
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            db = bound.arguments.get('db')
+            flight = getattr(db, 'single_flight', None)
+            if flight is None:
+                return func(*args, **kwargs)
+            arguments = {k: v for k, v in bound.arguments.items() if k != 'db'}
+            try:
+                key = coalesce_key(name, db.latest_valuation_date(), arguments, unordered)
+            except TypeError:
+                return func(*args, **kwargs)
+            return flight.do(key, lambda: func(*args, **kwargs), ttl)
+        return wrapper
+    return decorator
+
+
+def _normalize(value: Any, unordered: bool = False) -> Hashable:
+    if value is None or isinstance(value, (str, bytes, bool, int, float, datetime.date, np.generic)):
+        return value
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _normalize(v, unordered)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset, np.ndarray, pd.Index, pd.Series)):
+        items = [_normalize(v) for v in value]
+        return tuple(sorted(set(items), key=repr)) if unordered else tuple(items)
+    raise TypeError(f"no coalescing key for {type(value).__name__}")
+
+
+def _own_copy(result: Any) -> Any:
+    if isinstance(result, np.ndarray) and not result.flags.writeable:
+        return result
+    if isinstance(result, (pd.DataFrame, pd.Series, np.ndarray)):
+        return result.copy()
+    if isinstance(result, tuple):
+        return tuple(_own_copy(item) for item in result)
+    return result
@@ -0,0 +1,235 @@
+from typing import Iterable, Optional, Union
+from contextlib import suppress
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+HOUSE_BOOK = '__house__'
+INDEX_KEY = ['trader', 'px_location', 'contract_month']
+
+
+class Snapshot:
+    """One valuation_date of precomputed pnl vectors. The vector matrix is memory-mapped, so book slices
+    are views into the page cache shared by every worker process rather than copies in each heap.
+
+    index is the (trader, px_location, contract_month) -> [start, stop) row range table. Rows are sorted
+    by that key, so a trader, or one instrument of a trader, is a contiguous slice.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, 'index.json'), 'r') as f:
+            index = json.load(f)
+        self.valuation_date = pd.Timestamp(index['valuation_date'])
+        self.books = {book: tuple(bounds) for book, bounds in index['books'].items()}
+        self.vectors = np.load(os.path.join(directory, 'vectors.npy'), mmap_mode='r')
+        self.dates = pd.DatetimeIndex(np.load(os.path.join(directory, 'dates.npy')))
+        self.rows = pd.read_parquet(os.path.join(directory, 'rows.parquet'))
+        self.index = pd.read_parquet(os.path.join(directory, 'index.parquet'))
+
+    def book(self, name: str) -> Optional[tuple[pd.DataFrame, np.ndarray]]:
+        """Rows (without pnl vectors) and the (rows x dates) vector slice of one book, None if not in the snapshot."""
+        bounds = self.books.get(name)
+        if bounds is None:
+            return None
+        start, stop = bounds
+        return self.rows.iloc[start:stop].reset_index(drop=True), self.vectors[start:stop]
+
+    def select(
+            self,
+            traders: Optional[Iterable[str]] = None,
+            commoditygroups: Optional[Iterable[str]] = None,
+            rows: Optional[Union[np.ndarray, list[int]]] = None,
+        ) -> tuple[pd.DataFrame, np.ndarray]:
+        """Rows and vectors matching every given filter (all rows if none). A single trader is a view of the
+        memory map; other selections gather only the matching rows.
+
+        Args:
+            traders (Optional[Iterable[str]], optional): Books to keep. Unknown books match nothing.
+            commoditygroups (Optional[Iterable[str]], optional): Commodity groups to keep.
+            rows (Optional[Union[np.ndarray, list[int]]], optional): Row positions (e.g. from index ranges)
+                or a boolean mask over all rows.
+
+        Returns:
+            tuple[pd.DataFrame, np.ndarray]: Selected rows (without pnl vectors) and their (rows x dates) vectors.
+        """
+        if traders is not None and commoditygroups is None and rows is None:
+            traders = list(traders)
+            if len(traders) == 1 and traders[0] in self.books:
+                return self.book(traders[0])
+
+        mask = np.ones(len(self.rows), dtype=bool)
+        if traders is not None:
+            mask &= self._range_mask([self.books[t] for t in traders if t in self.books])
+        if commoditygroups is not None:
+            mask &= self.rows['commoditygroup'].isin(list(commoditygroups)).to_numpy()
+        if rows is not None:
+            rows = np.asarray(rows)
+            if rows.dtype != bool:
+                rows = self._range_mask([(i, i + 1) for i in rows])
+            mask &= rows
+
+        positions = np.flatnonzero(mask)
+        return self.rows.iloc[positions].reset_index(drop=True), self.vectors[positions]
+
+    def ranges(self, trader: Optional[str] = None, px_location: Optional[str] = None, contract_month=None) -> pd.DataFrame:
+        """index entries matching the given key parts (all entries if none)."""
+        index = self.index
+        for col, value in zip(INDEX_KEY, (trader, px_location, contract_month)):
+            if value is not None:
+                value = pd.Timestamp(value) if col == 'contract_month' else value
+                index = index[index[col] == value]
+        return index
+
+    def _range_mask(self, bounds: list[tuple[int, int]]) -> np.ndarray:
+        mask = np.zeros(len(self.rows) + 1, dtype=np.int8)
+        for start, stop in bounds:
+            mask[start] += 1
+            mask[stop] -= 1
+        return np.cumsum(mask[:-1]) > 0
+
+    @staticmethod
+    def to_frame(rows: pd.DataFrame, vectors: np.ndarray) -> pd.DataFrame:
+        """generate_pnl_vectors layout: rows with a pnl_vector list column."""
+        return rows.assign(pnl_vector=np.asarray(vectors, dtype=np.float64).tolist())
+
+
+class SnapshotStore:
+    """Nightly snapshots of every book's pnl vectors, one directory per valuation_date:
+
+        vectors.npy    (rows x dates) float32 (or float64) pnl matrix, opened with mmap_mode='r'
+        dates.npy      dates of the matrix columns
+        rows.parquet   position rows (trader, px_location, contract_month, greeks, ...) in matrix order
+        index.parquet  (trader, px_location, contract_month) -> [start, stop) row ranges
+        index.json     valuation_date and each book's [start, stop) row range
+
+    Rows are sorted by book (trader, or HOUSE_BOOK), px_location and contract_month, so a book is one
+    contiguous slice. Snapshots are written to a temporary directory and renamed into place, so readers
+    never see a partial snapshot.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._open: dict[str, tuple[float, Snapshot]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, valuation_date: pd.Timestamp) -> str:
+        return os.path.join(self.directory, pd.Timestamp(valuation_date).strftime('%Y-%m-%d'))
+
+    def valuation_dates(self) -> list[pd.Timestamp]:
+        dates = []
+        for name in os.listdir(self.directory):
+            if os.path.exists(os.path.join(self.directory, name, 'index.json')):
+                try:
+                    date = pd.Timestamp(name)
+                except ValueError: # .tmp / .old directories
+                    continue
+                if name == date.strftime('%Y-%m-%d'):
+                    dates.append(date)
+        return sorted(dates)
+
+    def latest(self) -> Optional[pd.Timestamp]:
+        dates = self.valuation_dates()
+        return dates[-1] if dates else None
+
+    def open(self, valuation_date: Optional[pd.Timestamp] = None) -> Optional[Snapshot]:
+        """Snapshot for valuation_date (latest if None), None if there is none. Opened once per process and
+        reopened when the snapshot is rebuilt."""
+        valuation_date = valuation_date if valuation_date is not None else self.latest()
+        if valuation_date is None:
+            return None
+        path = self._path(valuation_date)
+        try:
+            mtime = os.path.getmtime(os.path.join(path, 'index.json'))
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._open.get(path)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, Snapshot(path))
+                self._open[path] = cached
+            return cached[1]
+
+    def book(self, name: str, valuation_date: Optional[pd.Timestamp] = None) -> Optional[tuple[pd.DataFrame, np.ndarray]]:
+        """Snapshot.book of the latest (or given) snapshot, None on a miss."""
+        snapshot = self.open(valuation_date)
+        return snapshot.book(name) if snapshot is not None else None
+
+    def write(
+            self,
+            valuation_date: pd.Timestamp,
+            rows: pd.DataFrame,
+            vectors: np.ndarray,
+            dates: pd.DatetimeIndex,
+            book_col: str = 'trader',
+            dtype: str = 'float32',
+        ) -> str:
+        """
+        Args:
+            valuation_date (pd.Timestamp): Positions date of the snapshot.
+            rows (pd.DataFrame): Position rows, one per vector, with a book column.
+            vectors (np.ndarray): (rows x dates) pnl.
+            dates (pd.DatetimeIndex): Dates of the vector columns.
+            book_col (str, optional): Column naming each row's book. Defaults to 'trader'.
+            dtype (str, optional): Stored float type. float32 halves the map; pnl is served to the same
+                precision as the binary float32 encoding. Defaults to 'float32'.
+
+        Returns:
+            str: Snapshot directory.
+        """
+        key = [book_col, *INDEX_KEY[1:]]
+        rows = rows.reset_index(drop=True)
+        order = rows.sort_values(key, kind='stable', na_position='last').index.to_numpy()
+        rows = rows.iloc[order].reset_index(drop=True)
+        vectors = np.asarray(vectors)[order]
+        books, starts = np.unique(rows[book_col].to_numpy(), return_index=True)
+        stops = np.append(starts[1:], len(rows))
+
+        # one index entry per run of equal keys
+        bounds = rows.groupby(key, sort=False, dropna=False).indices
+        index = pd.DataFrame(
+            [(*k, int(v[0]), int(v[-1]) + 1) for k, v in bounds.items()],
+            columns=[*INDEX_KEY, 'start', 'stop'],
+        ).sort_values('start', kind='stable').reset_index(drop=True)
+
+        path = self._path(valuation_date)
+        # unique per build, so an overlapping build (cron and a manual run) never writes into this one
+        tmp = tempfile.mkdtemp(prefix=f"{os.path.basename(path)}.", suffix='.tmp', dir=self.directory)
+        try:
+            np.save(os.path.join(tmp, 'vectors.npy'), vectors.astype(dtype, copy=False))
+            np.save(os.path.join(tmp, 'dates.npy'), pd.DatetimeIndex(dates).to_numpy().astype('datetime64[ns]'))
+            rows.to_parquet(os.path.join(tmp, 'rows.parquet'), index=False)
+            index.to_parquet(os.path.join(tmp, 'index.parquet'), index=False)
+            with open(os.path.join(tmp, 'index.json'), 'w') as f:
+                json.dump({
+                    'valuation_date': pd.Timestamp(valuation_date).isoformat(),
+                    'books': {str(book): [int(start), int(stop)] for book, start, stop in zip(books, starts, stops)},
+                }, f)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        # swap directories; open memory maps of the old snapshot stay valid until released
+        shutil.rmtree(f"{path}.old", ignore_errors=True) # left by an interrupted swap
+        old = f"{tmp}.old"
+        with suppress(FileNotFoundError):
+            os.replace(path, old)
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+            shutil.rmtree(tmp, ignore_errors=True) # an overlapping build of the same date swapped in first
+        shutil.rmtree(old, ignore_errors=True)
+        return path
+
+    def prune(self, keep: int = 5) -> None:
+        """Deletes all but the newest keep snapshots."""
+        for valuation_date in self.valuation_dates()[:-keep] if keep > 0 else self.valuation_dates():
+            shutil.rmtree(self._path(valuation_date), ignore_errors=True)
@@ -0,0 +1,9 @@
+set nocount on;
+declare @start_valuation_date varchar(20) = :start_valuation_date;
+select valuation_date, var_level, level_name, price_date, pl, sc.supercommodity
+from historical_pl hpl
+left join supercommodity sc
+    on hpl.level_name = sc.commoditygroup
+where portfolio = 'hetcoport'
+    and (@start_valuation_date = '-1' or valuation_date >= try_cast(@start_valuation_date as date))
+order by valuation_date
\ No newline at end of file
@@ -1,6 +1,12 @@
-declare @start_valuation_date varchar(20) = '{start_valuation_date}';
+set nocount on;
+declare @var_levels table (var_level varchar(100) collate database_default primary key);
+insert into @var_levels select distinct value from openjson(:var_levels);
+declare @start_valuation_date varchar(20) = :start_valuation_date;
+declare @end_valuation_date varchar(20) = :end_valuation_date;
 with latest_date as (
-    select top 1 valuation_date from historical_pl where portfolio = 'hetcoport' and var_level in {var_levels} order by valuation_date desc
+    select top 1 valuation_date from historical_pl where portfolio = 'hetcoport' and var_level in (select var_level from @var_levels)
+        and (@end_valuation_date = '-1' or valuation_date <= try_cast(@end_valuation_date as date))
+    order by valuation_date desc
 )
 select valuation_date, var_level, level_name, price_date, pl, sc.supercommodity
 from historical_pl hpl
@@ -12,5 +18,6 @@ where portfolio = 'hetcoport'
         or 
         valuation_date >= try_cast(@start_valuation_date as date)
     )
-    and var_level in {var_levels}
+    and (@end_valuation_date = '-1' or valuation_date <= try_cast(@end_valuation_date as date))
+    and var_level in (select var_level from @var_levels)
 order by valuation_date
\ No newline at end of file
@@ -1,7 +1,10 @@
-declare @lookback int = {lookback_days};
-declare @start varchar(20) = '{start_date}';
+set nocount on;
+declare @px_locations table (px_location varchar(100) collate database_default primary key);
+insert into @px_locations select distinct value from openjson(:px_locations);
+declare @lookback int = :lookback_days;
+declare @start varchar(20) = :start_date;
 with latest_date as (
-	select top 1 px_date from price where px_location in {px_locations} order by px_date desc
+	select top 1 px_date from price where px_location in (select px_location from @px_locations) order by px_date desc
 )
 select
 	p.px_date, p.px_location, p.price, p.forward_month, p.contract_month,
@@ -22,7 +25,7 @@ left join price_desc pd
 	on p.px_location = pd.px_location
 left join fx_rate_hist fx
 	on p.px_date = fx.rate_date and pd.currency = fx.currency2 and fx.currency1 = 'USD' and pd.currency != 'USD' -- Only join FX rates for non-USD
-where p.px_location in {px_locations}
+where p.px_location in (select px_location from @px_locations)
 	and p.px_date >= dateadd(day, -@lookback, try_cast(@start as date))  -- Safely cast @start to date
 	and p.px_date <= try_cast(@start as date)  -- Ensure px_date is not greater than the start date
 order by p.px_date, p.forward_month
@@ -1,3 +1,10 @@
+set nocount on;
+declare @level_names table (level_name varchar(100) collate database_default primary key);
+insert into @level_names select distinct value from openjson(:level_names);
+declare @start_date varchar(20) = :start_date;
+declare @end_date varchar(20) = :end_date;
 select valuation_date, level_name, price_date, pl
-from historical_pl where level_name in {level_names} and portfolio = 'hetcoport'
+from historical_pl where level_name in (select level_name from @level_names) and portfolio = 'hetcoport'
+    and (@start_date = '-1' or valuation_date >= try_cast(@start_date as date))
+    and (@end_date = '-1' or valuation_date <= try_cast(@end_date as date))
 order by valuation_date
\ No newline at end of file
@@ -23,7 +23,7 @@ inner join tradermap tm
 	on rt.strategynumber = tm.strategynumber and rt.portfolio = tm.portfolio and tm.traderorgroup = 'trader'
 where rt.valuation_date = (select top 1 valuation_date from report_table where portfolio = 'hetcoport' order by valuation_date desc)
 	and rt.portfolio = 'hetcoport'
-	and tm.trader = '{trader_name}'
+	and tm.trader = :trader_name
 	and rt.producttype not like '%0%'
 	and rt.deltaposition is not NULL        -- Excludes NULL
 	and rt.deltaposition != 0               -- Excludes 0s
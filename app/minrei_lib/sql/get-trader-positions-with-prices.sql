@@ -16,7 +16,7 @@ left join contract_basis cb
 left join fx_rate_hist fx
 	on rt.valuation_date = fx.rate_date and pd.currency = fx.currency2 and fx.currency1 = 'USD' and pd.currency != 'USD' -- Only join FX rates for non-USD
 where rt.portfolio = 'hetcoport'
-	and tm.trader = '{trader_name}'
+	and tm.trader = :trader_name
 	and not rt.producttype like '%0%'
 	and rt.deltaposition is not NULL        -- Excludes NULL
 	and rt.deltaposition != 0               -- Excludes 0s
@@ -19,9 +19,9 @@ left join supercommodity sc
 	on cg.commoditygroup = sc.commoditygroup
 inner join tradermap tm
 	on rt.strategynumber = tm.strategynumber and rt.portfolio = tm.portfolio and tm.traderorgroup = 'trader'
-where rt.valuation_date = '{valuation_date}'
+where rt.valuation_date = :valuation_date
 	and rt.portfolio = 'hetcoport'
-	and tm.trader = '{trader_name}'
+	and tm.trader = :trader_name
 	and rt.producttype not like '%0%'
 	and rt.deltaposition is not NULL        -- Excludes NULL
 	and rt.deltaposition != 0               -- Excludes 0s
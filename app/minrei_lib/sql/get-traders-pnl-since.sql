@@ -0,0 +1,8 @@
+set nocount on;
+declare @start_date varchar(20) = :start_date;
+select
+    portfoliodate, tradername, overnightoractual, dtd_pl, mtd_pl, ytd_pl, updatedate
+from Trader_PL_SystemGenerate
+where portfolio = 'hetcoport'
+    and (@start_date = '-1' or portfoliodate >= try_cast(@start_date as date))
+order by portfoliodate, tradername
\ No newline at end of file
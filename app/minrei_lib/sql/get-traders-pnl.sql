@@ -1,7 +1,14 @@
+set nocount on;
+declare @trader_names table (tradername varchar(100) collate database_default primary key);
+insert into @trader_names select distinct value from openjson(:trader_names);
+declare @start_date varchar(20) = :start_date;
+declare @end_date varchar(20) = :end_date;
 select
     portfoliodate, tradername, dtd_pl, mtd_pl, ytd_pl, updatedate
 from Trader_PL_SystemGenerate
 where portfolio = 'hetcoport'
-    and overnightoractual = '{overnight_or_actual}'
-    and tradername in {trader_names}
+    and overnightoractual = :overnight_or_actual
+    and tradername in (select tradername from @trader_names)
+    and (@start_date = '-1' or portfoliodate >= try_cast(@start_date as date))
+    and (@end_date = '-1' or portfoliodate <= try_cast(@end_date as date))
 order by portfoliodate, tradername
\ No newline at end of file
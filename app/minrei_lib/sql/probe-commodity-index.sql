@@ -0,0 +1,3 @@
+select count(*) as row_count, checksum_agg(binary_checksum(cg.px_location, cg.commoditygroup, sc.supercommodity, cg.sensitivitybucket)) as row_checksum
+from commoditygroup cg
+left join supercommodity sc on cg.commoditygroup = sc.commoditygroup
\ No newline at end of file
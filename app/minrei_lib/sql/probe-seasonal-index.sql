@@ -0,0 +1,2 @@
+select count(*) as row_count, checksum_agg(binary_checksum(px_location)) as row_checksum
+from seasonal_ind
\ No newline at end of file
@@ -0,0 +1 @@
+select top 1 valuation_date from report_table where portfolio = 'hetcoport' and producttype like '0Trader' order by valuation_date desc
\ No newline at end of file
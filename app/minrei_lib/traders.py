@@ -1,33 +1,75 @@
-import datetime as datetime
-from dateutil.relativedelta import relativedelta
+from typing import Iterator, Optional
 
 import pandas as pd
 
-from .base import query
+from .base import query, query_chunks
+from .pnl_store import RealizedPnlStore
+from .positions import normalize_positions
+from .reference_cache import ReferenceCache
 
 
 class TraderQueries:
-    def __init__(self, db):
+    def __init__(self, db, cache: Optional[ReferenceCache] = None, pnl_store: Optional[RealizedPnlStore] = None):
         self._db = db
-    
-    @query("get-traders-pnl.sql")
-    def get_pnl(self, trader_names: list[str], overnight_or_actual: str = 'actual'):
-        """Get historical PnL for specified traders. Uses trader_pl_systemgenerate."""
+        self._cache = cache
+        self._pnl_store = pnl_store
+        if cache is not None:
+            cache.register('traders', self.load_traders, self.probe_traders)
+            cache.register('valuation_date', self.probe_traders)
+        if pnl_store is not None:
+            pnl_store.register('trader_pnl', self.load_pnl, schema={
+                'valuation_date': 'datetime64[ns]', 'tradername': 'object', 'overnightoractual': 'object',
+                'dtd_pl': 'float64', 'mtd_pl': 'float64', 'ytd_pl': 'float64', 'updatedate': 'datetime64[ns]',
+            })
+
+    def get_pnl(self, trader_names: list[str], overnight_or_actual: str = 'actual', start_date: str = '-1', end_date: str = '-1') -> pd.DataFrame:
+        """Get historical PnL for specified traders. Uses trader_pl_systemgenerate, through the realized pnl
+        store when configured.
+
+        Args:
+            trader_names (list[str]): Traders.
+            overnight_or_actual (str, optional): Defaults to 'actual'.
+            start_date (str, optional): First valuation_date. Defaults to '-1' (full history).
+            end_date (str, optional): Last valuation_date. Defaults to '-1' (latest).
+        """
         if isinstance(trader_names, str):
             trader_names = [trader_names]
 
-        trader_names = ", ".join(f"'{name}'" for name in trader_names)
-        trader_names = f"({trader_names})"
+        if self._pnl_store is None:
+            return self.query_pnl(trader_names, overnight_or_actual, start_date, end_date)
+        df = self._pnl_store.read(
+            'trader_pnl',
+            start_date=None if start_date == '-1' else start_date,
+            end_date=None if end_date == '-1' else end_date,
+            filters={'tradername': list(trader_names), 'overnightoractual': [overnight_or_actual]},
+        )
+        df = df.drop(columns='overnightoractual')
+        return df.sort_values(['valuation_date', 'tradername'], kind='stable').reset_index(drop=True)
+
+    @query("get-traders-pnl.sql")
+    def query_pnl(self, trader_names: list[str], overnight_or_actual: str = 'actual', start_date: str = '-1', end_date: str = '-1'):
         return {
-            'trader_names': f"({trader_names})",
-            'overnight_or_actual': overnight_or_actual
+            'trader_names': list(trader_names),
+            'overnight_or_actual': overnight_or_actual,
+            'start_date': start_date,
+            'end_date': end_date,
         }
     
-    def _process_get_pnl(self, df: pd.DataFrame) -> pd.DataFrame:
-        df['valuation_date'] = pd.to_datetime(df['portfoliodate'])
+    def _process_query_pnl(self, df: pd.DataFrame) -> pd.DataFrame:
         df = df.rename(columns={'portfoliodate': 'valuation_date'})
+        df['valuation_date'] = pd.to_datetime(df['valuation_date'])
         return df
 
+    @query_chunks("get-traders-pnl-since.sql")
+    def load_pnl(self, start_date: str = '-1') -> Iterator[pd.DataFrame]:
+        """Every trader's PnL (actual and overnight) from start_date on, streamed into the realized pnl store."""
+        return {
+            'start_date': start_date,
+        }
+
+    def _process_load_pnl(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self._process_query_pnl(df)
+
     @query("get-trader-positions-latest.sql")
     def get_positions_latest(self, trader_name: str):
         """Get positions for a specific trader.
@@ -38,7 +80,26 @@ class TraderQueries:
         }
     
     def _process_get_positions_latest(self, df: pd.DataFrame) -> pd.DataFrame:
-        return self.process_positions_helper(self, df)
+        return self.process_positions_helper(df)
+
+    @query("get-traders-positions-latest.sql")
+    def get_positions_latest_batch(self, trader_names: Optional[list[str]] = None):
+        """Get latest positions for several traders in one query, with a trader column.
+        NOTE: weight applied onto deltaposition. prices are not cleaned.
+
+        Args:
+            trader_names (Optional[list[str]], optional): Traders to load. Defaults to None (all traders).
+        """
+        if isinstance(trader_names, str):
+            trader_names = [trader_names]
+
+        return {
+            'all_traders': int(trader_names is None),
+            'trader_names': list(trader_names or []),
+        }
+
+    def _process_get_positions_latest_batch(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.process_positions_helper(df)
     
     @query("get-trader-positions.sql")
     def get_positions(self, trader_name: str, valuation_date: str):
@@ -48,9 +109,26 @@ class TraderQueries:
             'valuation_date': valuation_date,
         }
     
-    def _process_get_positions_latest(self, df: pd.DataFrame) -> pd.DataFrame:
+    @query("get-traders-positions.sql")
+    def get_positions_batch(self, trader_names: Optional[list[str]], valuation_date: str):
+        """Get positions of several traders on one valuation_date in one query, with a trader column.
+
+        Args:
+            trader_names (Optional[list[str]]): Traders to load. None for all traders.
+            valuation_date (str): '%Y-%m-%d'.
+        """
+        if isinstance(trader_names, str):
+            trader_names = [trader_names]
+
+        return {
+            'all_traders': int(trader_names is None),
+            'trader_names': list(trader_names or []),
+            'valuation_date': valuation_date,
+        }
+
+    def _process_get_positions_batch(self, df: pd.DataFrame) -> pd.DataFrame:
         return self.process_positions_helper(df)
-    
+
     @query("get-trader-positions-with-prices.sql")
     def get_positions_with_prices(self, trader_name: str, valuation_date: str = 'max'):
         """Get positions for a specific trader with associated prices."""
@@ -63,47 +141,39 @@ class TraderQueries:
         return self.process_positions_helper(df)
 
     def process_positions_helper(self, df: pd.DataFrame) -> pd.DataFrame:
-        df['valuation_date'] = pd.to_datetime(df['valuation_date'])
-        df['px_location'] = df['px_location'].str.upper()
-        df['px_location'] = df['px_location'].str.strip()
-        df['deltaposition'] *= df['weight'] / 100
-        df['gammaposition'] *= df['weight'] / 100
-        df['thetaposition'] *= df['weight'] / 100
-        df['vegaposition'] *= df['weight'] / 100
-        # guess contract month if only forward month present
-        mask = df['contract_month'].isna()
-        def impute_contract_month(fm, vd):
-            cm = vd + relativedelta(months=fm-1)
-            cm = cm - relativedelta(days=cm.day-1)
-            cm = pd.to_datetime(cm).strftime('%Y-%m-%d')
-            return cm
-        df.loc[mask, 'contract_month'] = \
-        df.loc[mask, 'contract_month'] = df[mask].apply(lambda row : impute_contract_month(row['forward_month'], row['valuation_date']), axis=1)
-        df['contract_month'] = pd.to_datetime(df['contract_month'])
-
-        # group positions
-        cols_to_index = ['valuation_date', 'px_location', 'forward_month']
-        cols_to_sum = ['deltaposition', 'gammaposition', 'thetaposition', 'vegaposition']
-        cols_to_first = list(set(df.columns) - set(cols_to_sum) - set(cols_to_index))
-        df = df.groupby(cols_to_index).agg({
-            **{col: 'sum' for col in cols_to_sum},
-            **{col: 'first' for col in cols_to_first}
-        }).reset_index()
-        return df
+        return normalize_positions(df, apply_weight=True)
 
     
-    @query("get-trader-historical-pl.sql")
-    def get_historical_pl(self, level_names: list[str]):
+    def get_historical_pl(self, level_names: list[str], start_date: str = '-1', end_date: str = '-1') -> pd.DataFrame:
+        """Historical pl vectors of levels, through the realized pnl store when configured.
+
+        Args:
+            level_names (list[str]): Levels.
+            start_date (str, optional): First valuation_date. Defaults to '-1' (full history).
+            end_date (str, optional): Last valuation_date. Defaults to '-1' (latest).
+        """
         if isinstance(level_names, str):
             level_names = [level_names]
 
-        level_names = ", ".join(f"'{name}'" for name in level_names)
-        level_names = f"({level_names})"
+        if self._pnl_store is None:
+            return self.query_historical_pl(level_names, start_date, end_date)
+        return self._pnl_store.read(
+            'historical_pl',
+            start_date=None if start_date == '-1' else start_date,
+            end_date=None if end_date == '-1' else end_date,
+            filters={'level_name': list(level_names)},
+            columns=['valuation_date', 'level_name', 'price_date', 'pl'],
+        )
+
+    @query("get-trader-historical-pl.sql")
+    def query_historical_pl(self, level_names: list[str], start_date: str = '-1', end_date: str = '-1'):
         return {
-            'level_names': level_names
+            'level_names': list(level_names),
+            'start_date': start_date,
+            'end_date': end_date,
         }
     
-    def _process_get_historical_pl(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _process_query_historical_pl(self, df: pd.DataFrame) -> pd.DataFrame:
         df['valuation_date'] = pd.to_datetime(df['valuation_date'])
         return df
     
@@ -144,12 +214,32 @@ class TraderQueries:
             'US SECURITIES'
         ]
     
+    def latest_valuation_date(self) -> Optional[pd.Timestamp]:
+        """Latest trader report valuation_date from the reference cache. None without a cache (never queries)."""
+        if self._cache is None:
+            return None
+        latest = self._cache.get('valuation_date')
+        return pd.Timestamp(latest[0]) if latest else None
+
+    def list_traders(self) -> list[str]:
+        """Traders on the latest trader report, from the reference cache when configured."""
+        if self._cache is not None:
+            return list(self._cache.get('traders'))
+        return list(self.load_traders())
+
+    @query("probe-traders.sql", coalesce=False)
+    def probe_traders(self):
+        return {}
+
+    def _process_probe_traders(self, df: pd.DataFrame) -> tuple:
+        return tuple(df.iloc[0]) if len(df) else ()
+
     @query("list-traders.sql")
-    def list_traders(self) -> pd.DataFrame:
+    def load_traders(self):
         return {}
     
-    def _process_list_traders(self, df: pd.DataFrame) -> list[str]:
-        return df['trader'].tolist()
+    def _process_load_traders(self, df: pd.DataFrame) -> tuple[str, ...]:
+        return tuple(df['trader'])
         # return [
         #     'A. Amann',
         #     'A. Bailey',
@@ -0,0 +1,53 @@
+from contextlib import suppress
+from typing import Optional
+from urllib.parse import quote
+import os
+import tempfile
+
+import numpy as np
+
+
+class PnlVectorStore:
+    """Persists per-trader unit pnl matrices so daily refreshes only compute what changed.
+
+    Each trader is one .npz file holding:
+        valuation_date: positions date the state was built for.
+        lookback_days: window length the state was built with.
+        window_dates: trading dates in the window, including the first date whose returns are dropped.
+        px_location, is_seasonal, month_key: instrument keys (month_key is the contract_month in ns for
+            seasonal instruments, else the forward_month).
+        unit_pnl: (instruments x window_dates[1:]) price deltas for a position of 1.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, trader: str) -> str:
+        return os.path.join(self.directory, f"{quote(trader, safe='')}.npz")
+
+    def load(self, trader: str) -> Optional[dict]:
+        path = self._path(trader)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as state:
+            return {k: state[k] for k in state.files}
+
+    def save(self, trader: str, state: dict) -> None:
+        path = self._path(trader)
+        # write to a unique name then rename so concurrent readers never see a partial file and
+        # concurrent refreshes of the same trader never share a temporary file
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **state)
+            os.replace(tmp, path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.remove(tmp)
+            raise
+
+    def delete(self, trader: str) -> None:
+        path = self._path(trader)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,157 @@
+import asyncio
+import datetime
+import json
+from typing import Annotated, Literal, Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+from ..dependencies import get_compute_executor, get_db, get_io_executor, get_job_queue
+from ..encoding import pnl_vectors_response, wants_binary
+from ..executors import BoundedExecutor
+from ..jobs import DONE, FINISHED, JobQueue
+from ..minrei_lib import Core, Database, VarBacktest
+
+router = APIRouter()
+
+# seconds between state checks of an event stream
+EVENT_INTERVAL = 0.5
+
+
+class JobSpec(BaseModel):
+    traders: Optional[list[str]] = None # None for every trader
+
+    @field_validator('traders')
+    @classmethod
+    def _normalize_traders(cls, traders: Optional[list[str]]) -> Optional[list[str]]:
+        # same set of traders, same job
+        return sorted(set(traders)) if traders is not None else None
+
+
+class PnlVectorsJob(JobSpec):
+    kind: Literal['pnl_vectors']
+    house: bool = False # the house book instead of traders
+    lookback_days: int = 400
+    revaluation: Literal['delta', 'taylor'] = 'delta'
+
+
+class BacktestJob(JobSpec):
+    kind: Literal['backtest']
+    start_date: datetime.date
+    end_date: datetime.date
+    lookback_days: int = Field(400, ge=1)
+    tail: int = Field(251, ge=1)
+    confidence_level: float = Field(0.95, gt=0, lt=1)
+    revaluation: Literal['delta', 'taylor'] = 'delta'
+
+
+class StressJob(JobSpec):
+    kind: Literal['stress']
+    dates: list[datetime.date] = [] # stress dates, e.g. ['2020-04-20']
+    worst: int = Field(10, ge=0)
+    lookback_days: int = 400
+    revaluation: Literal['delta', 'taylor'] = 'delta'
+
+
+JobRequest = Annotated[Union[PnlVectorsJob, BacktestJob, StressJob], Field(discriminator='kind')]
+
+
+def _computation(spec: JobRequest, db: Database):
+    """The blocking function a job runs, called with a progress callback."""
+    if isinstance(spec, PnlVectorsJob):
+        if spec.house:
+            return lambda report: Core.generate_house_pnl_vectors(spec.lookback_days, db=db, revaluation=spec.revaluation)
+        return lambda report: Core.generate_pnl_vectors_batch(spec.traders, spec.lookback_days, db=db, revaluation=spec.revaluation)
+    if isinstance(spec, BacktestJob):
+        def backtest(report):
+            results = VarBacktest.run(
+                spec.traders, spec.start_date.isoformat(), spec.end_date.isoformat(),
+                lookback_days=spec.lookback_days,
+                tail=spec.tail,
+                confidence_level=spec.confidence_level,
+                revaluation=spec.revaluation,
+                max_workers=0,
+                db_factory=lambda: db,
+                progress=report,
+            )
+            statistics = VarBacktest.statistics(results, spec.confidence_level) if len(results) else results.iloc[:0]
+            return {
+                'results': results.astype(object).where(results.notna(), None).to_dict(orient='records'),
+                'statistics': statistics.astype(object).where(statistics.notna(), None).to_dict(orient='records'),
+            }
+        return backtest
+    def stress(report):
+        df = Core.stress_pnl(spec.traders, [date.isoformat() for date in spec.dates], spec.worst, spec.lookback_days, db=db, revaluation=spec.revaluation)
+        return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+    return stress
+
+
+@router.post('/jobs', tags=['jobs'], status_code=202)
+async def submit_job(
+        spec: JobRequest,
+        db: Database = Depends(get_db),
+        jobs: JobQueue = Depends(get_job_queue),
+        executor: BoundedExecutor = Depends(get_io_executor),
+    ):
+    """Queues a pnl vectors, backtest or stress computation. Identical requests (same kind and parameters,
+    traders in any order) on the same latest valuation_date while a job is queued, running or its result
+    is stored return that job."""
+    version = await executor.run(db.latest_valuation_date)
+    job = jobs.submit(spec.kind, spec.model_dump(mode='json', exclude={'kind'}), _computation(spec, db), version)
+    return job.state()
+
+@router.get('/jobs', tags=['jobs'])
+async def list_jobs(jobs: JobQueue = Depends(get_job_queue)):
+    return [job.state() for job in jobs.jobs()]
+
+@router.get('/jobs/{job_id}', tags=['jobs'])
+async def get_job(job_id: str, jobs: JobQueue = Depends(get_job_queue)):
+    return _job(jobs, job_id).state()
+
+@router.get('/jobs/{job_id}/events', tags=['jobs'])
+async def stream_job(job_id: str, jobs: JobQueue = Depends(get_job_queue)):
+    """Server-sent events: a 'job' event with the job state on every change, ending once it finishes."""
+    job = _job(jobs, job_id)
+    async def events():
+        last = None
+        while True:
+            revision, state = job.revision, job.state()
+            if revision != last:
+                last = revision
+                yield f"event: job\ndata: {json.dumps(state)}\n\n"
+            if state['status'] in FINISHED:
+                return
+            await asyncio.sleep(EVENT_INTERVAL)
+    return StreamingResponse(events(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@router.get('/jobs/{job_id}/result', tags=['jobs'])
+async def get_job_result(
+        job_id: str,
+        request: Request,
+        format: Optional[str] = None,
+        dtype: Literal['float64', 'float32'] = 'float64',
+        jobs: JobQueue = Depends(get_job_queue),
+        executor: BoundedExecutor = Depends(get_compute_executor),
+    ):
+    """Result of a finished job. pnl_vectors results are encoded like /var/pnl_vectors (format, dtype)."""
+    job = _job(jobs, job_id)
+    if job.status != DONE:
+        raise HTTPException(status_code=409, detail=job.state())
+    if job.kind != 'pnl_vectors':
+        return job.result
+    binary = wants_binary(request, format)
+    return await executor.run(pnl_vectors_response, job.result, binary, dtype)
+
+@router.delete('/jobs/{job_id}', tags=['jobs'])
+async def cancel_job(job_id: str, jobs: JobQueue = Depends(get_job_queue)):
+    """Cancels a queued job or drops a finished one's result. Running jobs finish."""
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f'unknown job {job_id}')
+    return job.state()
+
+def _job(jobs: JobQueue, job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f'unknown job {job_id}')
+    return job
@@ -1,15 +1,41 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from ..dependencies import get_db, get_io_executor
+from ..executors import BoundedExecutor
 from ..minrei_lib import Database
+from ..minrei_lib.profiling import METRICS
 
 
 router = APIRouter()
 
 @router.get('/utils/traders', tags=['utils'])
-async def get_traders_list():
-    db = Database()
-    return db.traders.list_traders()
+async def get_traders_list(db: Database = Depends(get_db), executor: BoundedExecutor = Depends(get_io_executor)):
+    return await executor.run(db.traders.list_traders)
 
 @router.get('/utils/groups', tags=['utils'])
-async def get_groups_list():
-    db = Database()
-    return db.traders.list_groups()
\ No newline at end of file
+async def get_groups_list(db: Database = Depends(get_db)):
+    return db.traders.list_groups()
+
+@router.get('/utils/db/pool', tags=['utils'])
+async def get_pool_status(db: Database = Depends(get_db)):
+    return db.pool_status()
+
+@router.get('/utils/reference', tags=['utils'])
+async def get_reference_cache_status(db: Database = Depends(get_db)):
+    cache = db.reference_cache
+    return cache.stats() if cache is not None else None
+
+@router.get('/utils/pnl_store', tags=['utils'])
+async def get_pnl_store_status(db: Database = Depends(get_db)):
+    store = db.pnl_store
+    return store.stats() if store is not None else None
+
+@router.get('/utils/single_flight', tags=['utils'])
+async def get_single_flight_status(db: Database = Depends(get_db)):
+    flight = db.single_flight
+    return flight.stats() if flight is not None else None
+
+@router.get('/metrics', tags=['utils'], response_class=PlainTextResponse)
+async def get_metrics():
+    """Span and route latency histograms in the Prometheus text format."""
+    return METRICS.render()
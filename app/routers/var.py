@@ -1,13 +1,190 @@
+from typing import Annotated, Literal, Optional
+
+import numpy as np
 import pandas as pd
-from fastapi import APIRouter
-from ..minrei_lib import Core
+from fastapi import APIRouter, Depends, Query, Request
+from pydantic import BaseModel, Field
+from ..dependencies import get_compute_executor, get_db, get_snapshot_store, get_vector_store
+from ..encoding import pnl_vectors_response, wants_binary
+from ..executors import BoundedExecutor
+from ..minrei_lib import HOUSE_BOOK, Core, Database, PnlVectorStore, SnapshotStore
 
 router = APIRouter()
 
 @router.get('/var/pnl_vectors', tags=['var'])
-async def get_pnl_vectors(trader: str):
-    df = Core.generate_pnl_vectors(trader)
-    return df.to_dict(orient='records')
+async def get_pnl_vectors(
+        trader: str,
+        request: Request,
+        format: Optional[str] = None,
+        dtype: Literal['float64', 'float32'] = 'float64',
+        revaluation: Literal['delta', 'taylor'] = 'delta',
+        live: bool = False,
+        db: Database = Depends(get_db),
+        executor: BoundedExecutor = Depends(get_compute_executor),
+        store: Optional[PnlVectorStore] = Depends(get_vector_store),
+        snapshots: Optional[SnapshotStore] = Depends(get_snapshot_store),
+    ):
+    """PnL vectors for a trader's book. revaluation=taylor adds gamma and theta to the delta pnl.
+    Delta vectors are served from the latest nightly snapshot when there is one, unless live=true."""
+    binary = wants_binary(request, format)
+    def compute():
+        cached = _snapshot_book(snapshots, trader, revaluation, live, drop=('trader',))
+        if cached is not None:
+            rows, vectors = cached
+            return pnl_vectors_response(rows, binary, dtype, vectors=vectors)
+        if store is not None:
+            df = Core.refresh_pnl_vectors(trader, store, db=db, revaluation=revaluation)
+        else:
+            df = Core.generate_pnl_vectors(trader, db=db, revaluation=revaluation)
+        return pnl_vectors_response(df, binary, dtype)
+    return await executor.run(compute)
+
+@router.get('/var/pnl_vectors/batch', tags=['var'])
+async def get_pnl_vectors_batch(
+        request: Request,
+        traders: Optional[list[str]] = Query(None),
+        format: Optional[str] = None,
+        dtype: Literal['float64', 'float32'] = 'float64',
+        revaluation: Literal['delta', 'taylor'] = 'delta',
+        live: bool = False,
+        db: Database = Depends(get_db),
+        executor: BoundedExecutor = Depends(get_compute_executor),
+        snapshots: Optional[SnapshotStore] = Depends(get_snapshot_store),
+    ):
+    """PnL vectors for the given traders (all traders if omitted) computed in one pass. Served from the
+    latest nightly snapshot when every requested trader is in it (see get_pnl_vectors)."""
+    binary = wants_binary(request, format)
+    def compute():
+        if traders is not None:
+            books = [_snapshot_book(snapshots, trader, revaluation, live) for trader in traders]
+            if books and all(book is not None for book in books):
+                rows = pd.concat([rows for rows, _ in books], ignore_index=True)
+                return pnl_vectors_response(rows, binary, dtype, vectors=np.concatenate([vectors for _, vectors in books]))
+        df = Core.generate_pnl_vectors_batch(traders, db=db, revaluation=revaluation)
+        return pnl_vectors_response(df, binary, dtype)
+    return await executor.run(compute)
+
+@router.get('/var/pnl_vectors/house', tags=['var'])
+async def get_house_pnl_vectors(
+        request: Request,
+        format: Optional[str] = None,
+        dtype: Literal['float64', 'float32'] = 'float64',
+        revaluation: Literal['delta', 'taylor'] = 'delta',
+        live: bool = False,
+        db: Database = Depends(get_db),
+        executor: BoundedExecutor = Depends(get_compute_executor),
+        snapshots: Optional[SnapshotStore] = Depends(get_snapshot_store),
+    ):
+    """PnL vectors for the house book (see get_pnl_vectors)."""
+    binary = wants_binary(request, format)
+    def compute():
+        cached = _snapshot_book(snapshots, HOUSE_BOOK, revaluation, live, drop=('trader', 'weight'))
+        if cached is not None:
+            rows, vectors = cached
+            return pnl_vectors_response(rows, binary, dtype, vectors=vectors)
+        df = Core.generate_house_pnl_vectors(db=db, revaluation=revaluation)
+        return pnl_vectors_response(df, binary, dtype)
+    return await executor.run(compute)
+
+def _snapshot_book(snapshots: Optional[SnapshotStore], book: str, revaluation: str, live: bool, drop: tuple[str, ...] = ()):
+    """(rows, vectors) of book in the latest snapshot, None when the caller has to compute live.
+    Snapshots hold delta pnl only. drop lists snapshot columns the live response does not carry
+    (trader for single-book responses, weight for the house book)."""
+    if snapshots is None or live or revaluation != 'delta':
+        return None
+    cached = snapshots.book(book)
+    if cached is None or not drop:
+        return cached
+    rows, vectors = cached
+    return rows.drop(columns=list(drop)), vectors
+
+class AggregationRequest(BaseModel):
+    traders: list[str]
+    group_by: list[Literal['trader', 'px_location', 'contract_month', 'commoditygroup', 'supercommodity', 'custom_group']] = Field(['px_location'], min_length=1)
+    custom_groups: dict[str, str] = {} # idx -> group name, used by 'custom_group'
+    tail: int = Field(251, ge=1)
+    confidence_level: float = Field(0.95, gt=0, lt=1)
+    include_vectors: bool = False
+    revaluation: Literal['delta', 'taylor'] = 'delta'
+    ladder_windows: list[Annotated[int, Field(ge=1)]] = [] # e.g. [60, 125, 251]; adds var_/es_ columns per window and level
+    ladder_confidence_levels: list[Annotated[float, Field(gt=0, lt=1)]] = [] # e.g. [0.95, 0.975, 0.99]
+    commoditygroups: Optional[list[str]] = None # restrict to these commodity groups
+    live: bool = False # skip the nightly snapshot
+
+@router.post('/var/aggregate', tags=['var'])
+async def aggregate_var(
+        spec: AggregationRequest,
+        db: Database = Depends(get_db),
+        executor: BoundedExecutor = Depends(get_compute_executor),
+        snapshots: Optional[SnapshotStore] = Depends(get_snapshot_store),
+    ):
+    """Per-group summed pnl vectors and VaR for the traders' books, grouped server-side. Sums the rows of
+    the latest nightly snapshot in place when every trader is in it (see get_pnl_vectors). Otherwise the
+    books' pnl vector matrix is computed once and reused by regroups on the same latest valuation_date
+    (see Core.pnl_vector_matrix). Missing group keys are returned as null."""
+    def compute():
+        snapshot = snapshots.open() if snapshots is not None and not spec.live and spec.revaluation == 'delta' else None
+        if snapshot is not None and all(trader in snapshot.books for trader in spec.traders):
+            df, vectors = snapshot.select(spec.traders, spec.commoditygroups)
+        else:
+            df, vectors = Core.pnl_vector_matrix(spec.traders, db=db, revaluation=spec.revaluation)
+            if spec.commoditygroups is not None:
+                mask = df['commoditygroup'].isin(spec.commoditygroups).to_numpy()
+                df, vectors = df[mask].reset_index(drop=True), vectors[mask]
+        df = Core.aggregate_pnl_vectors(
+            df, spec.group_by, spec.custom_groups, spec.tail, spec.confidence_level,
+            tuple(spec.ladder_windows), tuple(spec.ladder_confidence_levels), vectors,
+        )
+        if not spec.include_vectors:
+            df = df.drop(columns='pnl_vector')
+        return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+    return await executor.run(compute)
+
+@router.get('/var/mc', tags=['var'])
+async def get_mc_var(
+        trader: str,
+        n_scenarios: int = Query(10_000, ge=1_000, le=100_000),
+        confidence_levels: list[Annotated[float, Field(gt=0, lt=1)]] = Query([0.95]),
+        revaluation: Literal['delta', 'taylor'] = 'delta',
+        ewma_lambda: Optional[float] = Query(None, gt=0, lt=1),
+        shrinkage: Optional[float] = Query(None, ge=0, le=1),
+        n_factors: Optional[int] = Query(None, ge=1),
+        seed: Optional[int] = None,
+        db: Database = Depends(get_db),
+        executor: BoundedExecutor = Depends(get_compute_executor),
+    ):
+    """Monte Carlo VaR and ES of a trader's book from a factor model of instrument return covariance."""
+    def compute():
+        df = Core.mc_var(
+            trader, db=db,
+            revaluation=revaluation,
+            n_scenarios=n_scenarios,
+            confidence_levels=tuple(confidence_levels),
+            ewma_lambda=ewma_lambda,
+            shrinkage=shrinkage,
+            n_factors=n_factors,
+            seed=seed,
+        )
+        return df.to_dict(orient='records')
+    return await executor.run(compute)
+
+@router.get('/var/attribution', tags=['var'])
+async def get_var_attribution(
+        trader: Optional[str] = None,
+        top: Optional[int] = Query(None, ge=1),
+        tail: int = Query(251, ge=1),
+        confidence_level: float = Query(0.95, gt=0, lt=1),
+        bandwidth: Optional[float] = Query(None, gt=0),
+        revaluation: Literal['delta', 'taylor'] = 'delta',
+        db: Database = Depends(get_db),
+        executor: BoundedExecutor = Depends(get_compute_executor),
+    ):
+    """Component, marginal and incremental VaR per position of a trader's book (house book if no trader).
+    Undefined values (e.g. marginal_var of a position with no delta) are returned as null."""
+    def compute():
+        df = Core.var_attribution(trader, top, db=db, tail=tail, confidence_level=confidence_level, bandwidth=bandwidth, revaluation=revaluation)
+        return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+    return await executor.run(compute)
 
 @router.get('/var/pnl_vectors_test', tags=['var'])
 async def get_pnl_vectors_test():
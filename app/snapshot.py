@@ -0,0 +1,36 @@
+"""Nightly pnl vector snapshot: every trader's book and the house book, written to MINREI_SNAPSHOT_DIR
+(or --directory) for the API to serve without recomputing.
+
+    python -m app.snapshot [--lookback-days 400] [--dtype float32] [--keep 5] [--directory DIR]
+"""
+import argparse
+import os
+import time
+
+from .dependencies import database_settings
+from .minrei_lib import Core, Database, SnapshotStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--directory', default=os.getenv('MINREI_SNAPSHOT_DIR'))
+    parser.add_argument('--lookback-days', type=int, default=400)
+    parser.add_argument('--dtype', choices=['float32', 'float64'], default='float32')
+    parser.add_argument('--keep', type=int, default=5, help='snapshots kept after the build')
+    args = parser.parse_args()
+    if not args.directory:
+        parser.error('--directory or MINREI_SNAPSHOT_DIR is required')
+
+    store = SnapshotStore(args.directory)
+    db = Database(**database_settings())
+    start = time.perf_counter()
+    try:
+        valuation_date = Core.build_snapshot(store, args.lookback_days, db=db, dtype=args.dtype)
+    finally:
+        db.dispose()
+    store.prune(args.keep)
+    print(f"snapshot {valuation_date:%Y-%m-%d} written to {args.directory} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
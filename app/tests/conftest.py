@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.minrei_lib import Database
+
+
+@pytest.fixture
+def db():
+    """Database on an in-memory SQLite engine instead of the risk server."""
+    db = Database(engine=sa.create_engine('sqlite://'))
+    yield db
+    db.dispose()
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """The app with db preset on app.state, so the lifespan shares it instead of connecting."""
+    for name in ('MINREI_VECTOR_STORE_DIR', 'MINREI_SNAPSHOT_DIR', 'MINREI_PNL_STORE_DIR', 'MINREI_PRICE_CACHE_DIR', 'MINREI_PROFILE_DIR'):
+        monkeypatch.delenv(name, raising=False)
+    app.state.db = db
+    try:
+        with TestClient(app) as client:
+            yield client
+    finally:
+        app.state.db = None
+
+
+@pytest.fixture
+def prices():
+    """Raw price history for two px_locations, two contracts each, on ten business days."""
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range('2025-01-01', periods=10)
+    rows = [
+        (date, location, forward_month, pd.Timestamp('2025-02-01') + pd.DateOffset(months=forward_month - 1))
+        for date in dates for location in ('AAA', 'BBB') for forward_month in (1, 2)
+    ]
+    df = pd.DataFrame(rows, columns=['px_date', 'px_location', 'forward_month', 'contract_month'])
+    df['price'] = 50 + rng.normal(size=len(df)).cumsum()
+    return df
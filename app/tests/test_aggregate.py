@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.minrei_lib import Core
+from app.minrei_lib.portfolio_analysis import PortfolioAnalysis
+
+
+@pytest.fixture
+def book():
+    rng = np.random.default_rng(0)
+    rows = pd.DataFrame({
+        'trader': ['alice', 'alice', 'bob', 'bob', 'bob'],
+        'px_location': ['AAA', 'BBB', 'AAA', 'CCC', 'CCC'],
+        'idx': ['AAA|2025-01', 'BBB|2025-01', 'AAA|2025-01', 'CCC|2025-01', 'CCC|2025-02'],
+    })
+    return rows, rng.normal(size=(len(rows), 300))
+
+
+def test_aggregate_matches_grouped_var(book):
+    rows, vectors = book
+    df = Core.aggregate_pnl_vectors(rows, ['px_location'], tail=251, ladder_windows=(60,), ladder_confidence_levels=(0.99,), vectors=vectors)
+    assert df['px_location'].tolist() == ['AAA', 'BBB', 'CCC']
+    summed = np.stack([vectors[[0, 2]].sum(axis=0), vectors[1], vectors[[3, 4]].sum(axis=0)])
+    np.testing.assert_allclose(np.array(df['pnl_vector'].tolist()), summed)
+    np.testing.assert_allclose(df['var'], [PortfolioAnalysis.var(row) for row in summed])
+    np.testing.assert_allclose(df['var_60d_99'], [PortfolioAnalysis.var(row, 60, 0.99) for row in summed])
+    assert 'es_60d_99' in df.columns
+
+
+def test_aggregate_custom_groups_and_list_column(book):
+    rows, vectors = book
+    with_lists = rows.assign(pnl_vector=vectors.tolist())
+    df = Core.aggregate_pnl_vectors(with_lists, ['trader', 'custom_group'], {'AAA|2025-01': 'front', 'BBB|2025-01': 'front'})
+    assert df[['trader', 'custom_group']].values.tolist() == [['alice', 'front'], ['bob', 'CCC'], ['bob', 'front']]
+    np.testing.assert_allclose(df['pnl_vector'].iloc[1], vectors[3] + vectors[4])
+
+
+@pytest.mark.parametrize('change', [{'tail': 0}, {'ladder_windows': [60, 0]}, {'confidence_level': 1.0}, {'group_by': []}])
+def test_aggregate_request_validation(client, change):
+    response = client.post('/var/aggregate', json={'traders': ['alice'], **change})
+    assert response.status_code == 422
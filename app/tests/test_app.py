@@ -0,0 +1,26 @@
+from app.main import app
+
+
+def test_lifespan_keeps_preset_db(client, db):
+    assert app.state.db is db
+    assert app.state.io_executor is not None
+    assert app.state.jobs is not None
+
+
+def test_db_pool(client):
+    response = client.get('/utils/db/pool')
+    assert response.status_code == 200
+    status = response.json()
+    assert status['pool_class'] == type(app.state.db.engine.pool).__name__
+    assert set(status) == {'pool_class', 'size', 'checked_in', 'checked_out', 'overflow', 'status'}
+
+
+def test_groups(client):
+    response = client.get('/utils/groups')
+    assert response.status_code == 200
+    assert 'AGRICULTURE' in response.json()
+
+
+def test_caches_disabled(client):
+    assert client.get('/utils/reference').json() is None
+    assert client.get('/utils/pnl_store').json() is None
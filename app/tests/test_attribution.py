@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.minrei_lib import Core
+from app.minrei_lib.portfolio_analysis import PortfolioAnalysis
+
+
+@pytest.fixture
+def pnl():
+    pnl = np.random.default_rng(0).normal(size=(6, 300)) * np.arange(1, 7).reshape(-1, 1)
+    pnl[5, 10] = np.nan
+    return pnl
+
+
+@pytest.mark.parametrize('tail, confidence_level', [(251, 0.95), (100, 0.99)])
+def test_components_sum_to_var(pnl, tail, confidence_level):
+    df = PortfolioAnalysis.var_attribution(pnl, tail, confidence_level)
+    portfolio = np.nan_to_num(pnl).sum(axis=0)
+    var = PortfolioAnalysis.var(portfolio, tail, confidence_level)
+    assert df['component_var'].sum() == pytest.approx(var)
+    assert df['component_pct'].sum() == pytest.approx(1.0)
+
+
+def test_kernel_components_sum_to_smoothed_var(pnl):
+    df = PortfolioAnalysis.var_attribution(pnl, bandwidth=2.5)
+    scenarios = np.sort(np.nan_to_num(pnl).sum(axis=0)[-251:])
+    kernel = np.exp(-0.5 * ((np.arange(251) - 12.1) / 2.5) ** 2)
+    assert df['component_var'].sum() == pytest.approx(scenarios @ kernel / kernel.sum())
+
+
+def test_incremental_matches_leave_one_out(pnl):
+    df = PortfolioAnalysis.var_attribution(pnl, block_rows=4)
+    book = np.nan_to_num(pnl)
+    var = PortfolioAnalysis.var(book.sum(axis=0))
+    expected = [var - PortfolioAnalysis.var(np.delete(book, i, axis=0).sum(axis=0)) for i in range(len(book))]
+    np.testing.assert_allclose(df['incremental_var'], expected)
+
+
+def test_no_dates():
+    df = PortfolioAnalysis.var_attribution(np.empty((2, 0)))
+    assert len(df) == 2 and df.isna().all().all()
+
+
+def test_attribution_route(client, monkeypatch):
+    calls = []
+    def var_attribution(trader=None, top=None, **kwargs):
+        calls.append(kwargs)
+        return pd.DataFrame({'px_location': ['AAA'], 'deltaposition': [0.0], 'component_var': [-1.0], 'marginal_var': [np.nan]})
+    monkeypatch.setattr(Core, 'var_attribution', staticmethod(var_attribution))
+
+    response = client.get('/var/attribution', params={'trader': 'alice', 'tail': 100, 'confidence_level': 0.99})
+    assert response.json() == [{'px_location': 'AAA', 'deltaposition': 0.0, 'component_var': -1.0, 'marginal_var': None}]
+    assert (calls[0]['tail'], calls[0]['confidence_level']) == (100, 0.99)
+    for params in ({'tail': 0}, {'confidence_level': 1.0}, {'confidence_level': 0}):
+        assert client.get('/var/attribution', params=params).status_code == 422
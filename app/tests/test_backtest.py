@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import chi2
+
+from app.minrei_lib import VarBacktest
+from app.minrei_lib.portfolio_analysis import PortfolioAnalysis
+
+
+def results(trader: str, hits: list[bool]) -> pd.DataFrame:
+    return pd.DataFrame({
+        'trader': trader,
+        'valuation_date': pd.bdate_range('2025-01-01', periods=len(hits)),
+        'exception': hits,
+    })
+
+
+def kupiec(n, x, p):
+    return -2 * ((n - x) * np.log(1 - p) + x * np.log(p) - (n - x) * np.log(1 - x / n) - x * np.log(x / n))
+
+
+def test_kupiec_and_christoffersen():
+    hits = [False] * 100
+    for i in (10, 11, 40, 70, 71, 72):
+        hits[i] = True
+    stats = VarBacktest.statistics(results('alice', hits), 0.95).iloc[0]
+    assert (stats['observations'], stats['exceptions'], stats['expected']) == (100, 6, pytest.approx(5.0))
+    assert stats['pof_lr'] == pytest.approx(kupiec(100, 6, 0.05))
+    assert stats['pof_pvalue'] == pytest.approx(chi2.sf(kupiec(100, 6, 0.05), 1))
+
+    # transitions over the 99 consecutive pairs, hits at 10-11, 40 and 70-72
+    n00, n01, n10, n11 = 90, 3, 3, 3
+    pi0, pi1, pi = n01 / (n00 + n01), n11 / (n10 + n11), (n01 + n11) / 99
+    lr_ind = -2 * (
+        (n00 + n10) * np.log(1 - pi) + (n01 + n11) * np.log(pi)
+        - n00 * np.log(1 - pi0) - n01 * np.log(pi0) - n10 * np.log(1 - pi1) - n11 * np.log(pi1)
+    )
+    assert stats['ind_lr'] == pytest.approx(lr_ind)
+    assert stats['cc_lr'] == pytest.approx(stats['pof_lr'] + lr_ind)
+    assert stats['cc_pvalue'] == pytest.approx(chi2.sf(stats['pof_lr'] + lr_ind, 2))
+
+
+def test_no_exceptions_and_trader_order():
+    df = pd.concat([results('bob', [False] * 50), results('alice', [True] + [False] * 9)])
+    stats = VarBacktest.statistics(df.sample(frac=1, random_state=0), 0.99)
+    assert stats['trader'].tolist() == ['alice', 'bob']
+    bob = stats.iloc[1]
+    assert bob['exceptions'] == 0
+    assert bob['pof_lr'] == pytest.approx(-2 * 50 * np.log(0.99))
+    assert bob['ind_lr'] == pytest.approx(0.0)
+    # hits are read in valuation_date order whatever the row order
+    assert stats.iloc[0]['ind_lr'] == pytest.approx(VarBacktest.statistics(results('alice', [True] + [False] * 9), 0.99).iloc[0]['ind_lr'])
+
+
+def test_run_drops_rows_without_var_or_realized_pnl(prices):
+    dates = pd.bdate_range('2025-01-01', periods=10)
+    pnl = pd.DataFrame({
+        'tradername': np.repeat(['alice', 'bob'], 10),
+        'valuation_date': np.tile(dates, 2),
+        'dtd_pl': np.arange(20.0) - 10,
+    })
+    pnl.loc[14, 'dtd_pl'] = np.nan # bob's realized pnl of dates[3]
+    positions = pd.DataFrame({
+        'trader': ['alice', 'bob'],
+        'px_location': ['AAA', 'BBB'],
+        'forward_month': [1, 2],
+        'contract_month': pd.to_datetime(['2025-02-01', '2025-03-01']),
+        'deltaposition': [2.0, -1.0],
+    })
+    db = SimpleNamespace(
+        traders=SimpleNamespace(
+            list_traders=lambda: ['alice', 'bob'],
+            get_pnl=lambda traders, start_date: pnl[pnl['tradername'].isin(traders)],
+            get_positions_batch=lambda traders, date: positions[positions['trader'].isin(traders)],
+        ),
+        prices=SimpleNamespace(get_range=lambda px_locations, start, end: prices[prices['px_location'].isin(px_locations)].copy()),
+        commodities=SimpleNamespace(get_seasonal_index=lambda: frozenset()),
+    )
+    progress = []
+    df = VarBacktest.run(None, '2025-01-01', '2025-01-14', tail=5, confidence_level=0.9, max_workers=0, db_factory=lambda: db, progress=progress.append)
+
+    # dates[0] has no price moves behind it, dates[-1] no next pnl date
+    assert df.groupby('trader')['valuation_date'].apply(list).to_dict() == {
+        'alice': list(dates[1:9]),
+        'bob': [date for date in dates[1:9] if date != dates[3]],
+    }
+    assert df[['var', 'realized_pnl']].notna().all().all()
+    returns = PortfolioAnalysis.calculate_returns(prices.copy()).set_index('px_date')
+    for row in df.itertuples():
+        held = positions[positions['trader'] == row.trader].iloc[0]
+        series = returns[(returns['px_location'] == held['px_location']) & (returns['forward_month'] == held['forward_month'])]
+        history = held['deltaposition'] * series.loc[:row.valuation_date, 'price_delta']
+        assert row.var == pytest.approx(PortfolioAnalysis.var(history, 5, 0.9))
+        assert row.pnl_date == dates[dates.get_loc(row.valuation_date) + 1]
+        assert row.exception == (row.realized_pnl < row.var)
+    assert progress[-1] == 1.0
@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from app.minrei_lib import Core
+
+
+def test_batch_matches_per_trader_vectors(prices):
+    positions = pd.DataFrame({
+        'trader': ['alice', 'alice', 'bob'],
+        'px_location': ['AAA', 'BBB', 'AAA'],
+        'forward_month': [1, 2, 1],
+        'contract_month': pd.to_datetime(['2025-02-01', '2025-03-01', '2025-02-01']),
+        'deltaposition': [2.0, -1.0, 0.5],
+    })
+    calls = []
+    def get_historical(px_locations, lookback_days):
+        calls.append(sorted(px_locations))
+        return prices[prices['px_location'].isin(px_locations)].copy()
+    db = SimpleNamespace(
+        traders=SimpleNamespace(
+            get_positions_latest=lambda trader: positions[positions['trader'] == trader].drop(columns='trader'),
+            get_positions_latest_batch=lambda traders: positions[positions['trader'].isin(traders)],
+        ),
+        prices=SimpleNamespace(get_historical=get_historical),
+        commodities=SimpleNamespace(get_seasonal_index=lambda: frozenset()),
+    )
+
+    batch = Core.generate_pnl_vectors_batch(['alice', 'bob'], db=db)
+    assert calls == [['AAA', 'BBB']] # one price load for the union of px_locations
+    assert batch['trader'].tolist() == ['alice', 'alice', 'bob']
+    for trader in ('alice', 'bob'):
+        single = Core.generate_pnl_vectors(trader, db=db)
+        np.testing.assert_allclose(np.vstack(batch.loc[batch['trader'] == trader, 'pnl_vector']), np.vstack(single['pnl_vector']))
+        assert batch.loc[batch['trader'] == trader, 'idx'].tolist() == single['idx'].tolist()
+    # bob's vector only draws on AAA's forward month 1 moves
+    aaa = prices[(prices['px_location'] == 'AAA') & (prices['forward_month'] == 1)]['price'].diff().dropna()
+    np.testing.assert_allclose(batch.loc[2, 'pnl_vector'], 0.5 * aaa.to_numpy())
@@ -0,0 +1,53 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+
+from app.minrei_lib.database import SQL_TEMPLATES, Database
+
+
+@pytest.fixture
+def template(monkeypatch):
+    """A SQLite-compatible template registered like the .sql files."""
+    statement = sa.text("select :name as name, :value as value, :locations as locations")
+    monkeypatch.setitem(SQL_TEMPLATES, 'test-binds.sql', (statement, tuple(statement.compile().params)))
+    return 'test-binds.sql'
+
+
+def test_templates_compiled_with_bind_names():
+    statement, names = SQL_TEMPLATES['get-prices-range.sql']
+    assert isinstance(statement, sa.TextClause)
+    assert set(names) == {'px_locations', 'start_date', 'end_date'}
+
+
+def test_values_are_bound_not_interpolated(db, template):
+    df = db._inject_and_execute_sql(template, {'name': "o'brien; drop table price --", 'value': np.int64(3), 'locations': ['AAA', 'B"B']})
+    assert df.to_dict('records') == [{'name': "o'brien; drop table price --", 'value': 3, 'locations': '["AAA", "B\\"B"]'}]
+
+
+def test_chunked_execution(db, template):
+    chunks = db._inject_and_execute_sql(template, {'name': 'x', 'value': 1, 'locations': []}, chunksize=10)
+    assert [chunk['name'].tolist() for chunk in chunks] == [['x']]
+
+
+def test_missing_parameter_and_unknown_file(db, template):
+    with pytest.raises(ValueError, match='value'):
+        db._inject_and_execute_sql(template, {'name': 'x', 'locations': []})
+    with pytest.raises(FileNotFoundError):
+        db._inject_and_execute_sql('no-such-query.sql', {})
+
+
+@pytest.mark.parametrize('value, expected', [
+    (pd.Index(['AAA', 'BBB']), '["AAA", "BBB"]'),
+    ((1, 2), '["1", "2"]'),
+    (pd.Timestamp('2025-01-02'), '2025-01-02 00:00:00'),
+    (datetime.date(2025, 1, 2), '2025-01-02'),
+    (np.float64(1.5), 1.5),
+    ('-1', '-1'),
+])
+def test_bind_value(value, expected):
+    bound = Database._bind_value(value)
+    assert bound == expected
+    assert type(bound) is type(expected)
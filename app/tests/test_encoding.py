@@ -0,0 +1,66 @@
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+import pytest
+from starlette.requests import Request
+
+from app.encoding import PNL_VECTORS_MEDIA_TYPE, encode_pnl_vectors, wants_binary
+
+
+def decode(payload: bytes) -> tuple[dict, np.ndarray]:
+    (length,) = struct.unpack_from('<I', payload)
+    header = json.loads(payload[4:4 + length])
+    offset = 4 + length + (-(4 + length) % 8)
+    assert offset % 8 == 0
+    dtype = {'float64': '<f8', 'float32': '<f4'}[header['dtype']]
+    matrix = np.frombuffer(payload, dtype=dtype, offset=offset).reshape(header['rows'], header['cols'])
+    return header, matrix
+
+
+@pytest.fixture
+def pnl_vectors():
+    return pd.DataFrame({
+        'px_location': ['AAA', 'BBB', None],
+        'contract_month': pd.to_datetime(['2025-01-01', '2025-02-01', None]),
+        'deltaposition': [1.5, np.nan, -2.0],
+        'pnl_vector': [[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]],
+    })
+
+
+@pytest.mark.parametrize('dtype', ['float64', 'float32'])
+def test_roundtrip(pnl_vectors, dtype):
+    header, matrix = decode(encode_pnl_vectors(pnl_vectors, dtype))
+    assert (header['rows'], header['cols'], header['vector_field']) == (3, 2, 'pnl_vector')
+    np.testing.assert_array_equal(matrix, np.array(pnl_vectors['pnl_vector'].tolist(), dtype=matrix.dtype))
+    assert header['columns'] == {
+        'px_location': ['AAA', 'BBB', None],
+        'contract_month': ['2025-01-01T00:00:00', '2025-02-01T00:00:00', None],
+        'deltaposition': [1.5, None, -2.0],
+    }
+
+
+def test_separate_vectors_and_empty(pnl_vectors):
+    rows = pnl_vectors.drop(columns='pnl_vector')
+    vectors = np.arange(6, dtype=np.float32).reshape(3, 2)
+    header, matrix = decode(encode_pnl_vectors(rows, 'float64', vectors=vectors))
+    np.testing.assert_array_equal(matrix, vectors)
+    assert list(header['columns']) == list(rows.columns)
+
+    header, matrix = decode(encode_pnl_vectors(pnl_vectors.iloc[:0]))
+    assert matrix.shape == (0, 0)
+
+    with pytest.raises(ValueError):
+        encode_pnl_vectors(pnl_vectors, 'float16')
+
+
+@pytest.mark.parametrize('format, accept, expected', [
+    (None, PNL_VECTORS_MEDIA_TYPE, True),
+    (None, 'application/json', False),
+    ('binary', 'application/json', True),
+    ('json', PNL_VECTORS_MEDIA_TYPE, False),
+])
+def test_wants_binary(format, accept, expected):
+    request = Request({'type': 'http', 'headers': [(b'accept', accept.encode())]})
+    assert wants_binary(request, format) is expected
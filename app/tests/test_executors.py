@@ -0,0 +1,56 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.executors import BoundedExecutor
+from app.minrei_lib.profiling import request_spans, span
+
+
+@pytest.fixture
+def executor():
+    executor = BoundedExecutor('test', max_workers=1, timeout=1.0)
+    yield executor
+    executor.shutdown()
+
+
+def test_runs_off_the_event_loop_in_the_callers_context(executor):
+    def work(x, y=0):
+        with span('test.work'):
+            return x + y, threading.current_thread().name
+
+    async def main():
+        with request_spans() as (spans, _):
+            result = await executor.run(work, 1, y=2)
+        return result, [name for name, _ in spans]
+
+    (value, thread), names = asyncio.run(main())
+    assert value == 3 and thread.startswith('minrei-test')
+    assert names == ['queue.test', 'test.work', 'run.test']
+
+
+def test_queued_work_does_not_block_the_loop(executor):
+    release = threading.Event()
+
+    async def main():
+        blocked = asyncio.ensure_future(executor.run(release.wait, 5))
+        ticks = 0
+        while ticks < 3: # the loop keeps serving while the only worker is busy
+            await asyncio.sleep(0.01)
+            ticks += 1
+        release.set()
+        return await blocked, ticks
+
+    assert asyncio.run(main()) == (True, 3)
+
+
+def test_timeout_is_504():
+    executor = BoundedExecutor('slow', max_workers=1, timeout=0.05)
+    try:
+        with pytest.raises(HTTPException) as raised:
+            asyncio.run(executor.run(time.sleep, 0.5))
+        assert raised.value.status_code == 504
+    finally:
+        executor.shutdown()
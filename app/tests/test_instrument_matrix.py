@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.minrei_lib.instrument_matrix import InstrumentMatrix
+from app.minrei_lib.portfolio_analysis import PortfolioAnalysis
+
+
+def series_key(df: pd.DataFrame, seasonal: bool) -> pd.MultiIndex:
+    months = InstrumentMatrix.month_ns(df['contract_month']) if seasonal else df['forward_month'].to_numpy(dtype=np.int64)
+    return pd.MultiIndex.from_arrays([df['px_location'].to_numpy(), months, np.full(len(df), seasonal)])
+
+
+def pivot(df: pd.DataFrame, seasonal: bool, dates: pd.DatetimeIndex, value: str = 'price_delta') -> pd.DataFrame:
+    """The string-keyed pivot the matrix replaces: one row per series, missing moves 0."""
+    key = series_key(df, seasonal)
+    index = pd.MultiIndex.from_arrays([key.get_level_values(i) for i in range(key.nlevels)] + [df['px_date']])
+    table = pd.Series(df[value].to_numpy(), index=index)
+    return table.unstack().reindex(columns=dates).fillna(0.0)
+
+
+@pytest.fixture
+def rolling(prices):
+    """prices where forward_month 1 rolls from the February to the March contract half way through."""
+    dates = np.sort(prices['px_date'].unique())
+    rolled = prices['px_date'] >= dates[5]
+    prices = prices.copy()
+    prices.loc[rolled, 'contract_month'] += pd.DateOffset(months=1)
+    prices.loc[rolled & (prices['forward_month'] == 1), 'contract_month'] = pd.Timestamp('2025-03-01')
+    return prices.drop(index=[3, 22]).reset_index(drop=True) # a missing price in each of two series
+
+
+@pytest.mark.parametrize('seasonal', [False, True])
+def test_from_prices_matches_pivot(rolling, seasonal):
+    returns = PortfolioAnalysis.calculate_returns(rolling.copy())
+    matrix = InstrumentMatrix.from_prices(returns)
+    expected = pivot(returns, seasonal, matrix.dates)
+    np.testing.assert_array_equal(matrix.rows(matrix.lookup(expected.index)), expected.to_numpy())
+
+
+def test_forward_series_follow_the_roll(rolling):
+    returns = PortfolioAnalysis.calculate_returns(rolling.copy())
+    matrix = InstrumentMatrix.from_prices(returns)
+    front = returns[(returns['px_location'] == 'AAA') & (returns['forward_month'] == 1)]
+    row = matrix.rows(matrix.lookup(pd.MultiIndex.from_tuples([('AAA', 1, False)])))[0]
+    np.testing.assert_array_equal(row[matrix.dates.get_indexer(front['px_date'])], front['price_delta'].to_numpy())
+
+
+def test_from_levels_matches_price_delta(rolling):
+    deltas = PortfolioAnalysis._calculate_price_delta(rolling.copy()).dropna(subset=['price_delta'])
+    expected = InstrumentMatrix.from_prices(deltas)
+    matrix = InstrumentMatrix.from_levels(rolling)
+    pd.testing.assert_index_equal(matrix.dates, expected.dates)
+    np.testing.assert_array_equal(matrix.rows(matrix.lookup(expected.keys)), expected.values)
+    assert matrix.values.flags.c_contiguous
+
+
+def test_price_values_are_filled(prices):
+    prices = prices.drop(index=[0, 4 * 9 + 1]) # AAA 1 on the first date, AAA 2 on the last
+    matrix = InstrumentMatrix.from_prices(prices, value='price')
+    assert not np.isnan(matrix.values).any()
+    aaa = matrix.rows(matrix.lookup(pd.MultiIndex.from_tuples([('AAA', 1, False), ('AAA', 2, False)])))
+    assert aaa[0, 0] == aaa[0, 1]
+    assert aaa[1, -1] == aaa[1, -2]
+
+
+def test_lookup_rows_and_scale(prices):
+    matrix = InstrumentMatrix.from_prices(PortfolioAnalysis.calculate_returns(prices))
+    positions = pd.DataFrame({
+        'px_location': ['AAA', 'BBB', 'ZZZ'],
+        'forward_month': [2, 1, 1],
+        'contract_month': pd.to_datetime(['2025-03-01', '2025-02-01', '2025-02-01']),
+    })
+    instruments = InstrumentMatrix.instrument_keys(positions, ['BBB'])
+    assert instruments['is_seasonal'].tolist() == [False, True, False]
+    ids = matrix.lookup(instruments)
+    assert ids[2] == -1
+    assert (matrix.lookup(InstrumentMatrix.key_index(instruments)) == ids).all()
+
+    dates = matrix.dates[[1, 3]].append(pd.DatetimeIndex(['2030-01-01']))
+    rows = matrix.rows(ids, dates)
+    np.testing.assert_array_equal(rows[:2, :2], matrix.values[ids[:2]][:, [1, 3]])
+    assert (rows[:2, 2] == 0).all() # no move outside the matrix
+    assert np.isnan(rows[2]).all() # no prices
+    assert (matrix.rows(ids, missing=0.0)[2] == 0).all()
+
+    scaled = matrix.scale(instruments, np.array([2.0, -1.0, 1.0]))
+    np.testing.assert_array_equal(scaled[:2], matrix.values[ids[:2]] * [[2.0], [-1.0]])
+
+
+def test_empty_matrix():
+    empty = pd.DataFrame({
+        'px_date': pd.DatetimeIndex([]), 'px_location': pd.Series([], dtype=object),
+        'forward_month': pd.Series([], dtype=np.int64), 'contract_month': pd.DatetimeIndex([]),
+        'price_delta': pd.Series([], dtype=np.float64),
+    })
+    matrix = InstrumentMatrix.from_prices(empty)
+    assert matrix.rows(np.array([-1, -1])).shape == (2, 0)
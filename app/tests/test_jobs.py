@@ -0,0 +1,102 @@
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.jobs import CANCELLED, DONE, FAILED, JobQueue
+from app.minrei_lib import VarBacktest
+from app.routers.jobs import BacktestJob, _computation
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(max_workers=1)
+    yield queue
+    queue.shutdown()
+
+
+def wait(job):
+    job.future.result(timeout=5)
+    return job
+
+
+def test_identical_submissions_share_a_job(queue):
+    release = threading.Event()
+    calls = []
+
+    def run(report):
+        calls.append(1)
+        release.wait(5)
+        report(0.5)
+        return 'result'
+
+    first = queue.submit('stress', {'trader': 'a', 'lookback_days': 400}, run, version='2025-01-15')
+    second = queue.submit('stress', {'lookback_days': 400, 'trader': 'a'}, run, version='2025-01-15')
+    release.set()
+    assert second is first and first.submissions == 2
+    assert wait(first).status == DONE and first.result == 'result' and first.progress == 1.0
+    # a finished job is still served
+    assert queue.submit('stress', {'trader': 'a', 'lookback_days': 400}, run, version='2025-01-15') is first
+    assert len(calls) == 1
+
+
+def test_new_data_version_starts_a_new_job(queue):
+    first = wait(queue.submit('stress', {'trader': 'a'}, lambda report: 1, version='2025-01-15'))
+    second = wait(queue.submit('stress', {'trader': 'a'}, lambda report: 2, version='2025-01-16'))
+    assert second is not first and second.result == 2
+    assert second.state()['data_version'] == '2025-01-16'
+    assert queue.submit('stress', {'trader': 'b'}, lambda report: 3, version='2025-01-16') is not second
+
+
+def test_failed_jobs_are_not_reused(queue):
+    def fail(report):
+        raise RuntimeError('boom')
+
+    failed = wait(queue.submit('backtest', {}, fail))
+    assert failed.status == FAILED and failed.error == 'RuntimeError: boom'
+    retried = wait(queue.submit('backtest', {}, lambda report: 'ok'))
+    assert retried is not failed and retried.result == 'ok'
+
+
+def test_cancel_queued_job(queue):
+    release = threading.Event()
+    running = queue.submit('stress', {'n': 1}, lambda report: release.wait(5))
+    queued = queue.submit('stress', {'n': 2}, lambda report: 'never')
+    assert queue.cancel(queued.id).status == CANCELLED
+    release.set()
+    wait(running)
+    assert queue.submit('stress', {'n': 2}, lambda report: 'rerun') is not queued
+    assert queue.cancel('unknown') is None
+
+
+def test_expired_results_are_dropped():
+    queue = JobQueue(max_workers=1, result_ttl=0)
+    job = wait(queue.submit('stress', {}, lambda report: 1))
+    assert queue.get(job.id) is None
+    assert queue.submit('stress', {}, lambda report: 2) is not job
+    queue.shutdown()
+
+
+def test_backtest_result_is_json_safe(monkeypatch):
+    def run(*args, **kwargs):
+        return pd.DataFrame({
+            'trader': ['alice', 'alice'],
+            'valuation_date': pd.to_datetime(['2025-01-02', '2025-01-03']),
+            'var': [-1.0, np.nan],
+            'pnl_date': pd.to_datetime(['2025-01-03', None]),
+            'realized_pnl': [-2.0, 0.5],
+            'exception': [True, False],
+        })
+    monkeypatch.setattr(VarBacktest, 'run', staticmethod(run))
+    spec = BacktestJob(kind='backtest', start_date='2025-01-01', end_date='2025-01-31')
+    result = _computation(spec, db=None)(lambda fraction: None)
+    assert (result['results'][1]['var'], result['results'][1]['pnl_date']) == (None, None)
+    json.dumps(result, default=str, allow_nan=False)
+
+
+@pytest.mark.parametrize('params', [{'tail': 0}, {'lookback_days': 0}, {'confidence_level': 1.0}, {'confidence_level': 0}])
+def test_backtest_job_validation(client, params):
+    spec = {'kind': 'backtest', 'start_date': '2025-01-01', 'end_date': '2025-01-31', **params}
+    assert client.post('/jobs', json=spec).status_code == 422
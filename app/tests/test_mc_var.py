@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import norm
+
+from app.minrei_lib.instrument_matrix import InstrumentMatrix
+from app.minrei_lib.portfolio_analysis import PortfolioAnalysis
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    common = rng.normal(size=(1, 60))
+    return 0.5 * rng.normal(size=(8, 60)) + common * rng.uniform(0.5, 2, size=(8, 1))
+
+
+def reconstruct(loadings, specific_var):
+    return loadings @ loadings.T + np.diag(specific_var)
+
+
+def test_full_rank_factors_reproduce_covariance(returns):
+    loadings, specific_var, shrinkage = PortfolioAnalysis.covariance_factors(returns, shrinkage=0.0)
+    assert shrinkage == 0.0
+    np.testing.assert_allclose(reconstruct(loadings, specific_var), np.cov(returns, bias=True), atol=1e-12)
+
+
+def test_shrinkage_towards_diagonal(returns):
+    sample = np.cov(returns, bias=True)
+    loadings, specific_var, _ = PortfolioAnalysis.covariance_factors(returns, shrinkage=0.3)
+    np.testing.assert_allclose(reconstruct(loadings, specific_var), 0.7 * sample + 0.3 * np.diag(np.diag(sample)), atol=1e-12)
+
+    _, _, estimated = PortfolioAnalysis.covariance_factors(returns)
+    assert 0 < estimated < 1
+
+
+def test_ewma_and_truncation_keep_variances(returns):
+    weights = 0.94 ** np.arange(returns.shape[1] - 1, -1, -1)
+    weights /= weights.sum()
+    ewma = (returns * weights) @ returns.T
+    loadings, specific_var, _ = PortfolioAnalysis.covariance_factors(returns, ewma_lambda=0.94, shrinkage=0.0)
+    np.testing.assert_allclose(reconstruct(loadings, specific_var), ewma, atol=1e-12)
+
+    loadings, specific_var, _ = PortfolioAnalysis.covariance_factors(returns, shrinkage=0.0, n_factors=2)
+    assert loadings.shape == (8, 2)
+    np.testing.assert_allclose(np.diag(reconstruct(loadings, specific_var)), np.diag(np.cov(returns, bias=True)))
+
+
+def test_degenerate_inputs():
+    loadings, specific_var, _ = PortfolioAnalysis.covariance_factors(np.zeros((3, 1)))
+    assert loadings.shape == (3, 0) and (specific_var == 0).all()
+
+
+@pytest.fixture
+def book(returns):
+    """Positions on returns' eight forward-month series, with the instrument matrix of those moves."""
+    dates = pd.bdate_range('2025-01-01', periods=returns.shape[1])
+    keys = pd.MultiIndex.from_arrays([np.repeat(['AAA', 'BBB'], 4), np.tile(np.arange(1, 5), 2), np.zeros(8, dtype=bool)])
+    matrix = InstrumentMatrix(dates, keys, returns)
+    positions = pd.DataFrame({
+        'px_location': keys.get_level_values(0),
+        'forward_month': keys.get_level_values(1),
+        'contract_month': pd.Timestamp('2025-02-01'),
+        'deltaposition': np.linspace(-2, 3, 8),
+    })
+    return positions, matrix
+
+
+def test_delta_var_matches_normal_quantile(book, returns):
+    positions, matrix = book
+    delta = positions['deltaposition'].to_numpy()
+    sd = np.sqrt(delta @ np.cov(returns, bias=True) @ delta)
+    df = PortfolioAnalysis.mc_var(positions, matrix, [], n_scenarios=200_000, confidence_levels=(0.95, 0.99), shrinkage=0.0, seed=1, block_bytes=1024 ** 2)
+    np.testing.assert_allclose(df['var'], norm.ppf([0.05, 0.01]) * sd, rtol=0.02)
+    assert (df['es'] < df['var']).all()
+
+
+def test_taylor_without_gamma_matches_delta_in_distribution(book):
+    positions, matrix = book
+    kwargs = dict(n_scenarios=100_000, shrinkage=0.0, seed=2)
+    delta = PortfolioAnalysis.mc_var(positions, matrix, [], **kwargs)
+    taylor = PortfolioAnalysis.mc_var(positions.assign(thetaposition=1.0), matrix, [], 'taylor', **kwargs)
+    # theta shifts every scenario by the book's theta
+    np.testing.assert_allclose(taylor['var'] - len(positions), delta['var'], rtol=0.03)
+    pd.testing.assert_frame_equal(PortfolioAnalysis.mc_var(positions, matrix, [], **kwargs), delta)
+    with pytest.raises(ValueError):
+        PortfolioAnalysis.mc_var(positions, matrix, [], 'full')
+
+
+def test_mc_var_validation(client):
+    assert client.get('/var/mc', params={'trader': 'alice', 'confidence_levels': [0.95, 1.5]}).status_code == 422
+    assert client.get('/var/mc', params={'trader': 'alice', 'n_scenarios': 10}).status_code == 422
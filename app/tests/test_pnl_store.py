@@ -0,0 +1,100 @@
+import os
+
+import pandas as pd
+import pytest
+
+from app.minrei_lib import RealizedPnlStore
+
+SCHEMA = {'valuation_date': 'datetime64[ns]', 'level_name': 'object', 'pl': 'float64'}
+
+
+class Source:
+    """In-memory stand-in for a realized pnl table, recording the start dates it was queried from."""
+
+    def __init__(self, dates: pd.DatetimeIndex):
+        self.df = pd.DataFrame({
+            'valuation_date': dates.repeat(2),
+            'level_name': ['L1', 'L2'] * len(dates),
+            'pl': range(2 * len(dates)),
+        }).astype({'pl': float})
+        self.starts = []
+
+    def load(self, start_date: str):
+        self.starts.append(start_date)
+        df = self.df if start_date == '-1' else self.df[self.df['valuation_date'] >= pd.Timestamp(start_date)]
+        yield from (df.iloc[i:i + 5] for i in range(0, len(df), 5))
+
+
+@pytest.fixture
+def source():
+    return Source(pd.bdate_range('2025-01-01', '2025-03-14'))
+
+
+@pytest.fixture
+def store(tmp_path, source):
+    store = RealizedPnlStore(str(tmp_path), refresh_interval=1e9, revision_days=7)
+    store.register('historical_pl', source.load, SCHEMA)
+    return store
+
+
+def files(store):
+    return sorted(os.listdir(os.path.join(store.directory, 'historical_pl')))
+
+
+def test_sync_and_read(store, source):
+    assert store.sync('historical_pl') == len(source.df)
+    assert source.starts == ['-1']
+    df = store.read('historical_pl')
+    pd.testing.assert_frame_equal(df, source.df, check_dtype=False)
+    window = store.read('historical_pl', '2025-02-03', '2025-02-07', filters={'level_name': ['L2']}, columns=['valuation_date', 'pl'])
+    expected = source.df[source.df['valuation_date'].between('2025-02-03', '2025-02-07') & (source.df['level_name'] == 'L2')]
+    assert list(window['pl']) == list(expected['pl'])
+    latest = store.read('historical_pl', end_date='2025-03-01', latest=True)
+    assert (latest['valuation_date'] == pd.Timestamp('2025-02-28')).all() and len(latest) == 2
+
+
+def test_compaction(store):
+    store.sync('historical_pl')
+    names = [f for f in files(store) if f.endswith('.parquet')]
+    # January and February are merged, March is in the revision window's month and stays daily
+    assert '2025-01-01_2025-01-31.parquet' in names
+    assert '2025-02-03_2025-02-28.parquet' in names
+    assert not any(name.startswith(('2025-01-', '2025-02-')) and '_' not in name for name in names)
+    assert '2025-03-14.parquet' in names
+
+
+def test_sync_repulls_revision_window(store, source):
+    store.sync('historical_pl')
+    # a revision inside the window, one outside it, a new date and a date the source dropped
+    source.df.loc[source.df['valuation_date'] == '2025-03-10', 'pl'] = -1.0
+    source.df.loc[source.df['valuation_date'] == '2025-02-03', 'pl'] = -2.0
+    source.df = source.df[source.df['valuation_date'] != '2025-03-12']
+    source.df = pd.concat([source.df, pd.DataFrame({'valuation_date': [pd.Timestamp('2025-03-17')], 'level_name': ['L1'], 'pl': [9.0]})])
+    store.sync('historical_pl')
+    assert source.starts[-1] == '2025-03-07'
+    df = store.read('historical_pl')
+    assert (df.loc[df['valuation_date'] == '2025-03-10', 'pl'] == -1.0).all()
+    assert (df.loc[df['valuation_date'] == '2025-02-03', 'pl'] != -2.0).all() # immutable outside the window
+    assert not (df['valuation_date'] == '2025-03-12').any()
+    assert df['valuation_date'].iloc[-1] == pd.Timestamp('2025-03-17')
+
+
+def test_empty_store_reads_schema(tmp_path):
+    store = RealizedPnlStore(str(tmp_path))
+    store.register('historical_pl', lambda start_date: iter(()), SCHEMA)
+    df = store.read('historical_pl')
+    assert df.empty and list(df.columns) == list(SCHEMA)
+    assert list(store.read('historical_pl', columns=['pl']).columns) == ['pl']
+
+
+def test_failed_sync_serves_disk(store, source):
+    store.sync('historical_pl')
+    store.refresh_interval = 0
+
+    def failing(start_date):
+        raise ConnectionError('server down')
+        yield
+
+    store.register('historical_pl', failing, SCHEMA)
+    assert len(store.read('historical_pl')) == len(source.df)
+    assert store.stats()['historical_pl']['error'] == 'ConnectionError: server down'
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.minrei_lib.portfolio_analysis import PortfolioAnalysis
+
+
+def reference_returns(df: pd.DataFrame) -> pd.DataFrame:
+    """calculate_returns written as per-series groupby ops, rows in px_date order."""
+    series = df.groupby(['px_location', 'contract_month'])
+    df['price_delta'] = series['price'].diff()
+    df['simple_return'] = df['price'].abs().groupby([df['px_location'], df['contract_month']]).pct_change()
+    invalid = (df['simple_return'] <= -1) | df['simple_return'].isna()
+    df['log_return'] = np.where(invalid, np.nan, np.log1p(1e-9 + df['simple_return']))
+    return df.dropna(subset=['simple_return', 'log_return'])
+
+
+def test_calculate_returns_matches_groupby(prices):
+    prices.loc[[5, 17], 'price'] = 0.0
+    prices.loc[9, 'price'] = np.nan
+    prices.loc[12, 'price'] *= -1
+    expected = reference_returns(prices.copy())
+    result = PortfolioAnalysis.calculate_returns(prices.copy())
+    cols = ['price_delta', 'simple_return', 'log_return']
+    pd.testing.assert_frame_equal(result[cols], expected[cols])
+
+
+def test_calculate_returns_unsorted_dates(prices):
+    expected = PortfolioAnalysis.calculate_returns(prices.copy())
+    shuffled = prices.sample(frac=1, random_state=0)
+    result = PortfolioAnalysis.calculate_returns(shuffled).sort_index()
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_calculate_returns_empty(prices):
+    assert PortfolioAnalysis.calculate_returns(prices.iloc[:0].copy()).empty
+
+
+def test_group_pnl():
+    pnl = np.arange(12, dtype=float).reshape(4, 3)
+    pnl[3, 1] = np.nan
+    groups = pd.DataFrame({'trader': ['b', 'a', 'b', None], 'px_location': ['X', 'X', 'X', 'Y']})
+    keys, summed = PortfolioAnalysis.group_pnl(pnl, groups)
+    assert keys.to_dict('list') == {'trader': ['a', 'b', np.nan], 'px_location': ['X', 'X', 'Y']}
+    np.testing.assert_allclose(summed, [[3, 4, 5], [6, 8, 10], [9, 0, 11]])
+
+
+@pytest.mark.parametrize('window', [20, 100, 251])
+@pytest.mark.parametrize('confidence_level', [0.9, 0.99])
+def test_risk_ladder_matches_percentile(window, confidence_level):
+    pnl = np.random.default_rng(1).normal(size=(5, 300))
+    var, es = PortfolioAnalysis.risk_ladder(pnl, (window,), (confidence_level,))
+    tail = pnl[:, -window:]
+    np.testing.assert_allclose(var[:, 0, 0], np.percentile(tail, (1 - confidence_level) * 100, axis=1))
+    lower = int(np.floor((1 - confidence_level) * (window - 1)))
+    np.testing.assert_allclose(es[:, 0, 0], np.sort(tail, axis=1)[:, :lower + 1].mean(axis=1))
+
+
+def test_risk_ladder_251_days_at_95():
+    pnl = np.random.default_rng(2).normal(size=(3, 251))
+    var, _ = PortfolioAnalysis.risk_ladder(pnl)
+    ordered = np.sort(pnl, axis=1)
+    np.testing.assert_allclose(var[:, 0, 0], 0.9 * ordered[:, 12] + 0.1 * ordered[:, 13])
+    assert PortfolioAnalysis.var(pnl[0]) == pytest.approx(var[0, 0, 0])
+
+
+def test_risk_ladder_shapes():
+    var, es = PortfolioAnalysis.risk_ladder(np.zeros((4, 30)), (10, 20, 30), (0.95, 0.99))
+    assert var.shape == es.shape == (4, 3, 2)
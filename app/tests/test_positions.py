@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from app.benchmarks.positions import legacy_normalize_positions, synthetic_positions
+from app.minrei_lib.positions import normalize_positions
+
+
+def test_matches_row_wise_normalization():
+    df = synthetic_positions(2_000)
+    expected = legacy_normalize_positions(df.copy())
+    result = normalize_positions(df.copy())
+    pd.testing.assert_frame_equal(expected[result.columns], result, check_dtype=False)
+
+
+def test_imputes_contract_month_and_nets_per_trader():
+    df = pd.DataFrame({
+        'trader': ['bob', 'alice', 'alice', 'alice'],
+        'valuation_date': ['2025-01-15'] * 4,
+        'px_location': [' aaa', 'AAA ', 'aaa', 'BBB'],
+        'forward_month': [1, 1, 1, 14],
+        'contract_month': [None, '2025-01-01', None, None],
+        'deltaposition': [1.0, 2.0, 3.0, 4.0],
+        'gammaposition': [1.0, np.nan, 1.0, 1.0],
+        'thetaposition': 0.0,
+        'vegaposition': 0.0,
+        'weight': [100.0, 50.0, 50.0, 100.0],
+    })
+    result = normalize_positions(df.copy())
+    assert result[['trader', 'px_location', 'forward_month']].values.tolist() == [['alice', 'AAA', 1], ['alice', 'BBB', 14], ['bob', 'AAA', 1]]
+    assert result['contract_month'].tolist() == [pd.Timestamp('2025-01-01'), pd.Timestamp('2026-02-01'), pd.Timestamp('2025-01-01')]
+    assert result['deltaposition'].tolist() == [2.5, 4.0, 1.0]
+    assert result['gammaposition'].tolist() == [0.5, 1.0, 1.0]
+
+    unweighted = normalize_positions(df.assign(px_location='AAA', trader='alice'), apply_weight=False)
+    assert unweighted['deltaposition'].tolist() == [6.0, 4.0]
@@ -0,0 +1,128 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.minrei_lib import PriceCache
+from app.minrei_lib.prices import MAX_PX_DATE, PriceQueries
+
+
+@pytest.fixture
+def history():
+    """Processed prices for AAA and BBB, two contracts each, on every business day of 2025 Q1."""
+    rows = [
+        (date, location, float(i), forward_month, pd.Timestamp('2025-04-01') + pd.DateOffset(months=forward_month - 1))
+        for i, date in enumerate(pd.bdate_range('2025-01-01', '2025-03-31'))
+        for location in ('AAA', 'BBB') for forward_month in (1, 2)
+    ]
+    return pd.DataFrame(rows, columns=['px_date', 'px_location', 'price', 'forward_month', 'contract_month'])
+
+
+class RecordingPrices(PriceQueries):
+    """PriceQueries over an in-memory history, recording the queries the cache lets through."""
+
+    def __init__(self, history: pd.DataFrame, cache: PriceCache):
+        super().__init__(None, cache=cache)
+        self.history = history
+        self.calls = []
+
+    def get_range(self, px_locations, start_date, end_date):
+        self.calls.append((sorted(px_locations), start_date, end_date))
+        h = self.history
+        return h[h['px_location'].isin(px_locations) & h['px_date'].between(start_date, end_date)].reset_index(drop=True)
+
+    def get_latest(self, px_locations, lookback_days=-1, start_date='-1'):
+        self.calls.append((sorted(px_locations), 'latest', lookback_days))
+        h = self.history[self.history['px_location'].isin(px_locations)]
+        return h[h['px_date'] >= h['px_date'].max() - pd.Timedelta(days=lookback_days)].reset_index(drop=True)
+
+
+def expected(history, locations, start, end):
+    h = history[history['px_location'].isin(locations) & history['px_date'].between(start, end)]
+    return h.sort_values(['px_date', 'forward_month'], kind='stable').reset_index(drop=True)
+
+
+def test_queries_only_uncovered_dates(history):
+    prices = RecordingPrices(history, PriceCache())
+    end = pd.Timestamp('2025-02-28')
+    result = prices.get_historical(['AAA', 'bbb '], 30, '2025-02-28')
+    assert prices.calls == [(['AAA', 'BBB'], end - pd.Timedelta(days=30), end)]
+    pd.testing.assert_frame_equal(result, expected(history, ['AAA', 'BBB'], end - pd.Timedelta(days=30), end))
+
+    prices.calls.clear()
+    result = prices.get_historical(['AAA'], 10, '2025-02-20')
+    assert prices.calls == []
+    pd.testing.assert_frame_equal(result, expected(history, ['AAA'], pd.Timestamp('2025-02-10'), pd.Timestamp('2025-02-20')))
+
+    # extends coverage from the cached end only
+    end = pd.Timestamp('2025-03-14')
+    result = prices.get_historical(['AAA', 'BBB'], 30, '2025-03-14')
+    assert prices.calls == [(['AAA', 'BBB'], pd.Timestamp('2025-02-28'), end)]
+    pd.testing.assert_frame_equal(result, expected(history, ['AAA', 'BBB'], end - pd.Timedelta(days=30), end))
+
+
+def test_coverage_kept_for_tickers_without_prices(history):
+    prices = RecordingPrices(history, PriceCache())
+    assert prices.get_historical(['CCC'], 30, '2025-02-28').empty
+    prices.calls.clear()
+    assert prices.get_historical(['CCC'], 30, '2025-02-28').empty
+    assert prices.calls == []
+
+
+def test_latest_repulls_from_last_cached_date(history):
+    prices = RecordingPrices(history, PriceCache())
+    first = prices.get_historical(['AAA'], 30)
+    assert prices.calls == [(['AAA'], 'latest', 30)]
+
+    prices.calls.clear()
+    second = prices.get_historical(['AAA'], 30)
+    assert prices.calls == [(['AAA'], pd.Timestamp('2025-03-31'), MAX_PX_DATE)]
+    pd.testing.assert_frame_equal(second, first)
+    pd.testing.assert_frame_equal(second, expected(history, ['AAA'], pd.Timestamp('2025-03-01'), pd.Timestamp('2025-03-31')))
+
+
+def test_unchanged_repull_keeps_entry_and_file(history, tmp_path):
+    cache = PriceCache(cache_dir=str(tmp_path))
+    aaa = history[history['px_location'] == 'AAA']
+    start, end = pd.Timestamp('2025-01-01'), pd.Timestamp('2025-03-31')
+    entry = cache.update('AAA', aaa, start, end)
+    path = tmp_path / 'AAA.parquet'
+    written = os.stat(path).st_ino
+
+    tail = aaa[aaa['px_date'] >= '2025-03-20']
+    assert cache.update('AAA', tail, pd.Timestamp('2025-03-20'), end) is entry
+    assert os.stat(path).st_ino == written
+
+    revised = tail.assign(price=tail['price'] + 1)
+    entry = cache.update('AAA', revised, pd.Timestamp('2025-03-20'), end)
+    assert os.stat(path).st_ino != written
+    assert (entry.prices.loc[entry.prices['px_date'] >= '2025-03-20', 'price'].to_numpy() == revised['price'].to_numpy()).all()
+    assert len(entry.prices) == len(aaa)
+    assert os.listdir(tmp_path) == ['AAA.parquet'] # no temporary files left
+
+
+def test_disk_tier_keeps_coverage(history, tmp_path):
+    bbb = history[(history['px_location'] == 'BBB') & (history['px_date'] <= '2025-01-31')]
+    PriceCache(cache_dir=str(tmp_path)).update('BBB', bbb, pd.Timestamp('2024-12-15'), pd.Timestamp('2025-02-02'))
+
+    entry = PriceCache(cache_dir=str(tmp_path)).get('BBB')
+    assert (entry.start, entry.end) == (pd.Timestamp('2024-12-15'), pd.Timestamp('2025-02-02'))
+    pd.testing.assert_frame_equal(entry.prices, bbb.reset_index(drop=True))
+
+    # a file without recorded coverage is a miss
+    pq.write_table(pa.Table.from_pandas(bbb, preserve_index=False), tmp_path / 'BBB.parquet')
+    assert PriceCache(cache_dir=str(tmp_path)).get('BBB') is None
+
+
+def test_memory_tier_evicts_least_recently_used(history):
+    by_location = {loc: df for loc, df in history.groupby('px_location')}
+    nbytes = int(by_location['AAA'].reset_index(drop=True).memory_usage(deep=True).sum())
+    cache = PriceCache(max_bytes=int(nbytes * 1.5))
+    start, end = pd.Timestamp('2025-01-01'), pd.Timestamp('2025-03-31')
+    cache.update('AAA', by_location['AAA'], start, end)
+    cache.update('BBB', by_location['BBB'], start, end)
+    assert cache.get('AAA') is None
+    assert cache.get('BBB') is not None
+    assert cache.stats()['entries'] == 1
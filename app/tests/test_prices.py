@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.minrei_lib.prices import PRICE_COLUMNS, PriceQueries
+
+
+@pytest.fixture
+def raw_prices(prices):
+    """prices as the get-prices-*.sql templates return them, with a repeated contract on some dates."""
+    df = prices.assign(
+        px_location=prices['px_location'].str.lower() + ' ',
+        price_basis=np.where(prices['px_location'] == 'AAA', 2.0, np.nan),
+        currency='USD',
+        rate=1.0,
+        commoditygroup='CRUDE',
+    )
+    repeated = df.iloc[[4, 5, 18]].assign(price=-1.0)
+    df = pd.concat([df, repeated]).sort_values('px_date', kind='stable').reset_index(drop=True)
+    return df[PRICE_COLUMNS]
+
+
+class ChunkedPrices(PriceQueries):
+    """PriceQueries streaming a fixed raw result in chunks, like read_sql_query with chunksize."""
+
+    def __init__(self, raw: pd.DataFrame):
+        super().__init__(None)
+        self.raw = raw
+
+    def get_full_chunks(self, px_locations, lookback_days=-1, start_date='-1', chunksize=100_000):
+        if self.raw.empty: # read_sql_query yields one empty frame
+            yield self._process_prices_helper(self.raw.copy())
+        for start in range(0, len(self.raw), chunksize):
+            yield self._process_prices_helper(self.raw.iloc[start:start + chunksize].copy())
+
+
+@pytest.mark.parametrize('chunksize', [1, 3, 4, 7, 1_000])
+def test_chunked_matches_single_load(raw_prices, chunksize):
+    prices = ChunkedPrices(raw_prices)
+    expected = prices._process_prices_helper(raw_prices.copy()).reset_index(drop=True)
+    result = prices.get_historical(['AAA', 'BBB'], chunksize=chunksize)
+    pd.testing.assert_frame_equal(result, expected)
+    assert (result['price'] > 0).all() # repeated rows dropped across chunk boundaries too
+
+
+def test_chunked_without_rows_keeps_columns(raw_prices):
+    prices = ChunkedPrices(raw_prices.iloc[:0])
+    result = prices.get_historical(['ZZZ'], chunksize=10)
+    assert result.empty
+    assert list(result.columns) == PRICE_COLUMNS
+    assert pd.api.types.is_datetime64_any_dtype(result['px_date'])
+    assert sum(len(chunk) for chunk in prices.iter_full(['ZZZ'], chunksize=10)) == 0
+
+
+def test_write_full(raw_prices, tmp_path):
+    import pyarrow.parquet as pq
+
+    prices = ChunkedPrices(raw_prices)
+    path = tmp_path / 'prices.parquet'
+    rows = prices.write_full(['AAA', 'BBB'], str(path), chunksize=4)
+    metadata = pq.ParquetFile(path).metadata
+    assert rows == metadata.num_rows == len(raw_prices) - 3
+    assert metadata.num_row_groups > 1
+    assert ChunkedPrices(raw_prices.iloc[:0]).write_full(['ZZZ'], str(tmp_path / 'none.parquet')) == 0
+    assert not (tmp_path / 'none.parquet').exists()
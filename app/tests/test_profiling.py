@@ -0,0 +1,64 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from app.encoding import pnl_vectors_response
+from app.minrei_lib.profiling import Metrics, profiled, request_spans, span, timed
+from app.timing import server_timing
+
+
+def test_spans_recorded_per_request():
+    @timed('test.inner')
+    def inner():
+        return 1
+
+    with request_spans() as (spans, profiles):
+        with span('test.outer'):
+            inner()
+        inner()
+    assert [name for name, _ in spans] == ['test.inner', 'test.outer', 'test.inner']
+    assert profiles is None
+    with span('test.outside'): # no request: histograms only
+        pass
+    assert len(spans) == 3
+
+
+def test_profiled_only_when_requested():
+    with request_spans(profile=False) as (_, profiles):
+        assert profiled(sum, [1, 2]) == 3
+    with request_spans(profile=True) as (_, profiles):
+        assert profiled(sum, [1, 2]) == 3
+    assert len(profiles) <= 1 # none when another profiler owns the interpreter
+
+
+def test_metrics_histogram():
+    metrics = Metrics(buckets=(0.1, 1.0, float('inf')))
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        metrics.observe('sql.get-prices', seconds)
+    snapshot = metrics.snapshot()['sql.get-prices']
+    assert snapshot['count'] == 4
+    assert snapshot['buckets'] == {'0.1': 2, '1.0': 3, '+Inf': 4}
+    rendered = metrics.render()
+    assert 'minrei_span_seconds_bucket{span="sql.get-prices",le="+Inf"} 4' in rendered
+    assert 'minrei_span_seconds_count{span="sql.get-prices"} 4' in rendered
+
+
+def test_server_timing():
+    value = server_timing([('sql.a b', 0.002), ('process.x', 0.001), ('sql.a b', 0.003)], 0.01)
+    assert value == 'total;dur=10.0, sql.a_b;dur=5.0;desc="x2", process.x;dur=1.0'
+
+
+def test_json_encoding_is_timed():
+    df = pd.DataFrame({'px_location': ['AAA'], 'contract_month': [pd.Timestamp('2025-01-01')]})
+    with request_spans() as (spans, _):
+        response = pnl_vectors_response(df, binary=False, vectors=np.array([[1.0, 2.0]]))
+    assert [name for name, _ in spans] == ['encode.json']
+    assert json.loads(response.body) == [{'px_location': 'AAA', 'contract_month': '2025-01-01T00:00:00', 'pnl_vector': [1.0, 2.0]}]
+
+
+def test_timing_middleware(client):
+    response = client.get('/')
+    assert response.headers['Server-Timing'].startswith('total;dur=')
+    metrics = client.get('/metrics').text
+    assert 'span="http.GET /"' in metrics
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from app.minrei_lib import ReferenceCache
+
+
+class Source:
+    """Reference data with a version the probe reports, counting loads and probes."""
+
+    def __init__(self):
+        self.version = 1
+        self.loads = 0
+        self.probes = 0
+        self.fail = False
+
+    def load(self):
+        self.loads += 1
+        return f"v{self.version}"
+
+    def probe(self):
+        self.probes += 1
+        if self.fail:
+            raise ConnectionError('server down')
+        return self.version
+
+
+@pytest.fixture
+def source():
+    return Source()
+
+
+def test_fresh_entries_are_served_without_queries(source):
+    cache = ReferenceCache(ttl=3600)
+    cache.register('traders', source.load, source.probe)
+    assert [cache.get('traders'), cache.get('traders')] == ['v1', 'v1']
+    assert (source.loads, source.probes) == (1, 1)
+
+
+def test_expired_entries_reload_only_when_the_probe_changes(source):
+    cache = ReferenceCache(ttl=0)
+    cache.register('traders', source.load, source.probe)
+    assert cache.get('traders') == 'v1'
+    assert cache.get('traders') == 'v1'
+    assert (source.loads, source.probes) == (1, 2)
+
+    source.version = 2
+    assert cache.get('traders') == 'v2'
+    assert (source.loads, source.probes) == (2, 3)
+
+    cache.refresh('traders', force=True)
+    assert source.loads == 3
+
+
+def test_without_probe_reloads_every_ttl(source):
+    cache = ReferenceCache(ttl=0)
+    cache.register('seasonal', source.load)
+    cache.get('seasonal')
+    cache.get('seasonal')
+    assert (source.loads, source.probes) == (2, 0)
+
+
+def test_failed_revalidation_keeps_serving(source):
+    cache = ReferenceCache(ttl=3600)
+    cache.register('traders', source.load, source.probe, ttl=0)
+    cache.warm()
+    source.fail = True
+    cache.warm()
+    assert cache.stats()['errors'] == {'traders': 'ConnectionError: server down'}
+    assert cache._entries['traders'].value == 'v1'
+    with pytest.raises(ConnectionError): # a foreground get surfaces the error
+        cache.get('traders')
+
+    source.fail = False
+    assert cache.get('traders') == 'v1'
+    assert cache.stats()['errors'] == {}
+
+    cache.invalidate('traders')
+    cache.get('traders')
+    assert source.loads == 2
+
+
+def test_background_refresher_serves_stale_entries(source):
+    cache = ReferenceCache(ttl=0, refresh_interval=3600)
+    cache.register('traders', source.load, source.probe)
+    cache.start()
+    try:
+        deadline = time.monotonic() + 5
+        while 'traders' not in cache.stats()['entries'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        probes = source.probes
+        assert [cache.get('traders'), cache.get('traders')] == ['v1', 'v1']
+        assert source.probes == probes and source.loads == 1
+        assert cache.stats()['running']
+    finally:
+        cache.stop()
+    assert not cache.stats()['running']
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.benchmarks.revaluation import synthetic_book
+from app.minrei_lib.instrument_matrix import InstrumentMatrix
+from app.minrei_lib.portfolio_analysis import PortfolioAnalysis
+
+
+@pytest.fixture
+def book():
+    return synthetic_book(30, 20)
+
+
+def greek(positions, col):
+    return positions[col].to_numpy().reshape(-1, 1)
+
+
+def test_delta_and_taylor(book):
+    positions, returns, _ = book
+    matrix = InstrumentMatrix.from_prices(returns)
+    ds = matrix.rows(matrix.lookup(InstrumentMatrix.instrument_keys(positions, [])))
+
+    delta = PortfolioAnalysis.position_pnl(positions, matrix, [])
+    np.testing.assert_allclose(delta, greek(positions, 'deltaposition') * ds)
+
+    taylor = PortfolioAnalysis.position_pnl(positions, matrix, [], 'taylor')
+    expected = greek(positions, 'deltaposition') * ds + 0.5 * greek(positions, 'gammaposition') * ds ** 2 + greek(positions, 'thetaposition')
+    np.testing.assert_allclose(taylor, expected)
+
+
+def test_taylor_with_vega(book):
+    positions, returns, vols = book
+    # no vol history for one instrument: no vega pnl there
+    missing = (vols['px_location'] == positions['px_location'].iloc[3]) & (vols['forward_month'] == positions['forward_month'].iloc[3])
+    vols = vols[~missing]
+    matrix = InstrumentMatrix.from_prices(returns)
+    vol_matrix = PortfolioAnalysis.vol_changes(vols)
+    ds = matrix.rows(matrix.lookup(InstrumentMatrix.instrument_keys(positions, [])))
+    levels = vols.pivot_table(index=['px_location', 'forward_month'], columns='px_date', values='vol')
+    dvol = levels.diff(axis=1).reindex(index=pd.MultiIndex.from_frame(positions[['px_location', 'forward_month']]), columns=matrix.dates)
+    dvol = dvol.fillna(0.0).to_numpy()
+    assert (dvol[3] == 0).all() and (dvol != 0).any()
+
+    pnl = PortfolioAnalysis.position_pnl(positions, matrix, [], 'taylor', vol_matrix)
+    expected = (
+        greek(positions, 'deltaposition') * ds + 0.5 * greek(positions, 'gammaposition') * ds ** 2
+        + greek(positions, 'thetaposition') + greek(positions, 'vegaposition') * dvol
+    )
+    np.testing.assert_allclose(pnl, expected)
+
+
+def test_missing_greeks_count_as_zero(book):
+    positions, returns, _ = book
+    matrix = InstrumentMatrix.from_prices(returns)
+    delta_only = positions.drop(columns=['gammaposition', 'vegaposition']).assign(thetaposition=np.nan)
+    np.testing.assert_allclose(
+        PortfolioAnalysis.position_pnl(delta_only, matrix, [], 'taylor'),
+        PortfolioAnalysis.position_pnl(delta_only, matrix, []),
+    )
+    with pytest.raises(ValueError):
+        PortfolioAnalysis.position_pnl(positions, matrix, [], 'full')
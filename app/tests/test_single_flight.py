@@ -0,0 +1,114 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.minrei_lib import SingleFlight
+from app.minrei_lib.single_flight import coalesce_key, coalesced
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight(ttl=0)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return pd.DataFrame({'x': [1, 2]})
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(flight.do, 'key', slow)
+        started.wait(5)
+        followers = [pool.submit(flight.do, 'key', slow) for _ in range(3)]
+        deadline = time.monotonic() + 5
+        while flight.stats()['coalesced'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert len(calls) == 1
+    assert flight.stats()['coalesced'] == 3
+    # each caller gets its own copy
+    results[0]['y'] = 0
+    assert all(list(df.columns) == ['x'] for df in results[1:])
+
+
+def test_ttl_reuse_and_clear():
+    flight = SingleFlight(ttl=60)
+    calls = []
+    assert flight.do('key', lambda: calls.append(1) or len(calls)) == 1
+    assert flight.do('key', lambda: calls.append(1) or len(calls)) == 1
+    assert flight.stats()['cached'] == 1
+    assert flight.do('key', lambda: 'fresh', ttl=0) == 1 # ttl is per flight, set by the call that ran it
+    flight.clear()
+    assert flight.do('key', lambda: 'fresh', ttl=0) == 'fresh'
+    assert flight.do('key', lambda: 'again') == 'again'
+
+
+def test_errors_are_shared_but_not_reused():
+    flight = SingleFlight(ttl=60)
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        flight.do('key', fail)
+    assert flight.do('key', lambda: 'ok') == 'ok'
+
+
+def test_read_only_arrays_are_shared():
+    flight = SingleFlight()
+    vectors = np.zeros((2, 3))
+    vectors.flags.writeable = False
+    rows = pd.DataFrame({'trader': ['a', 'b']})
+    first = flight.do('key', lambda: (rows, vectors))
+    second = flight.do('key', lambda: (rows, vectors))
+    assert second[1] is vectors and first[0] is not second[0]
+
+
+def test_coalesce_key_normalizes_arguments():
+    key = coalesce_key('f', '2025-01-15', {'traders': ['b', 'a', 'a'], 'levels': (0.95, 0.99)}, unordered=('traders',))
+    assert key == coalesce_key('f', '2025-01-15', {'levels': [0.95, 0.99], 'traders': {'a', 'b'}}, unordered=('traders',))
+    assert key != coalesce_key('f', '2025-01-15', {'traders': ['a', 'b'], 'levels': (0.99, 0.95)}, unordered=('traders',))
+    assert key != coalesce_key('f', '2025-01-16', {'traders': ['a', 'b'], 'levels': (0.95, 0.99)}, unordered=('traders',))
+    with pytest.raises(TypeError):
+        coalesce_key('f', None, {'vols': pd.DataFrame()})
+
+
+class FakeDb:
+    def __init__(self, single_flight: Optional[SingleFlight]):
+        self.single_flight = single_flight
+        self.version = pd.Timestamp('2025-01-15')
+
+    def latest_valuation_date(self):
+        return self.version
+
+
+calls = []
+
+
+@coalesced('test.compute', unordered=('traders',))
+def compute(traders, lookback_days=400, db=None):
+    calls.append(traders)
+    return len(traders)
+
+
+def test_coalesced_decorator():
+    calls.clear()
+    db = FakeDb(SingleFlight(ttl=60))
+    assert compute(['a', 'b'], db=db) == 2
+    assert compute(['b', 'a'], 400, db=db) == 2
+    assert len(calls) == 1
+    compute(['a', 'b'], 30, db=db)
+    assert len(calls) == 2
+    db.version = pd.Timestamp('2025-01-16') # new data, new key
+    compute(['a', 'b'], db=db)
+    assert len(calls) == 3
+    compute(['a', 'b'], db=FakeDb(None))
+    assert len(calls) == 4
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.minrei_lib import SnapshotStore
+from app.minrei_lib.snapshot_store import HOUSE_BOOK
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 40
+    rows = pd.DataFrame({
+        'trader': rng.choice(['alice', 'bob', 'carol', HOUSE_BOOK], n),
+        'px_location': rng.choice(['AAA', 'BBB', 'CCC'], n),
+        'contract_month': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 3, n) * 31, unit='D'),
+        'commoditygroup': rng.choice(['CRUDE', 'GAS'], n),
+    })
+    rows['row_id'] = np.arange(n)
+    vectors = np.arange(n, dtype=float).reshape(-1, 1) * np.ones((1, 5))
+    store = SnapshotStore(str(tmp_path))
+    store.write(pd.Timestamp('2025-01-15'), rows, vectors, pd.bdate_range('2025-01-08', periods=5), dtype='float64')
+    return store.open()
+
+
+def assert_selected(selection, expected: pd.DataFrame):
+    rows, vectors = selection
+    assert sorted(rows['row_id']) == sorted(expected['row_id'])
+    # vectors stay aligned with their rows
+    np.testing.assert_array_equal(vectors[:, 0], rows['row_id'].to_numpy(dtype=float))
+
+
+def test_book_roundtrip(snapshot):
+    rows, vectors = snapshot.book('bob')
+    assert (rows['trader'] == 'bob').all()
+    np.testing.assert_array_equal(vectors[:, 0], rows['row_id'].to_numpy(dtype=float))
+    assert snapshot.book('nobody') is None
+    assert snapshot.valuation_date == pd.Timestamp('2025-01-15')
+    pd.testing.assert_index_equal(snapshot.dates, pd.bdate_range('2025-01-08', periods=5), check_names=False, exact=False)
+    frame = snapshot.to_frame(rows, vectors)
+    assert frame['pnl_vector'].iloc[0] == [float(rows['row_id'].iloc[0])] * 5
+
+
+def test_rewrite_reopens_and_prune(tmp_path, snapshot):
+    store = SnapshotStore(str(tmp_path))
+    first = store.open()
+    assert store.open() is first # opened once per store
+    rows = snapshot.rows.assign(trader='dave')
+    store.write(pd.Timestamp('2025-01-15'), rows, np.zeros((len(rows), 5)), snapshot.dates)
+    reopened = store.open()
+    assert reopened is not first and list(reopened.books) == ['dave']
+
+    store.write(pd.Timestamp('2025-01-16'), rows, np.zeros((len(rows), 5)), snapshot.dates)
+    assert store.latest() == pd.Timestamp('2025-01-16')
+    store.prune(keep=1)
+    assert store.valuation_dates() == [pd.Timestamp('2025-01-16')]
+    assert sorted(os.listdir(tmp_path)) == ['2025-01-16'] # no temporary directories left
+
+
+def test_select_single_trader_is_a_view(snapshot):
+    rows, vectors = snapshot.select(traders=['bob'])
+    assert np.shares_memory(vectors, snapshot.vectors)
+    assert_selected((rows, vectors), snapshot.rows[snapshot.rows['trader'] == 'bob'])
+
+
+def test_select_filters(snapshot):
+    rows = snapshot.rows
+    assert_selected(snapshot.select(), rows)
+    assert_selected(snapshot.select(traders=['alice', 'carol', 'nobody']), rows[rows['trader'].isin(['alice', 'carol'])])
+    assert_selected(snapshot.select(commoditygroups=['GAS']), rows[rows['commoditygroup'] == 'GAS'])
+    assert_selected(
+        snapshot.select(traders=['alice', HOUSE_BOOK], commoditygroups=['CRUDE']),
+        rows[rows['trader'].isin(['alice', HOUSE_BOOK]) & (rows['commoditygroup'] == 'CRUDE')],
+    )
+
+
+def test_select_rows(snapshot):
+    ranges = snapshot.ranges(trader='alice', px_location='AAA')
+    positions = np.concatenate([np.arange(start, stop) for start, stop in zip(ranges['start'], ranges['stop'])])
+    rows, _ = snapshot.select(rows=positions)
+    assert (rows['trader'] == 'alice').all() and (rows['px_location'] == 'AAA').all()
+    mask = (snapshot.rows['commoditygroup'] == 'GAS').to_numpy()
+    assert_selected(snapshot.select(rows=mask), snapshot.rows[mask])
+
+
+def test_select_unknown_trader(snapshot):
+    rows, vectors = snapshot.select(traders=['nobody'])
+    assert rows.empty and vectors.shape == (0, 5)
+
+
+def test_float32_by_default(tmp_path, snapshot):
+    store = SnapshotStore(str(tmp_path / 'f32'))
+    store.write(snapshot.valuation_date, snapshot.rows, np.asarray(snapshot.vectors), snapshot.dates)
+    assert store.open().vectors.dtype == np.float32
+    ranges = snapshot.ranges(trader='carol')
+    assert (ranges['stop'] > ranges['start']).all()
+    assert ranges[['start', 'stop']].to_numpy().tolist() == sorted(ranges[['start', 'stop']].to_numpy().tolist())
@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.minrei_lib import Core, PnlVectorStore
+
+DATES = pd.bdate_range('2025-01-01', '2025-03-31')
+
+
+class HistoryPrices:
+    """db.prices over an in-memory history that ends on `today`, recording the queries made."""
+
+    def __init__(self, history: pd.DataFrame):
+        self.history = history
+        self.today = history['px_date'].max()
+        self.calls = []
+
+    def _known(self, px_locations):
+        h = self.history
+        return h[h['px_location'].isin(px_locations) & (h['px_date'] <= self.today)]
+
+    def get_historical(self, px_locations, lookback_days=-1, start_date='-1'):
+        self.calls.append(('historical', sorted(px_locations), start_date))
+        h = self._known(px_locations)
+        end = h['px_date'].max() if start_date == '-1' else pd.Timestamp(start_date)
+        return h[h['px_date'].between(end - pd.Timedelta(days=lookback_days), end)].reset_index(drop=True)
+
+    def get_range(self, px_locations, start_date, end_date):
+        self.calls.append(('range', sorted(px_locations), start_date))
+        h = self._known(px_locations)
+        return h[h['px_date'].between(start_date, end_date)].reset_index(drop=True)
+
+
+def make_db(history: pd.DataFrame, positions: pd.DataFrame):
+    return SimpleNamespace(
+        prices=HistoryPrices(history),
+        traders=SimpleNamespace(get_positions_latest=lambda trader: positions.copy()),
+        commodities=SimpleNamespace(get_seasonal_index=lambda: ['SSS']),
+    )
+
+
+@pytest.fixture
+def history():
+    rng = np.random.default_rng(0)
+    rows = [
+        (date, location, forward_month, pd.Timestamp('2025-04-01') + pd.DateOffset(months=forward_month - 1))
+        for date in DATES for location in ('AAA', 'BBB', 'SSS') for forward_month in (1, 2)
+    ]
+    df = pd.DataFrame(rows, columns=['px_date', 'px_location', 'forward_month', 'contract_month'])
+    df['price'] = 50 + rng.normal(size=len(df)).cumsum()
+    return df
+
+
+def positions(valuation_date, instruments):
+    df = pd.DataFrame(instruments, columns=['px_location', 'forward_month', 'deltaposition'])
+    df['contract_month'] = [pd.Timestamp('2025-04-01') + pd.DateOffset(months=m - 1) for m in df['forward_month']]
+    df['valuation_date'] = pd.Timestamp(valuation_date)
+    return df
+
+
+def test_refresh_matches_full_build(history, tmp_path):
+    store = PnlVectorStore(str(tmp_path / 'incremental'))
+    first = positions('2025-02-28', [('AAA', 1, 2.0), ('SSS', 2, -1.0)])
+    db = make_db(history[history['px_date'] <= '2025-02-28'], first)
+    Core.refresh_pnl_vectors('alice', store, lookback_days=30, db=db)
+
+    # five days later, with a changed delta and a new instrument
+    second = positions('2025-03-07', [('AAA', 1, 3.0), ('SSS', 2, -1.0), ('BBB', 2, 1.5)])
+    db = make_db(history[history['px_date'] <= '2025-03-07'], second)
+    result = Core.refresh_pnl_vectors('alice', store, lookback_days=30, db=db)
+    assert db.prices.calls == [
+        ('range', ['AAA', 'BBB', 'SSS'], pd.Timestamp('2025-02-21')),
+        ('historical', ['BBB'], '2025-03-07'),
+    ]
+
+    full = Core.refresh_pnl_vectors('alice', PnlVectorStore(str(tmp_path / 'full')), lookback_days=30, db=make_db(history[history['px_date'] <= '2025-03-07'], second))
+    np.testing.assert_allclose(np.array(result['pnl_vector'].tolist()), np.array(full['pnl_vector'].tolist()))
+    state = store.load('alice')
+    assert state['valuation_date'] == np.datetime64('2025-03-07')
+    assert pd.Timestamp(state['window_dates'][0]) >= pd.Timestamp('2025-03-07') - pd.Timedelta(days=30)
+
+
+def test_changed_lookback_rebuilds(history, tmp_path):
+    store = PnlVectorStore(str(tmp_path))
+    book = positions('2025-02-28', [('AAA', 1, 1.0)])
+    db = make_db(history[history['px_date'] <= '2025-02-28'], book)
+    Core.refresh_pnl_vectors('alice', store, lookback_days=30, db=db)
+    db.prices.calls.clear()
+    result = Core.refresh_pnl_vectors('alice', store, lookback_days=60, db=db)
+    assert [call[0] for call in db.prices.calls] == ['historical']
+    assert len(result['pnl_vector'].iloc[0]) == (DATES <= '2025-02-28').sum() - 1 # whole history
+
+
+def test_store_roundtrip(tmp_path):
+    store = PnlVectorStore(str(tmp_path))
+    assert store.load('a/b') is None
+    store.save('a/b', {'unit_pnl': np.eye(2), 'px_location': np.array(['AAA', 'BBB'])})
+    state = store.load('a/b')
+    np.testing.assert_array_equal(state['unit_pnl'], np.eye(2))
+    assert os.listdir(tmp_path) == ['a%2Fb.npz']
+    store.delete('a/b')
+    assert store.load('a/b') is None
@@ -0,0 +1,63 @@
+"""Per-request timing: Server-Timing headers from the spans recorded while serving a request, route
+latency histograms for /metrics, and an optional cProfile dump of the request's executor work.
+"""
+import os
+import re
+import time
+import uuid
+from typing import Optional
+
+import pstats
+from fastapi import Request
+
+from .minrei_lib.profiling import record, request_spans
+
+PROFILE_HEADER = 'x-minrei-profile'
+
+
+def server_timing(spans: list[tuple[str, float]], total: float) -> str:
+    """Server-Timing value with spans of the same name summed, in order of first completion."""
+    totals: dict[str, list] = {}
+    for name, seconds in spans:
+        entry = totals.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+    metrics = [f"total;dur={total * 1e3:.1f}"]
+    for name, (seconds, count) in totals.items():
+        metric = f"{re.sub(r'[^A-Za-z0-9._-]', '_', name)};dur={seconds * 1e3:.1f}"
+        metrics.append(metric + (f';desc="x{count}"' if count > 1 else ''))
+    return ', '.join(metrics)
+
+
+def dump_profile(profiles: list, directory: str, request: Request) -> Optional[str]:
+    """Writes the request's profiles as one pstats file, None if nothing was profiled."""
+    if not profiles:
+        return None
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        stats.add(profile)
+    os.makedirs(directory, exist_ok=True)
+    route = re.sub(r'[^A-Za-z0-9]+', '_', request.url.path).strip('_') or 'root'
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{request.method.lower()}-{route}-{uuid.uuid4().hex[:8]}.prof"
+    stats.dump_stats(os.path.join(directory, name))
+    return name
+
+
+async def timing_middleware(request: Request, call_next):
+    """Collects the request's spans (see minrei_lib.profiling) and reports them; settings from timing_settings."""
+    settings = request.app.state.timing
+    profile = settings['profile_dir'] is not None and request.headers.get(PROFILE_HEADER) == '1'
+    start = time.perf_counter()
+    with request_spans(profile) as (spans, profiles):
+        response = await call_next(request)
+    total = time.perf_counter() - start
+
+    route = request.scope.get('route')
+    record(f"http.{request.method} {route.path if route is not None else 'unmatched'}", total)
+    if settings['server_timing']:
+        response.headers['Server-Timing'] = server_timing(spans, total)
+    if profile:
+        name = dump_profile(profiles, settings['profile_dir'], request)
+        if name is not None:
+            response.headers['X-Minrei-Profile-Dump'] = name
+    return response
@@ -1,4 +1,5 @@
 import { DataRow } from "@/lib/gridDefs"
+import { decodePnlVectors, PNL_VECTORS_MEDIA_TYPE } from "@/lib/pnlVectors"
 import useSWR from "swr"
 
 const useTraderPnlVectors = () => {
@@ -6,7 +7,9 @@ const useTraderPnlVectors = () => {
     fetch(url).then((res) => res.json())
 
   const pnlFetcher = (url: string): Promise<DataRow[]> =>
-    fetch(url).then((res) => res.json())
+    fetch(url, { headers: { Accept: PNL_VECTORS_MEDIA_TYPE } })
+      .then((res) => res.arrayBuffer())
+      .then(decodePnlVectors)
 
   const { data: traders, isLoading: isLoadingTraders } = useSWR<string[]>(
     "http://localhost:8000/utils/traders",
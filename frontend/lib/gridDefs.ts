@@ -3,14 +3,14 @@ import { ColDef, GetRowIdParams, GridApi, GridOptions } from "ag-grid-enterprise
 import { AgGridReact } from "ag-grid-react";
 import { formatContractMonth, formatFinanceNumber } from "@/lib/format";
 import { useCallback, useMemo, useState } from "react";
-import { computeVaR, parsePnLVector } from "@/lib/utils";
+import { computeVaR, parsePnLVector, PnLVector } from "@/lib/utils";
 
 export interface DataRow {
   customGroup?: string;
   px_location: string;
   contract_month: string;
   deltaposition: number;
-  pnl_vector: number[];
+  pnl_vector: PnLVector;
   idx: string;
 }
 
@@ -0,0 +1,39 @@
+import { DataRow } from "@/lib/gridDefs";
+
+export const PNL_VECTORS_MEDIA_TYPE = "application/x-pnl-vectors";
+
+interface PnlVectorsHeader {
+  rows: number;
+  cols: number;
+  dtype: "float64" | "float32";
+  vector_field: string;
+  columns: Record<string, unknown[]>;
+}
+
+// Decodes the server's binary pnl_vectors layout (see app/encoding.py):
+// uint32 header length | JSON header | padding to 8 bytes | rows x cols little-endian matrix.
+// Each row's pnl_vector is a zero-copy view into the single matrix buffer.
+export function decodePnlVectors(buffer: ArrayBuffer): DataRow[] {
+  const headerLength = new DataView(buffer).getUint32(0, true);
+  const header: PnlVectorsHeader = JSON.parse(
+    new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength))
+  );
+  const offset = Math.ceil((4 + headerLength) / 8) * 8;
+  const size = header.rows * header.cols;
+  const matrix =
+    header.dtype === "float32"
+      ? new Float32Array(buffer, offset, size)
+      : new Float64Array(buffer, offset, size);
+
+  const names = Object.keys(header.columns);
+  const rows: DataRow[] = new Array(header.rows);
+  for (let i = 0; i < header.rows; i++) {
+    const row: Record<string, unknown> = {};
+    for (const name of names) {
+      row[name] = header.columns[name][i];
+    }
+    row[header.vector_field] = matrix.subarray(i * header.cols, (i + 1) * header.cols);
+    rows[i] = row as unknown as DataRow;
+  }
+  return rows;
+}
@@ -5,6 +5,8 @@ export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs))
 }
 
+export type PnLVector = number[] | Float64Array | Float32Array;
+
 export function parsePnLVector(vector: string): number[] {
   if (!vector) return [];
   const cleanedVector = vector.replace(/[\[\]]/g, "").trim();
@@ -12,12 +14,12 @@ export function parsePnLVector(vector: string): number[] {
 }
 
 export function computeVaR(
-  vector: number[],
+  vector: PnLVector,
   lookback: number = 251,
   confidenceLevel: number = 0.05
 ): number {
-  const slicedVector = vector.slice(-lookback);
-  const sortedVector = slicedVector.sort((a, b) => a - b);
+  // typed-array copy sorts numerically without a comparator
+  const sortedVector = Float64Array.from(vector.slice(-lookback)).sort();
   const index = Math.floor(sortedVector.length * confidenceLevel);
   return sortedVector[index];
 }